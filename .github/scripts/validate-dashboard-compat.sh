@@ -40,6 +40,30 @@ cp -a scripts "$WORKDIR/scripts"
 
 python3 "$WORKDIR/dashboard/apply_docker_patches.py" "$WORKDIR/dashboard-source"
 cp "$WORKDIR/dashboard/docker_overrides.py" "$WORKDIR/dashboard-source/docker_overrides.py"
+cp "$WORKDIR/dashboard/log_tail.py" "$WORKDIR/dashboard-source/log_tail.py"
+cp "$WORKDIR/dashboard/player_index.py" "$WORKDIR/dashboard-source/player_index.py"
+cp "$WORKDIR/dashboard/log_stream.py" "$WORKDIR/dashboard-source/log_stream.py"
+cp "$WORKDIR/dashboard/log_rotation.py" "$WORKDIR/dashboard-source/log_rotation.py"
+cp "$WORKDIR/dashboard/log_search.py" "$WORKDIR/dashboard-source/log_search.py"
+cp "$WORKDIR/dashboard/log_events.py" "$WORKDIR/dashboard-source/log_events.py"
+cp "$WORKDIR/dashboard/supervisor_rpc.py" "$WORKDIR/dashboard-source/supervisor_rpc.py"
+cp "$WORKDIR/dashboard/async_exec.py" "$WORKDIR/dashboard-source/async_exec.py"
+cp "$WORKDIR/dashboard/jobs.py" "$WORKDIR/dashboard-source/jobs.py"
+cp "$WORKDIR/dashboard/backup_writer.py" "$WORKDIR/dashboard-source/backup_writer.py"
+cp "$WORKDIR/dashboard/backup_store.py" "$WORKDIR/dashboard-source/backup_store.py"
+cp "$WORKDIR/dashboard/snapshot.py" "$WORKDIR/dashboard-source/snapshot.py"
+cp "$WORKDIR/dashboard/backup_catalog.py" "$WORKDIR/dashboard-source/backup_catalog.py"
+cp "$WORKDIR/dashboard/s3_upload.py" "$WORKDIR/dashboard-source/s3_upload.py"
+cp "$WORKDIR/dashboard/restore.py" "$WORKDIR/dashboard-source/restore.py"
+cp "$WORKDIR/dashboard/version_cache.py" "$WORKDIR/dashboard-source/version_cache.py"
+cp "$WORKDIR/dashboard/update_apply.py" "$WORKDIR/dashboard-source/update_apply.py"
+cp "$WORKDIR/dashboard/staged_update.py" "$WORKDIR/dashboard-source/staged_update.py"
+cp "$WORKDIR/dashboard/artifact_cache.py" "$WORKDIR/dashboard-source/artifact_cache.py"
+cp "$WORKDIR/dashboard/console_broker.py" "$WORKDIR/dashboard-source/console_broker.py"
+cp "$WORKDIR/dashboard/console_capture.py" "$WORKDIR/dashboard-source/console_capture.py"
+cp "$WORKDIR/dashboard/server_runner.py" "$WORKDIR/dashboard-source/server_runner.py"
+cp "$WORKDIR/dashboard/jvm_launcher.py" "$WORKDIR/dashboard-source/jvm_launcher.py"
+cp "$WORKDIR/dashboard/cds_archive.py" "$WORKDIR/dashboard-source/cds_archive.py"
 cp "$WORKDIR/dashboard/setup_routes.py" "$WORKDIR/dashboard-source/setup_routes.py"
 cp "$WORKDIR/dashboard/tailscale_routes.py" "$WORKDIR/dashboard-source/tailscale_routes.py"
 
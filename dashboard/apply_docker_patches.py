@@ -25,12 +25,16 @@ try:
         get_server_control_commands,
         get_backup_frequency as docker_get_backup_frequency,
         set_backup_frequency,
+        set_backup_frequency as docker_set_backup_frequency,
         run_backup as docker_run_backup,
         check_version as docker_check_version,
+        check_version_async as docker_check_version_async,
         run_update as docker_run_update,
+        start_update_job as docker_start_update_job,
         check_auto_update as docker_check_auto_update,
         get_players_from_logs as docker_get_players,
         get_console_output as docker_get_console_output,
+        get_console_update as docker_get_console_update,
     )
     DOCKER_MODE = True
     print("[Dashboard] Running in Docker mode with supervisord")
@@ -39,6 +43,18 @@ except ImportError:
     print("[Dashboard] Running in bare-metal mode with systemd")
 """
 
+DOCKER_BACKUP_FREQUENCY_ROUTE = '''@app.post("/api/config/backup-frequency")
+async def api_set_backup_frequency(request: Request, user: str = Depends(verify_credentials)):
+    if DOCKER_MODE:
+        if not ALLOW_CONTROL:
+            raise HTTPException(status_code=403, detail="Control-Aktionen deaktiviert.")
+        body = await request.json()
+        freq = body.get("frequency", body.get("hours"))
+        if not docker_set_backup_frequency(freq):
+            raise HTTPException(status_code=400, detail="Ungueltige Backup-Frequenz (0-168 Stunden).")
+        return {"ok": True, "frequency": int(freq)}
+    if not ALLOW_CONTROL:'''
+
 
 def apply_patches(dashboard_dir: Path):
     """Apply patches to make the dashboard work with supervisord in Docker."""
@@ -119,7 +135,7 @@ def apply_patches(dashboard_dir: Path):
                 content = content.replace(marker, wrapper + marker, 1)
                 break
 
-    # Patch the api_server_action function to use supervisorctl in Docker
+    # Patch the api_server_action function to use supervisord in Docker
     old_server_action_block = """    if DOCKER_MODE and HYTALE_CONTAINER:
         # Docker mode
         docker_actions = {
@@ -142,11 +158,12 @@ def apply_patches(dashboard_dir: Path):
         output, rc = run_cmd(allowed[action], timeout=30)
 """
     new_server_action_block = """    if DOCKER_MODE:
-        from docker_overrides import get_server_control_commands
-        allowed = get_server_control_commands()
-        if action not in allowed:
+        # supervisord XML-RPC, no supervisorctl process
+        from docker_overrides import run_server_action
+        if action not in ("start", "stop", "restart"):
             raise HTTPException(status_code=400, detail=f"Unbekannte Aktion: {action}")
-        output, rc = run_cmd(allowed[action], timeout=60)
+        # Blocks until supervisord is done (and may switch a staged version): off the event loop
+        output, rc = await asyncio.to_thread(run_server_action, action)
     else:
         # Native mode with systemctl
         allowed = {
@@ -180,7 +197,7 @@ def apply_patches(dashboard_dir: Path):
         if routes_marker in content:
             content = content.replace(routes_marker, wrapper + routes_marker)
 
-    # Patch api_backup_run to use Docker backup
+    # Patch api_backup_run to use Docker backup (starts a background job)
     old_backup_run = '    output, rc = run_cmd(["sudo", "/usr/local/sbin/hytale-backup.sh"], timeout=120)'
     if old_backup_run in content:
         new_backup_run = '''    if DOCKER_MODE:
@@ -189,21 +206,17 @@ def apply_patches(dashboard_dir: Path):
         output, rc = run_cmd(["sudo", "/usr/local/sbin/hytale-backup.sh"], timeout=120)'''
         content = content.replace(old_backup_run, new_backup_run)
 
-    # Patch api_set_backup_frequency to reject in Docker mode
+    # Patch api_set_backup_frequency: in Docker mode the frequency is stored in the
+    # dashboard config and run by the in-process backup scheduler (backup_catalog.py)
     old_freq_check = '@app.post("/api/config/backup-frequency")\nasync def api_set_backup_frequency(request: Request, user: str = Depends(verify_credentials)):\n    if not ALLOW_CONTROL:'
     if old_freq_check in content:
-        new_freq_check = '''@app.post("/api/config/backup-frequency")
-async def api_set_backup_frequency(request: Request, user: str = Depends(verify_credentials)):
-    if DOCKER_MODE:
-        raise HTTPException(status_code=400, detail="Backup-Frequenz kann in Docker nicht geaendert werden.")
-    if not ALLOW_CONTROL:'''
-        content = content.replace(old_freq_check, new_freq_check)
+        content = content.replace(old_freq_check, DOCKER_BACKUP_FREQUENCY_ROUTE)
 
     # Patch api_version_check
     old_version_check = '    output, rc = await asyncio.to_thread(run_cmd, ["sudo", UPDATE_SCRIPT, "check"], 300)'
     if old_version_check in content:
         new_version_check = '''    if DOCKER_MODE:
-        result = docker_check_version()
+        result = await docker_check_version_async()
         return JSONResponse(result)
     output, rc = await asyncio.to_thread(run_cmd, ["sudo", UPDATE_SCRIPT, "check"], 300)'''
         content = content.replace(old_version_check, new_version_check)
@@ -212,7 +225,8 @@ async def api_set_backup_frequency(request: Request, user: str = Depends(verify_
     old_update_run = '    output, rc = await asyncio.to_thread(run_cmd, ["sudo", UPDATE_SCRIPT, "update"], 600)'
     if old_update_run in content:
         new_update_run = '''    if DOCKER_MODE:
-        result = docker_run_update()
+        # Runs as a background job; poll /api/jobs/{job_id}
+        result = docker_start_update_job()
         return JSONResponse(result)
     output, rc = await asyncio.to_thread(run_cmd, ["sudo", UPDATE_SCRIPT, "update"], 600)'''
         content = content.replace(old_update_run, new_update_run)
@@ -257,8 +271,7 @@ async def api_console_output(user: str = Depends(verify_credentials), since: str
 async def api_console_output(user: str = Depends(verify_credentials), since: str = ""):
     """Return recent log lines."""
     if DOCKER_MODE:
-        lines = docker_get_console_output(since)
-        return JSONResponse({"lines": lines})
+        return JSONResponse(docker_get_console_update(since))
     cmd = ["journalctl", "-u", "hytale", "-n50", "--no-pager"]
     if since:
         cmd.extend(["--since", since])
@@ -267,7 +280,7 @@ async def api_console_output(user: str = Depends(verify_credentials), since: str
     return JSONResponse({"lines": lines})'''
         content = content.replace(old_console, new_console)
 
-    # Patch console/send to use command file instead of FIFO pipe in Docker mode
+    # Patch console/send to use the console broker instead of FIFO pipe in Docker mode
     old_console_send = '''@app.post("/api/console/send")
 async def api_console_send(request: Request, user: str = Depends(verify_credentials)):
     if not ALLOW_CONTROL:
@@ -290,15 +303,16 @@ async def api_console_send(request: Request, user: str = Depends(verify_credenti
     if not command:
         raise HTTPException(status_code=400, detail="Kein Befehl angegeben.")
 
-    # Docker mode: use command file instead of FIFO pipe
+    # Docker mode: console broker socket instead of FIFO pipe
     if DOCKER_MODE:
-        command_file = SERVER_DIR / ".server_command"
+        from console_broker import send_commands_async
         try:
-            with open(command_file, "a") as f:
-                f.write(command + "\\n")
-            return JSONResponse({"ok": True, "message": f"Befehl gesendet: {command}"})
+            ack = (await send_commands_async(command))[0]
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Fehler beim Senden: {e}")
+        if not ack["ok"]:
+            raise HTTPException(status_code=503, detail=f"Fehler beim Senden: {ack['error']}")
+        return JSONResponse({"ok": True, "message": f"Befehl gesendet: {command}"})
 
     if not CONSOLE_PIPE.exists():'''
         content = content.replace(old_console_send, new_console_send)
@@ -350,21 +364,21 @@ async def api_server_action(action: str, user: str = Depends(verify_credentials)
         raise HTTPException(status_code=403, detail="Control-Aktionen deaktiviert. ALLOW_CONTROL=true setzen.")
 
     if DOCKER_MODE:
-        from docker_overrides import get_server_control_commands
-        allowed = get_server_control_commands()
-        timeout = 60
+        # supervisord XML-RPC, no supervisorctl process
+        from docker_overrides import run_server_action
+        if action not in ("start", "stop", "restart"):
+            raise HTTPException(status_code=400, detail=f"Unbekannte Aktion: {action}")
+        output, rc = await asyncio.to_thread(run_server_action, action)
     else:
         allowed = {
             "start": ["sudo", "/bin/systemctl", "start", SERVICE_NAME],
             "stop": ["sudo", "/bin/systemctl", "stop", SERVICE_NAME],
             "restart": ["sudo", "/bin/systemctl", "restart", SERVICE_NAME],
         }
-        timeout = 30
-
-    if action not in allowed:
-        raise HTTPException(status_code=400, detail=f"Unbekannte Aktion: {action}")
+        if action not in allowed:
+            raise HTTPException(status_code=400, detail=f"Unbekannte Aktion: {action}")
+        output, rc = run_cmd(allowed[action], timeout=30)
 
-    output, rc = run_cmd(allowed[action], timeout=timeout)
     if rc != 0:
         raise HTTPException(status_code=500, detail=output)
     return {"ok": True, "action": action}
@@ -373,15 +387,11 @@ async def api_server_action(action: str, user: str = Depends(verify_credentials)
     if n_server == 0 and 'docker_actions = {' in content:
         print('[patch] warning: api_server_action robust replacement not applied')
 
-    # Robust patch: reject backup-frequency writes in Docker mode even if old string
+    # Robust patch: handle backup-frequency writes in Docker mode even if old string
     # signatures changed in upstream.
     backup_freq_anchor = '@app.post("/api/config/backup-frequency")\nasync def api_set_backup_frequency(request: Request, user: str = Depends(verify_credentials)):\n    if not ALLOW_CONTROL:'
     if backup_freq_anchor in content:
-        content = content.replace(
-            backup_freq_anchor,
-            '@app.post("/api/config/backup-frequency")\nasync def api_set_backup_frequency(request: Request, user: str = Depends(verify_credentials)):\n    if DOCKER_MODE:\n        raise HTTPException(status_code=400, detail="Backup-Frequenz kann in Docker nicht geaendert werden.")\n    if not ALLOW_CONTROL:',
-            1,
-        )
+        content = content.replace(backup_freq_anchor, DOCKER_BACKUP_FREQUENCY_ROUTE, 1)
 
     # ---------------------------------------------------------------------------
     # Hard overrides for current upstream dashboard signatures
@@ -420,6 +430,24 @@ try:
         def _get_console_output(since: str = "") -> list[str]:
             return _docker_get_console_output(since)
 
+        # Route /api/console/output to the cursor-based reader so clients get
+        # only new lines plus the cursor for their next poll.
+        from docker_overrides import get_console_update as _docker_get_console_update
+
+        async def _docker_api_console_output(user: str = Depends(verify_credentials), since: str = ""):
+            \"\"\"Return console lines after the `since` cursor (Docker mode).\"\"\"
+            return JSONResponse(_docker_get_console_update(since))
+
+        app.router.routes[:] = [
+            r for r in app.router.routes
+            if not (getattr(r, "path", None) == "/api/console/output" and "GET" in getattr(r, "methods", set()))
+        ]
+        app.add_api_route("/api/console/output", _docker_api_console_output, methods=["GET"])
+
+        # Scheduled backups run in the dashboard process only (not on import)
+        from docker_overrides import start_backup_scheduler as _docker_start_backup_scheduler
+        app.add_event_handler("startup", _docker_start_backup_scheduler)
+
         print("[Dashboard] Applied Docker hard overrides for status/logs/console")
 except Exception as e:
     print(f"[Dashboard] Warning: Docker hard overrides not applied: {e}")
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Shared, content-addressed cache for downloaded server archives.
+
+Several containers on one host can mount the same directory as
+HYTALE_ARTIFACT_CACHE. Each server version is then downloaded and stored
+once:
+
+    objects/<sha256>.zip     archive content, named by its SHA-256
+    versions/<version>.json  version -> {"sha256", "size", "stored"}
+    locks/<version>.lock     held (flock) while that version is downloaded
+    tmp/                     downloads in progress
+    .lock                    held while objects are added or evicted
+
+fetch(version, download) returns the cached archive, or runs download(path)
+with the version lock held. Other requesters, in this container or another
+one, block on that lock and then find the archive in the cache. A version
+whose archive has the same hash as a cached one shares the object.
+
+After each download, objects are evicted least recently used first (mtime,
+touched on every hit) until the cache fits HYTALE_ARTIFACT_CACHE_MAX_BYTES.
+Objects used within EVICT_GRACE seconds are kept, since a requester may still
+be about to read them.
+
+Usage:
+    python3 artifact_cache.py fetch VERSION DEST -- COMMAND [ARGS...]
+        COMMAND downloads to the path given as {} in ARGS; DEST becomes a
+        link to the cached archive
+    python3 artifact_cache.py list
+    python3 artifact_cache.py evict
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+CACHE_DIR = os.environ.get("HYTALE_ARTIFACT_CACHE", "")
+MAX_BYTES = int(os.environ.get("HYTALE_ARTIFACT_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+EVICT_GRACE = 600
+TMP_MAX_AGE = 86400
+READ_SIZE = 8 * 1024 * 1024
+
+
+class CacheError(Exception):
+    """Download failed or cache unusable."""
+
+
+def _version_key(version: str) -> str:
+    key = version.strip()
+    if not key or "/" in key or key.startswith(".") or "\0" in key:
+        raise CacheError(f"Invalid version: {version!r}")
+    return key
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_to(source: Path, dest: Path) -> None:
+    """Make dest a hard link to source, or a symlink across filesystems."""
+    dest = Path(dest)
+    tmp = dest.with_name(f".{dest.name}.link-tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        os.symlink(Path(source).resolve(), tmp)
+    os.replace(tmp, dest)
+
+
+class ArtifactCache:
+    def __init__(self, root: Path, max_bytes: int = MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.object_dir = self.root / "objects"
+        self.version_dir = self.root / "versions"
+        self.lock_dir = self.root / "locks"
+        self.tmp_dir = self.root / "tmp"
+
+    @contextmanager
+    def _locked(self, path: Path, waiting_message: str | None = None):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a+") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if waiting_message:
+                    f.seek(0)
+                    holder = f.read().strip() or "another process"
+                    print(f"[artifact_cache] {waiting_message} ({holder})")
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.truncate(0)
+                f.write(f"{socket.gethostname()} pid {os.getpid()}")
+                f.flush()
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def object_path(self, sha256: str) -> Path:
+        return self.object_dir / f"{sha256}.zip"
+
+    def lookup(self, version: str) -> Path | None:
+        """Cached archive of `version` (marked as used), or None."""
+        try:
+            entry = json.loads((self.version_dir / f"{_version_key(version)}.json").read_text())
+            path = self.object_path(entry["sha256"])
+            if path.stat().st_size != entry["size"]:
+                return None
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return path
+
+    def fetch(self, version: str, download) -> tuple[Path, bool]:
+        """
+        Archive of `version`, downloading it with download(path) on a miss.
+        Concurrent fetches of one version share one download.
+
+        Returns:
+            tuple: (path of the cached archive, True if it was already cached)
+        """
+        key = _version_key(version)
+        path = self.lookup(key)
+        if path is not None:
+            return path, True
+        with self._locked(self.lock_dir / f"{key}.lock", f"waiting for the download of {key}"):
+            path = self.lookup(key)
+            if path is not None:
+                return path, True
+            self.tmp_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.tmp_dir / f"{uuid.uuid4().hex}.zip"
+            try:
+                download(tmp)
+                if not tmp.is_file():
+                    raise CacheError(f"Download of {key} produced no file")
+                path = self.add(key, tmp)
+            finally:
+                tmp.unlink(missing_ok=True)
+        self.evict(keep={path})
+        return path, False
+
+    def add(self, version: str, file: Path) -> Path:
+        """Store `file` (on the cache filesystem; it is moved) as the archive of `version`."""
+        key = _version_key(version)
+        sha256 = _sha256(file)
+        size = file.stat().st_size
+        path = self.object_path(sha256)
+        with self._locked(self.root / ".lock"):
+            self.object_dir.mkdir(parents=True, exist_ok=True)
+            self.version_dir.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                os.utime(path)  # same content as an earlier version
+            else:
+                os.chmod(file, 0o444)  # shared through links: never written in place
+                os.replace(file, path)
+            entry = self.version_dir / f"{key}.json"
+            tmp = entry.with_name(entry.name + ".tmp")
+            tmp.write_text(json.dumps({"sha256": sha256, "size": size, "stored": time.time()}))
+            os.replace(tmp, entry)
+        print(f"[artifact_cache] stored {key} ({size / 1024 ** 2:.0f} MB, sha256 {sha256[:12]})")
+        return path
+
+    def entries(self) -> list[dict]:
+        """Cached objects, least recently used first, with the versions that use them."""
+        versions = {}
+        for entry in self.version_dir.glob("*.json") if self.version_dir.is_dir() else ():
+            try:
+                versions.setdefault(json.loads(entry.read_text())["sha256"], []).append(entry.stem)
+            except (OSError, ValueError, KeyError):
+                continue
+        objects = []
+        for path in self.object_dir.glob("*.zip") if self.object_dir.is_dir() else ():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            objects.append({"sha256": path.stem, "size": st.st_size, "used": st.st_mtime,
+                            "versions": sorted(versions.get(path.stem, []))})
+        return sorted(objects, key=lambda o: o["used"])
+
+    def evict(self, keep=()) -> list[str]:
+        """Remove least recently used objects until the cache fits max_bytes. Returns their hashes."""
+        keep = {Path(p).stem for p in keep}
+        removed = []
+        with self._locked(self.root / ".lock"):
+            now = time.time()
+            for tmp in self.tmp_dir.glob("*") if self.tmp_dir.is_dir() else ():
+                try:
+                    if now - tmp.stat().st_mtime > TMP_MAX_AGE:  # left by a crashed download
+                        tmp.unlink()
+                except FileNotFoundError:
+                    pass
+            objects = self.entries()
+            total = sum(o["size"] for o in objects)
+            for obj in objects:
+                if not self.max_bytes or total <= self.max_bytes:
+                    break
+                if obj["sha256"] in keep or now - obj["used"] < EVICT_GRACE:
+                    continue
+                self.object_path(obj["sha256"]).unlink(missing_ok=True)
+                for version in obj["versions"]:
+                    (self.version_dir / f"{version}.json").unlink(missing_ok=True)
+                total -= obj["size"]
+                removed.append(obj["sha256"])
+                print(f"[artifact_cache] evicted {', '.join(obj['versions']) or obj['sha256'][:12]} "
+                      f"({obj['size'] / 1024 ** 2:.0f} MB)")
+        return removed
+
+
+def get_cache() -> ArtifactCache | None:
+    """Cache at HYTALE_ARTIFACT_CACHE, or None if not configured."""
+    return ArtifactCache(Path(CACHE_DIR)) if CACHE_DIR else None
+
+
+def main(argv: list[str]) -> int:
+    cache = get_cache()
+    if cache is None:
+        print("[artifact_cache] ERROR: HYTALE_ARTIFACT_CACHE is not set")
+        return 1
+    try:
+        if argv[:1] == ["fetch"] and len(argv) >= 5 and argv[3] == "--":
+            version, dest, command = argv[1], Path(argv[2]), argv[4:]
+
+            def download(path):
+                result = subprocess.run([str(path) if arg == "{}" else arg for arg in command])
+                if result.returncode != 0:
+                    raise CacheError(f"Download failed (exit code {result.returncode})")
+
+            path, hit = cache.fetch(version, download)
+            link_to(path, dest)
+            print(f"[artifact_cache] {version}: {'cache hit' if hit else 'downloaded'}, {dest} -> {path}")
+        elif argv[:1] == ["list"]:
+            entries = cache.entries()
+            print(json.dumps({"root": str(cache.root), "max_bytes": cache.max_bytes,
+                              "bytes": sum(o["size"] for o in entries), "objects": entries}, indent=2))
+        elif argv[:1] == ["evict"]:
+            cache.evict()
+        else:
+            print(__doc__)
+            return 2
+    except (CacheError, OSError) as e:
+        print(f"[artifact_cache] ERROR: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+"""
+Non-blocking command execution for the dashboard.
+
+All dashboard routes are `async def`. A blocking subprocess.run() inside one of
+them stalls the uvicorn event loop for every client. Commands here run through
+asyncio.create_subprocess_exec, with at most HYTALE_EXEC_CONCURRENCY running
+at once, and each has its own timeout. A command that times out, or whose
+awaiting task is cancelled, is killed together with its process group.
+"""
+
+import asyncio
+import os
+import signal
+import weakref
+
+MAX_CONCURRENT = int(os.environ.get("HYTALE_EXEC_CONCURRENCY", "4"))
+KILL_GRACE = 5  # seconds between SIGTERM and SIGKILL on timeout
+
+# asyncio primitives belong to one event loop; keep one semaphore per loop.
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENT)
+    return sem
+
+
+def _signal_group(proc: asyncio.subprocess.Process, sig: int) -> None:
+    try:
+        os.killpg(proc.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def terminate(proc: asyncio.subprocess.Process, grace: float = KILL_GRACE) -> None:
+    """SIGTERM the process group, then SIGKILL it if it is still alive after grace seconds."""
+    if proc.returncode is not None:
+        return
+    _signal_group(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), grace)
+    except asyncio.TimeoutError:
+        _signal_group(proc, signal.SIGKILL)
+        await proc.wait()
+
+
+async def start_process(cmd: list[str], cwd: str | None = None, env: dict | None = None,
+                        output_file=None) -> asyncio.subprocess.Process:
+    """
+    Start a long-running command in its own process group and return at once.
+    Output goes to output_file (an open file) or is discarded; it is never
+    left in an unread pipe. Not counted against the concurrency limit.
+    """
+    return await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        env=env,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=output_file if output_file is not None else asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True,
+    )
+
+
+async def run_command(cmd: list[str], timeout: float = 10, cwd: str | None = None, env: dict | None = None,
+                      output_file=None) -> tuple[str, str, int]:
+    """
+    Run a command without blocking the event loop.
+
+    Args:
+        cmd: Command and arguments as a list
+        timeout: Seconds before the command's process group is terminated
+        cwd: Working directory
+        env: Environment (default: inherited)
+        output_file: Open file receiving stdout and stderr instead of capturing them
+
+    Returns:
+        tuple: (stdout str, stderr str, return code int); both strings are
+        empty when output_file is used
+
+    Raises:
+        asyncio.TimeoutError: If the command exceeded timeout (it has been killed)
+        OSError: If the command could not be started (e.g. FileNotFoundError)
+    """
+    async with _semaphore():
+        if output_file is not None:
+            stdout, stderr = output_file, asyncio.subprocess.STDOUT
+        else:
+            stdout, stderr = asyncio.subprocess.PIPE, asyncio.subprocess.PIPE
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            env=env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=stdout,
+            stderr=stderr,
+            start_new_session=True,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            await terminate(proc)
+            raise
+        except asyncio.CancelledError:
+            # The caller went away; do not leave the command running.
+            _signal_group(proc, signal.SIGKILL)
+            raise
+    return (
+        (out or b"").decode("utf-8", errors="replace"),
+        (err or b"").decode("utf-8", errors="replace"),
+        proc.returncode,
+    )
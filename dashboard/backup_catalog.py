@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Backup catalog, retention and scheduling.
+
+Every finished backup (full archive or incremental snapshot) is recorded in a
+small SQLite database (backups/.catalog.sqlite) with its size, duration, file
+count and checksum. Listing and retention decisions read the catalog only;
+backups/ is walked once, when the catalog is created, to import existing
+archives.
+
+Retention (all optional, default: keep everything):
+- GFS: keep the newest backup of each of the last HYTALE_BACKUP_KEEP_HOURLY
+  hours, HYTALE_BACKUP_KEEP_DAILY days and HYTALE_BACKUP_KEEP_WEEKLY weeks.
+- Budget: then drop the oldest backups until the total is within
+  HYTALE_BACKUP_MAX_BYTES.
+The newest backup and pinned backups are never pruned. Backups uploaded to
+S3 (location s3 or both, see s3_upload) are deleted there as well. Pruning deletes one
+backup at a time and shrinks large archives in steps, so it does not cause
+I/O stalls for the running server.
+
+Usage:
+    python3 backup_catalog.py list
+    python3 backup_catalog.py rescan
+    python3 backup_catalog.py plan
+"""
+
+import fcntl
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from backup_store import STORE_DIR_NAME, BackupStore, StoreError
+
+CATALOG_FILE_NAME = ".catalog.sqlite"
+KEEP_HOURLY = int(os.environ.get("HYTALE_BACKUP_KEEP_HOURLY", "0"))
+KEEP_DAILY = int(os.environ.get("HYTALE_BACKUP_KEEP_DAILY", "0"))
+KEEP_WEEKLY = int(os.environ.get("HYTALE_BACKUP_KEEP_WEEKLY", "0"))
+MAX_BYTES = int(os.environ.get("HYTALE_BACKUP_MAX_BYTES", "0"))
+PRUNE_PAUSE = 0.5  # seconds between two deletions
+TRUNCATE_STEP = 256 * 1024 * 1024  # shrink large archives in steps before unlinking
+SCHEDULER_INTERVAL = 60
+
+ARCHIVE_RE = re.compile(r"^hytale_(\d{8}_\d{6})\.tar(?:\.gz|\.zst)?$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,             -- full | incremental
+    created REAL NOT NULL,
+    bytes INTEGER NOT NULL,         -- archive size, or new chunk bytes for incremental
+    data_bytes INTEGER,             -- universe bytes covered
+    files INTEGER,
+    duration REAL,
+    checksum TEXT,                  -- sha256 of the archive / manifest
+    consistent INTEGER,             -- taken from a paused-save snapshot
+    pinned INTEGER NOT NULL DEFAULT 0,
+    location TEXT NOT NULL DEFAULT 'local'  -- local | s3 | both
+);
+CREATE INDEX IF NOT EXISTS backups_created ON backups (created);
+"""
+
+COLUMNS = ("name", "kind", "created", "bytes", "data_bytes", "files", "duration", "checksum",
+           "consistent", "pinned", "location")
+
+
+def retention_enabled() -> bool:
+    """True if any retention rule is configured."""
+    return bool(KEEP_HOURLY or KEEP_DAILY or KEEP_WEEKLY or MAX_BYTES)
+
+
+class BackupCatalog:
+    """SQLite index of the backups in one backup directory."""
+
+    def __init__(self, backup_dir: Path):
+        self.backup_dir = Path(backup_dir)
+        self.path = self.backup_dir / CATALOG_FILE_NAME
+        self.store = BackupStore(self.backup_dir / STORE_DIR_NAME)
+        self._init_lock = threading.RLock()  # rescan() on first open re-enters
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        with self._init_lock:
+            if not self._ready:
+                self.backup_dir.mkdir(parents=True, exist_ok=True)
+                created = not self.path.exists()
+                with closing(sqlite3.connect(self.path, timeout=10)) as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                    existing = {row[1] for row in conn.execute("PRAGMA table_info(backups)")}
+                    if "location" not in existing:  # catalogs created before S3 uploads
+                        conn.execute("ALTER TABLE backups ADD COLUMN location TEXT NOT NULL DEFAULT 'local'")
+                    conn.commit()
+                self._ready = True
+                if created:
+                    self.rescan()
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, name: str, kind: str, created: float, bytes_: int, data_bytes: int | None = None,
+            files: int | None = None, duration: float | None = None, checksum: str | None = None,
+            consistent: bool | None = None, location: str = "local") -> None:
+        """Record (or update) a finished backup."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO backups (name, kind, created, bytes, data_bytes, files, duration, "
+                "checksum, consistent, pinned, location) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                "COALESCE((SELECT pinned FROM backups WHERE name = ?), 0), ?)",
+                (name, kind, created, bytes_, data_bytes, files, duration, checksum,
+                 None if consistent is None else int(consistent), name, location),
+            )
+
+    def remove(self, name: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM backups WHERE name = ?", (name,))
+
+    def pin(self, name: str, pinned: bool = True) -> bool:
+        """Exclude a backup from pruning. Returns False if it is unknown."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("UPDATE backups SET pinned = ? WHERE name = ?", (int(pinned), name)).rowcount > 0
+
+    def backups(self) -> list[dict]:
+        """All backups, newest first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM backups ORDER BY created DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def summary(self) -> dict:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0), MAX(created) FROM backups").fetchone()
+        return {"count": row[0], "bytes": row[1], "last_created": row[2]}
+
+    def last_created(self) -> float | None:
+        return self.summary()["last_created"]
+
+    def rescan(self) -> int:
+        """
+        Import backups that exist on disk but are not in the catalog, and drop
+        entries whose backup is gone. Walks backups/ once; S3 objects are not
+        listed, uploaded archives missing locally stay as location s3.
+        Returns rows added.
+        """
+        rows = {row["name"]: row for row in self.backups()}
+        known = set(rows)
+        added = 0
+        found = set()
+        for entry in os.scandir(self.backup_dir):
+            m = ARCHIVE_RE.match(entry.name)
+            if not m or not entry.is_file():
+                continue
+            found.add(entry.name)
+            if entry.name in known:
+                continue
+            st = entry.stat()
+            try:
+                created = datetime.strptime(m.group(1), "%Y%m%d_%H%M%S").timestamp()
+            except ValueError:
+                created = st.st_mtime
+            self.add(entry.name, "full", created, st.st_size)
+            added += 1
+        if self.store.manifest_dir.exists():
+            for snap in self.store.list_snapshots():
+                found.add(snap["name"])
+                if snap["name"] in known:
+                    continue
+                self.add(snap["name"], "incremental", snap["created"], snap.get("new_bytes", 0),
+                         snap.get("bytes"), snap.get("files"))
+                added += 1
+        for name in set(known) - found:
+            location = rows[name]["location"]
+            if location == "both":
+                with closing(self._connect()) as conn, conn:
+                    conn.execute("UPDATE backups SET location = 's3' WHERE name = ?", (name,))
+            elif location != "s3":
+                self.remove(name)
+        return added
+
+    # Retention
+
+    def plan(self, keep_hourly: int = KEEP_HOURLY, keep_daily: int = KEEP_DAILY,
+             keep_weekly: int = KEEP_WEEKLY, max_bytes: int = MAX_BYTES) -> list[dict]:
+        """Backups the retention policy would delete, oldest first."""
+        backups = self.backups()
+        if not backups:
+            return []
+        keep = {backups[0]["name"]} | {b["name"] for b in backups if b["pinned"]}
+        buckets = (("%Y%m%d%H", keep_hourly), ("%Y%m%d", keep_daily), ("%G%V", keep_weekly))
+        if any(count for _fmt, count in buckets):
+            for fmt, count in buckets:
+                seen = set()
+                for b in backups:  # newest first: the newest of each bucket is kept
+                    if len(seen) >= count:
+                        break
+                    bucket = time.strftime(fmt, time.localtime(b["created"]))
+                    if bucket not in seen:
+                        seen.add(bucket)
+                        keep.add(b["name"])
+        else:
+            keep.update(b["name"] for b in backups)
+
+        if max_bytes:
+            total = sum(b["bytes"] for b in backups if b["name"] in keep)
+            for b in reversed(backups):  # oldest first
+                if total <= max_bytes:
+                    break
+                if b["name"] in keep and b["name"] != backups[0]["name"] and not b["pinned"]:
+                    keep.discard(b["name"])
+                    total -= b["bytes"]
+        return [b for b in reversed(backups) if b["name"] not in keep]
+
+    def delete(self, backup: dict) -> None:
+        """Delete one backup from disk (and S3) and from the catalog."""
+        if backup["kind"] == "incremental":
+            try:
+                self.store.delete_snapshot(backup["name"])
+            except StoreError:
+                pass
+        else:
+            _remove_gradually(self.backup_dir / backup["name"])
+        if backup.get("location") in ("s3", "both"):
+            from s3_upload import PREFIX, configured, get_client
+            if configured():
+                get_client().delete_object(PREFIX + backup["name"])
+        self.remove(backup["name"])
+
+    def prune(self, job=None, pause: float = PRUNE_PAUSE) -> dict:
+        """
+        Apply the retention policy, one deletion at a time (job: optional
+        jobs.Job for progress and cancellation). Unreferenced chunks of deleted
+        snapshots are freed at the end.
+        """
+        victims = self.plan()
+        if job is not None:
+            job.update(message=f"{len(victims)} Backups zu löschen / to delete", files_total=len(victims))
+        freed = 0
+        incremental = False
+        for n, backup in enumerate(victims, 1):
+            if job is not None:
+                job.check_cancelled()
+            self.delete(backup)
+            freed += backup["bytes"]
+            incremental |= backup["kind"] == "incremental"
+            print(f"[backup_catalog] pruned {backup['name']}")
+            if job is not None:
+                job.update(files_done=n)
+            time.sleep(pause)
+        chunks = self.store.gc() if incremental else None
+        return {"deleted": [b["name"] for b in victims], "bytes_freed": freed, "gc": chunks}
+
+
+def _remove_gradually(path: Path, step: int = TRUNCATE_STEP) -> None:
+    """Unlink a (large) file after shrinking it in steps, to spread the I/O."""
+    try:
+        size = path.stat().st_size
+        with open(path, "r+b") as f:
+            while size > step:
+                size -= step
+                f.truncate(size)
+                os.fsync(f.fileno())
+                time.sleep(0.05)
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class BackupScheduler:
+    """
+    Starts a backup every `get_frequency()` hours (0 = off), measured from the
+    newest backup in the catalog. Only one process per backup directory
+    schedules (flock on backups/.scheduler.lock).
+    """
+
+    def __init__(self, catalog: BackupCatalog, get_frequency, start_backup, interval: float = SCHEDULER_INTERVAL):
+        self.catalog = catalog
+        self.get_frequency = get_frequency
+        self.start_backup = start_backup
+        self.interval = interval
+        self._thread = None
+        self._lock_file = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+            self._thread.start()
+
+    def _acquire(self) -> bool:
+        if self._lock_file is None:
+            try:
+                self.catalog.backup_dir.mkdir(parents=True, exist_ok=True)
+                f = open(self.catalog.backup_dir / ".scheduler.lock", "a")
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            self._lock_file = f
+        return True
+
+    def due(self, now: float | None = None) -> bool:
+        hours = self.get_frequency()
+        if hours <= 0:
+            return False
+        last = self.catalog.last_created()
+        return last is None or (now or time.time()) - last >= hours * 3600
+
+    def _run(self) -> None:
+        while True:
+            try:
+                if self.due() and self._acquire():
+                    job, created = self.start_backup()
+                    if created:
+                        print(f"[backup_catalog] scheduled backup started (Job {job.id})")
+            except Exception as e:
+                print(f"[backup_catalog] scheduler error: {e}")
+            time.sleep(self.interval)
+
+
+def main(argv: list[str]) -> int:
+    server_dir = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+    catalog = BackupCatalog(server_dir / "backups")
+    command = argv[0] if argv else "list"
+    if command == "list":
+        for b in catalog.backups():
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(b["created"]))
+            pin = " pinned" if b["pinned"] else ""
+            print(f"{b['name']:40s} {b['kind']:11s} {b['location']:5s} {created}  "
+                  f"{b['bytes'] / 1024 ** 2:9.1f} MB{pin}")
+        s = catalog.summary()
+        print(f"{s['count']} backups, {s['bytes'] / 1024 ** 2:.1f} MB")
+    elif command == "rescan":
+        print(f"{catalog.rescan()} backups added")
+    elif command == "plan":
+        for b in catalog.plan():
+            print(f"would delete {b['name']}")
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
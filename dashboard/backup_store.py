@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Content-addressed, deduplicating backup store.
+
+A backup (snapshot) is a small JSON manifest listing every file of the
+universe together with the SHA-256 digests of its fixed-size chunks. Chunk
+data lives once in the store, named by its digest:
+
+    backups/.store/
+        chunks/ab/ab12...ef      zlib-compressed chunk (or raw if incompressible)
+        manifests/hytale_20260126_190036.jsonl
+        .lock
+
+Files whose size and mtime match the previous snapshot are not read at all;
+changed files are chunked and hashed, and only chunks the store does not
+have yet are written. Region files are rewritten in place, so fixed-offset
+chunks keep most of a changed file deduplicated.
+
+A manifest is JSON lines: a summary header, then one line per file, so
+listing snapshots reads only the first line of each.
+
+A snapshot can be restored into a directory or exported as a regular tar.
+Chunks that no manifest references any more are removed by gc().
+
+Usage:
+    python3 backup_store.py list
+    python3 backup_store.py export NAME OUT.tar.gz
+    python3 backup_store.py restore NAME TARGET_DIR
+    python3 backup_store.py verify NAME
+    python3 backup_store.py delete NAME
+    python3 backup_store.py gc
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import stat
+import sys
+import tarfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+STORE_DIR_NAME = ".store"
+CHUNK_SIZE = int(os.environ.get("HYTALE_BACKUP_CHUNK_SIZE", str(1024 * 1024)))
+CHUNK_LEVEL = 3  # zlib level for stored chunks
+MANIFEST_VERSION = 1
+
+# Chunk file header: compressed or stored as-is
+_ZLIB = b"Z"
+_RAW = b"R"
+
+
+class StoreError(Exception):
+    """Missing snapshot, missing or corrupt chunk."""
+
+
+class _ChunkReader:
+    """Readable file object over the chunks of one manifest entry (for tarfile)."""
+
+    def __init__(self, store, digests: list[str], job=None):
+        self.store = store
+        self.digests = iter(digests)
+        self.job = job
+        self.buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        if self.job is not None:
+            self.job.check_cancelled()
+        while size < 0 or len(self.buffer) < size:
+            digest = next(self.digests, None)
+            if digest is None:
+                break
+            self.buffer += self.store.get_chunk(digest)
+        if size < 0:
+            data, self.buffer = self.buffer, b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        if self.job is not None:
+            self.job.update(bytes_done=self.job.bytes_done + len(data))
+        return data
+
+
+class BackupStore:
+    """Chunk store plus snapshot manifests below `root` (normally backups/.store)."""
+
+    def __init__(self, root: Path, chunk_size: int = CHUNK_SIZE):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.chunk_dir = self.root / "chunks"
+        self.manifest_dir = self.root / "manifests"
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive store lock: snapshots, deletes and gc never overlap."""
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # Chunks
+
+    def chunk_path(self, digest: str) -> Path:
+        return self.chunk_dir / digest[:2] / digest
+
+    def put_chunk(self, data: bytes) -> tuple[str, int]:
+        """
+        Store one chunk unless it is already present.
+
+        Returns:
+            tuple: (hex digest, bytes written to disk; 0 if deduplicated)
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if path.exists():
+            return digest, 0
+        packed = zlib.compress(data, CHUNK_LEVEL)
+        payload = _ZLIB + packed if len(packed) < len(data) else _RAW + data
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f".{digest}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        return digest, len(payload)
+
+    def get_chunk(self, digest: str) -> bytes:
+        """Read one chunk and check it against its digest."""
+        try:
+            payload = self.chunk_path(digest).read_bytes()
+        except FileNotFoundError:
+            raise StoreError(f"Chunk {digest} missing from store") from None
+        data = zlib.decompress(payload[1:]) if payload[:1] == _ZLIB else payload[1:]
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise StoreError(f"Chunk {digest} is corrupt")
+        return data
+
+    # Manifests
+
+    def manifest_path(self, name: str) -> Path:
+        if not name or "/" in name or name.startswith("."):
+            raise StoreError(f"Invalid snapshot name: {name!r}")
+        return self.manifest_dir / f"{name}.jsonl"
+
+    def load_manifest(self, name: str) -> dict:
+        """Summary plus the list of file entries of snapshot `name`."""
+        try:
+            with open(self.manifest_path(name)) as f:
+                manifest = json.loads(f.readline())
+                manifest["entries"] = [json.loads(line) for line in f]
+        except FileNotFoundError:
+            raise StoreError(f"Snapshot {name} not found") from None
+        except ValueError:
+            raise StoreError(f"Snapshot {name} has a damaged manifest") from None
+        return manifest
+
+    def list_snapshots(self) -> list[dict]:
+        """Snapshot summaries (without file entries), oldest first."""
+        snapshots = []
+        for path in self.manifest_dir.glob("*.jsonl"):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.loads(f.readline()))
+            except (OSError, ValueError):
+                continue
+        snapshots.sort(key=lambda m: m.get("created", 0))
+        return snapshots
+
+    def _latest_entries(self) -> dict:
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return {}
+        try:
+            manifest = self.load_manifest(snapshots[-1]["name"])
+        except StoreError:
+            return {}
+        return {entry["path"]: entry for entry in manifest.get("entries", [])}
+
+    def _write_manifest(self, summary: dict, entries: list[dict]) -> None:
+        path = self.manifest_path(summary["name"])
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "w") as f:
+            f.write(json.dumps(summary, separators=(",", ":")) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    # Snapshots
+
+    def create_snapshot(self, source: Path, name: str, job=None) -> dict:
+        """
+        Back up the directory `source` as snapshot `name`.
+
+        job (optional) receives progress (bytes/files) and is checked for
+        cancellation between chunks; see jobs.Job.
+
+        Returns:
+            dict: Manifest summary (name, created, files, bytes, new_chunks,
+            new_bytes, reused_files)
+        """
+        source = Path(source)
+        with self._locked():
+            previous = self._latest_entries()
+
+            walked = []
+            bytes_total = 0
+            for root, dirs, names in os.walk(source):
+                dirs.sort()
+                for entry_name in dirs + sorted(names):
+                    path = Path(root) / entry_name
+                    try:
+                        st = path.lstat()
+                    except FileNotFoundError:
+                        continue  # removed by the running server meanwhile
+                    walked.append((path, st))
+                    if stat.S_ISREG(st.st_mode):
+                        bytes_total += st.st_size
+            files_total = sum(1 for _, st in walked if not stat.S_ISDIR(st.st_mode))
+            if job is not None:
+                job.update(message="Backup läuft / Backup running", bytes_total=bytes_total,
+                           files_total=files_total)
+
+            entries = []
+            bytes_done = files_done = reused = new_chunks = new_bytes = 0
+            for path, st in walked:
+                rel = path.relative_to(source).as_posix()
+                entry = {"path": rel, "mode": stat.S_IMODE(st.st_mode), "mtime_ns": st.st_mtime_ns}
+                if stat.S_ISDIR(st.st_mode):
+                    entry["type"] = "dir"
+                elif stat.S_ISLNK(st.st_mode):
+                    entry["type"] = "symlink"
+                    entry["target"] = os.readlink(path)
+                elif stat.S_ISREG(st.st_mode):
+                    entry["type"] = "file"
+                    entry["size"] = st.st_size
+                    old = previous.get(rel)
+                    if (old and old.get("type") == "file" and old.get("size") == st.st_size
+                            and old.get("mtime_ns") == st.st_mtime_ns):
+                        entry["chunks"] = old["chunks"]
+                        reused += 1
+                    else:
+                        entry["chunks"] = []
+                        size = 0
+                        try:
+                            with open(path, "rb") as f:
+                                while True:
+                                    if job is not None:
+                                        job.check_cancelled()
+                                    data = f.read(self.chunk_size)
+                                    if not data:
+                                        break
+                                    digest, written = self.put_chunk(data)
+                                    entry["chunks"].append(digest)
+                                    size += len(data)
+                                    if written:
+                                        new_chunks += 1
+                                        new_bytes += written
+                                    if job is not None:
+                                        job.update(bytes_done=bytes_done + size)
+                        except FileNotFoundError:
+                            continue
+                        # The file may have grown or shrunk while it was read
+                        entry["size"] = size
+                    bytes_done += st.st_size
+                else:
+                    continue  # sockets, fifos, devices
+                entries.append(entry)
+                if entry["type"] != "dir":
+                    files_done += 1
+                    if job is not None:
+                        job.update(bytes_done=bytes_done, files_done=files_done)
+
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "name": name,
+                "created": time.time(),
+                "chunk_size": self.chunk_size,
+                "files": files_done,
+                "bytes": sum(e.get("size", 0) for e in entries),
+                "reused_files": reused,
+                "new_chunks": new_chunks,
+                "new_bytes": new_bytes,
+            }
+            self._write_manifest(manifest, entries)
+        return manifest
+
+    def restore(self, name: str, target: Path, job=None, prefix: str = "", threads: int = 1) -> dict:
+        """
+        Write snapshot `name` into directory `target` (created if needed).
+        Existing files with the same path are overwritten; others are kept.
+
+        prefix limits the restore to one subdirectory (e.g. "worlds/default").
+        With threads > 1, files are written by a thread pool; every chunk is
+        checked against its digest either way.
+        """
+        manifest = self.load_manifest(name)
+        target = Path(target)
+        target.mkdir(parents=True, exist_ok=True)
+        prefix = prefix.strip("/")
+        entries = [e for e in manifest["entries"]
+                   if not prefix or e["path"] == prefix or e["path"].startswith(prefix + "/")]
+        if prefix and not entries:
+            raise StoreError(f"{prefix} not found in snapshot {name}")
+        if job is not None:
+            job.update(bytes_total=sum(e.get("size", 0) for e in entries), files_total=len(entries))
+        files_done = 0
+        bytes_done = 0
+        dirs = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="restore") as pool:
+            for entry in entries:
+                if job is not None:
+                    job.check_cancelled()
+                path = target / entry["path"]
+                kind = entry["type"]
+                if kind == "dir":
+                    path.mkdir(parents=True, exist_ok=True)
+                    dirs.append((path, entry))
+                    continue
+                path.parent.mkdir(parents=True, exist_ok=True)
+                if path.is_symlink() or (path.exists() and not path.is_dir()):
+                    path.unlink()
+                if kind == "symlink":
+                    os.symlink(entry["target"], path)
+                    files_done += 1
+                    continue
+                pending.append((pool.submit(self._restore_file, entry, path), entry.get("size", 0)))
+                if len(pending) <= 2 * max(1, threads):
+                    continue
+                future, size = pending.popleft()
+                future.result()
+                files_done += 1
+                bytes_done += size
+                if job is not None:
+                    job.update(files_done=files_done, bytes_done=bytes_done)
+            while pending:
+                future, size = pending.popleft()
+                future.result()
+                files_done += 1
+                bytes_done += size
+                if job is not None:
+                    job.update(files_done=files_done, bytes_done=bytes_done)
+        # Directory times last, writing files into them changes their mtime
+        for path, entry in reversed(dirs):
+            os.chmod(path, entry["mode"])
+            os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+        return {"name": name, "files": files_done, "bytes": bytes_done, "target": str(target)}
+
+    def _restore_file(self, entry: dict, path: Path) -> None:
+        reader = _ChunkReader(self, entry["chunks"])
+        with open(path, "wb") as f:
+            while True:
+                data = reader.read(self.chunk_size)
+                if not data:
+                    break
+                f.write(data)
+        os.chmod(path, entry["mode"])
+        os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+    def export_tar(self, name: str, fileobj, arcroot: str = "universe", job=None) -> None:
+        """Stream snapshot `name` as an uncompressed tar into a writable file object."""
+        manifest = self.load_manifest(name)
+        if job is not None:
+            job.update(bytes_total=manifest.get("bytes", 0), files_total=manifest.get("files", 0))
+        with tarfile.open(fileobj=fileobj, mode="w|") as tar:
+            root = tarfile.TarInfo(arcroot)
+            root.type = tarfile.DIRTYPE
+            root.mode = 0o755
+            root.mtime = manifest["created"]
+            tar.addfile(root)
+            for entry in manifest["entries"]:
+                info = tarfile.TarInfo(f"{arcroot}/{entry['path']}")
+                info.mode = entry["mode"]
+                info.mtime = entry["mtime_ns"] / 1e9
+                if entry["type"] == "dir":
+                    info.type = tarfile.DIRTYPE
+                    tar.addfile(info)
+                elif entry["type"] == "symlink":
+                    info.type = tarfile.SYMTYPE
+                    info.linkname = entry["target"]
+                    tar.addfile(info)
+                else:
+                    info.size = entry["size"]
+                    tar.addfile(info, _ChunkReader(self, entry["chunks"], job))
+
+    def verify(self, name: str) -> list[str]:
+        """Read every chunk of a snapshot. Returns the problems found (empty if intact)."""
+        problems = []
+        seen = set()
+        for entry in self.load_manifest(name)["entries"]:
+            for digest in entry.get("chunks", ()):
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                try:
+                    self.get_chunk(digest)
+                except (StoreError, zlib.error) as e:
+                    problems.append(f"{entry['path']}: {e}")
+        return problems
+
+    def delete_snapshot(self, name: str) -> None:
+        """Remove a manifest. Its chunks are freed by the next gc()."""
+        with self._locked():
+            try:
+                self.manifest_path(name).unlink()
+            except FileNotFoundError:
+                raise StoreError(f"Snapshot {name} not found") from None
+
+    def gc(self) -> dict:
+        """Delete chunks that no manifest references. Returns counts."""
+        with self._locked():
+            referenced = set()
+            for path in self.manifest_dir.glob("*.jsonl"):
+                with open(path) as f:
+                    f.readline()
+                    for line in f:
+                        referenced.update(json.loads(line).get("chunks", ()))
+            removed = freed = 0
+            for bucket in self.chunk_dir.iterdir():
+                if not bucket.is_dir():
+                    continue
+                for chunk in bucket.iterdir():
+                    if chunk.name in referenced:
+                        continue
+                    try:
+                        freed += chunk.stat().st_size
+                        chunk.unlink()
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        return {"chunks_removed": removed, "bytes_freed": freed, "chunks_kept": len(referenced)}
+
+    def usage(self) -> int:
+        """Bytes used by stored chunks."""
+        total = 0
+        for root, _dirs, names in os.walk(self.chunk_dir):
+            for chunk_name in names:
+                try:
+                    total += os.stat(os.path.join(root, chunk_name)).st_size
+                except FileNotFoundError:
+                    pass
+        return total
+
+
+def default_store() -> BackupStore:
+    server_dir = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+    return BackupStore(server_dir / "backups" / STORE_DIR_NAME)
+
+
+def main(argv: list[str]) -> int:
+    store = default_store()
+    command = argv[0] if argv else "list"
+    try:
+        if command == "list":
+            for snap in store.list_snapshots():
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snap["created"]))
+                print(f"{snap['name']}  {created}  {snap['files']} files  "
+                      f"{snap['bytes'] / 1024 ** 2:.1f} MB  +{snap['new_bytes'] / 1024 ** 2:.1f} MB new")
+            print(f"store: {store.usage() / 1024 ** 2:.1f} MB")
+        elif command == "export" and len(argv) == 3:
+            from backup_writer import ParallelCompressedWriter
+            compression = "zstd" if argv[2].endswith(".zst") else "gzip"
+            with open(argv[2], "wb") as raw, ParallelCompressedWriter(raw, compression) as writer:
+                store.export_tar(argv[1], writer)
+        elif command == "restore" and len(argv) == 3:
+            print(store.restore(argv[1], Path(argv[2])))
+        elif command == "verify" and len(argv) == 2:
+            problems = store.verify(argv[1])
+            for problem in problems:
+                print(problem)
+            print("OK" if not problems else f"{len(problems)} problem(s)")
+            return 1 if problems else 0
+        elif command == "delete" and len(argv) == 2:
+            store.delete_snapshot(argv[1])
+        elif command == "gc":
+            print(store.gc())
+        else:
+            print(__doc__)
+            return 2
+    except StoreError as e:
+        print(f"[backup_store] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,135 @@
+"""
+Parallel compressing writer for backups.
+
+The tar stream is cut into fixed-size blocks that are compressed concurrently
+by a thread pool (zlib and zstd release the GIL while compressing):
+
+- gzip: every block becomes its own gzip member. Concatenated members are a
+  valid .gz file (RFC 1952), readable by `gzip -d`, `tar xzf` and Python's
+  gzip/tarfile modules.
+- zstd: uses the zstandard module's own worker threads (optional dependency).
+
+HYTALE_BACKUP_THREADS caps the worker threads so the JVM keeps its share of the
+CPU (default: half of the CPUs available to the container).
+"""
+
+import gzip
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOCK_SIZE = 4 * 1024 * 1024
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_threads() -> int:
+    return max(1, available_cpus() // 2)
+
+
+COMPRESSION = os.environ.get("HYTALE_BACKUP_COMPRESSION", "gzip").lower()
+LEVEL = int(os.environ.get("HYTALE_BACKUP_LEVEL", "0")) or None  # None = codec default
+THREADS = int(os.environ.get("HYTALE_BACKUP_THREADS", "0")) or default_threads()
+
+
+def resolve_codec(compression: str = COMPRESSION) -> str:
+    """Return a usable codec name, falling back to gzip if zstd is unavailable."""
+    if compression == "zstd" and zstandard is None:
+        print("[backup_writer] zstandard module not available, falling back to gzip")
+        return "gzip"
+    return compression if compression in SUFFIXES else "gzip"
+
+
+class ParallelCompressedWriter:
+    """
+    Write-only file object that compresses into `raw` using several threads.
+    Use as `tarfile.open(fileobj=writer, mode="w|")`; close() flushes the last
+    block but does not close `raw`.
+    """
+
+    def __init__(self, raw, compression: str = COMPRESSION, level: int | None = LEVEL,
+                 threads: int = THREADS, block_size: int = BLOCK_SIZE):
+        self.raw = raw
+        self.compression = resolve_codec(compression)
+        self.level = level or DEFAULT_LEVELS[self.compression]
+        self.threads = max(1, threads)
+        self.block_size = block_size
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._buffer = bytearray()
+        self._closed = False
+        if self.compression == "zstd":
+            cctx = zstandard.ZstdCompressor(level=self.level, threads=self.threads if self.threads > 1 else 0)
+            self._zstd = cctx.stream_writer(raw, closefd=False)
+            self._pool = None
+        else:
+            self._zstd = None
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="backup-gz")
+            self._pending = deque()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self._closed:
+            raise ValueError("write to closed writer")
+        n = len(data)
+        self.bytes_in += n
+        if self._zstd is not None:
+            self._zstd.write(data)
+            return n
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._submit(block)
+        return n
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append(self._pool.submit(gzip.compress, block, self.level, mtime=0))
+        # Bound memory: at most two blocks in flight per thread.
+        while len(self._pending) > 2 * self.threads:
+            self._drain_one()
+
+    def _drain_one(self) -> None:
+        member = self._pending.popleft().result()
+        self.raw.write(member)
+        self.bytes_out += len(member)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._zstd is not None:
+            self._zstd.flush(zstandard.FLUSH_FRAME)
+            self.bytes_out = self.raw.tell() if hasattr(self.raw, "tell") else 0
+            return
+        try:
+            if self._buffer or (not self._pending and not self.bytes_out):
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._drain_one()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,202 @@
+"""
+Class data sharing (AppCDS) archive per server version.
+
+On every start the JVM loads, parses and verifies the thousands of classes in
+HytaleServer.jar again. A dynamic CDS archive holds them pre-parsed; the JVM
+maps it at startup instead.
+
+- The archive for a version is HYTALE_DIR/.cache/cds/<version>.jsa, next to
+  <version>.json with what it was built from (jar size and mtime, the Java
+  runtime version, the GC).
+- jvm_options() is called by jvm_launcher.py on every start. With a matching
+  archive, the JVM gets -XX:SharedArchiveFile. Without one, or with a stale
+  one (the jar, the Java runtime or the GC changed), the start is a training
+  run: -XX:+RecordDynamicDumpInfo.
+- The first start after an update is such a training run. TRAIN_DELAY seconds
+  after the server is ready, server_runner.py has the JVM write the archive
+  (dump(): `jcmd PID VM.cds dynamic_dump` over the HotSpot attach socket,
+  no JDK tools needed). The dump pauses the server briefly, once per version.
+- The JVM checks the archive again when it maps it. An archive it rejects is
+  ignored (-Xshare:auto) and the server starts as without one.
+
+Only the archives of the last KEEP_ARCHIVES versions are kept (the current
+one and the rollback target). HYTALE_CDS=off disables all of this. Requires
+Java 17 or newer.
+"""
+
+import json
+import os
+import re
+import signal
+import socket
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+CDS_ENABLED = os.environ.get("HYTALE_CDS", "auto").strip().lower() not in ("off", "false", "0", "no")
+TRAIN_DELAY = float(os.environ.get("HYTALE_CDS_TRAIN_DELAY", "120"))
+KEEP_ARCHIVES = 2
+MIN_JAVA = 17
+ATTACH_TIMEOUT = 10.0
+DUMP_TIMEOUT = 120.0
+# Options that make a training run impossible (no attach listener, SIGQUIT would kill the JVM)
+NO_ATTACH = ("-Xrs", "-XX:+DisableAttachMechanism", "-XX:+ReduceSignalUsage")
+
+
+def cds_dir(server_dir: Path = SERVER_DIR) -> Path:
+    return Path(server_dir) / ".cache" / "cds"
+
+
+def server_version(server_dir: Path = SERVER_DIR) -> str:
+    """Installed version from last_version.txt, safe as a file name ("unknown" if missing)."""
+    try:
+        version = (Path(server_dir) / "last_version.txt").read_text().strip()
+    except OSError:
+        version = ""
+    return re.sub(r"[^A-Za-z0-9._+-]", "_", version)[:128] or "unknown"
+
+
+def fingerprint(server_dir: Path, java: str | None, gc: str | None) -> dict | None:
+    """What an archive is only valid for. None if the server jar is missing."""
+    try:
+        st = (Path(server_dir) / "Server" / "HytaleServer.jar").stat()
+    except OSError:
+        return None
+    return {"jar_size": st.st_size, "jar_mtime": int(st.st_mtime), "java": java, "gc": gc}
+
+
+def _remove(archive: Path) -> None:
+    archive.unlink(missing_ok=True)
+    archive.with_suffix(".json").unlink(missing_ok=True)
+
+
+def jvm_options(server_dir: Path = SERVER_DIR, java: str | None = None, java_major: int | None = None,
+                gc: str | None = None, options: list[str] = ()) -> dict:
+    """
+    CDS options for the next start.
+
+    Returns:
+        dict: mode (use, train or off), reason, archive, fingerprint, options
+    """
+    result = {"mode": "off", "reason": None, "archive": None, "fingerprint": None, "options": []}
+    if not CDS_ENABLED:
+        result["reason"] = "HYTALE_CDS=off"
+        return result
+    if java_major is None or java_major < MIN_JAVA:
+        result["reason"] = f"Java {java_major or 'unknown'} (needs {MIN_JAVA}+)"
+        return result
+    if any(option in NO_ATTACH or option.startswith("-Xshare:off") for option in options):
+        result["reason"] = "disabled by HYTALE_JVM_OPTS"
+        return result
+    current = fingerprint(server_dir, java, gc)
+    if current is None:
+        result["reason"] = "server jar not found"
+        return result
+    archive = cds_dir(server_dir) / f"{server_version(server_dir)}.jsa"
+    result.update(archive=str(archive), fingerprint=current)
+    try:
+        built = json.loads(archive.with_suffix(".json").read_text())
+    except (OSError, ValueError):
+        built = None
+    if archive.is_file() and built is not None and built.get("fingerprint") == current:
+        result.update(mode="use", options=[f"-XX:SharedArchiveFile={archive}", "-Xshare:auto"])
+        return result
+    # A stale archive is left until the training run replaces it
+    result["reason"] = "stale archive" if archive.exists() else "no archive for this version"
+    result.update(mode="train", options=["-XX:+RecordDynamicDumpInfo"])
+    return result
+
+
+def _ns_pid(pid: int) -> int:
+    """pid of the process in its own pid namespace (what the JVM calls itself)."""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("NSpid:"):
+                return int(line.split()[-1])
+    except (OSError, ValueError):
+        pass
+    return pid
+
+
+def jcmd(pid: int, command: str, timeout: float = DUMP_TIMEOUT) -> str:
+    """
+    Run a jcmd command in a HotSpot JVM (same user) through its attach socket,
+    starting the attach listener first if needed. Returns the command's output.
+    """
+    ns_pid = _ns_pid(pid)
+    tmp = Path(f"/proc/{pid}/root/tmp")
+    sock_path = tmp / f".java_pid{ns_pid}"
+    if not sock_path.exists():
+        # The JVM starts its attach listener on SIGQUIT if this file exists
+        attach_file = Path(f"/proc/{pid}/cwd/.attach_pid{ns_pid}")
+        try:
+            attach_file.touch()
+        except OSError:
+            attach_file = tmp / f".attach_pid{ns_pid}"
+            attach_file.touch()
+        try:
+            os.kill(pid, signal.SIGQUIT)
+            deadline = time.monotonic() + ATTACH_TIMEOUT
+            while not sock_path.exists():
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"JVM {pid} did not open its attach socket")
+                time.sleep(0.1)
+        finally:
+            attach_file.unlink(missing_ok=True)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(sock_path))
+        # Protocol 1: version, command, three arguments, each NUL-terminated
+        sock.sendall(b"1\0jcmd\0" + command.encode() + b"\0\0\0")
+        reply = b""
+        while chunk := sock.recv(65536):
+            reply += chunk
+    code, _, output = reply.decode("utf-8", errors="replace").partition("\n")
+    if code.strip() != "0":
+        raise OSError(f"jcmd {command!r} failed ({code.strip()}): {output.strip()}")
+    return output
+
+
+def dump(pid: int, cds: dict) -> dict:
+    """
+    Write the archive of a training run (cds as returned by jvm_options())
+    from the running JVM. Returns {"archive", "size", "seconds"}.
+    """
+    archive = Path(cds["archive"])
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp = archive.with_name(archive.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    started = time.monotonic()
+    try:
+        output = jcmd(pid, f"VM.cds dynamic_dump {tmp}")
+        if not tmp.is_file() or tmp.stat().st_size == 0:
+            raise OSError(f"no archive written: {output.strip()}")
+        os.replace(tmp, archive)
+    finally:
+        tmp.unlink(missing_ok=True)
+    seconds = round(time.monotonic() - started, 2)
+    info = {"fingerprint": cds["fingerprint"], "created": time.time(), "size": archive.stat().st_size,
+            "seconds": seconds}
+    archive.with_suffix(".json").write_text(json.dumps(info, indent=2))
+    prune(archive.parent)
+    return {"archive": str(archive), "size": info["size"], "seconds": seconds}
+
+
+def prune(directory: Path, keep: int = KEEP_ARCHIVES) -> list[str]:
+    """Remove all but the newest `keep` archives. Returns the removed file names."""
+    archives = sorted(Path(directory).glob("*.jsa"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for archive in archives[keep:]:
+        _remove(archive)
+    return [archive.name for archive in archives[keep:]]
+
+
+def list_archives(server_dir: Path = SERVER_DIR) -> list[dict]:
+    """Archives with the version, size and build info, newest first."""
+    result = []
+    for archive in sorted(cds_dir(server_dir).glob("*.jsa"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            info = json.loads(archive.with_suffix(".json").read_text())
+        except (OSError, ValueError):
+            info = {}
+        result.append({"version": archive.stem, "size": archive.stat().st_size, **info})
+    return result
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Console broker: owns the server's stdin and takes commands over a UNIX socket.
+
+Before, a console command was appended to .server_command, picked up by the
+once-a-second poll in server-wrapper.sh and typed in with `screen -X stuff`
+(two forks per command). That took up to a second, and commands written
+between the read and the truncation of the file were lost.
+
+The broker starts the server as its child with stdin on a pipe and listens
+on HYTALE_DIR/.console.sock. The protocol is one JSON object per line:
+
+    -> {"id": 1, "command": "save-all"}
+    <- {"id": 1, "ok": true, "seq": 17}
+    -> {"id": 2, "op": "status"}
+    <- {"id": 2, "ok": true, "status": {"state": "running", "pid": 42, ...}}
+
+The ack is sent once the command has been written to the server's stdin;
+seq numbers the commands in the order the server received them. Before a
+command is written, the broker logs "[console_broker] > COMMAND (#SEQ)",
+which console_capture.py uses to find the command's output in server.log.
+Commands must be a single line. Everything runs in one asyncio loop: no
+polling, no forks, no CPU use while idle. Lines written to the legacy
+.console_pipe FIFO are forwarded as well.
+
+Clients use send_commands() / send_commands_async(). If no broker is
+listening, every command is acked with ok false, unless
+HYTALE_CONSOLE_FILE_FALLBACK=1: then the commands are appended to the
+.server_command file, for setups that still run the legacy server-wrapper.sh
+(nothing else reads that file).
+
+Usage:
+    python3 console_broker.py run [--socket PATH] [--fifo PATH] -- COMMAND [ARGS...]
+    python3 console_broker.py send COMMAND...
+    python3 console_broker.py status
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+SOCKET_PATH = SERVER_DIR / ".console.sock"
+COMMAND_FILE = SERVER_DIR / ".server_command"
+FILE_FALLBACK = os.environ.get("HYTALE_CONSOLE_FILE_FALLBACK", "").strip().lower() in ("1", "true", "yes", "on")
+MAX_COMMAND = 4096
+CLIENT_TIMEOUT = 5.0
+
+
+class BrokerError(Exception):
+    """Command rejected or broker unreachable."""
+
+
+def _check_command(command) -> str:
+    if not isinstance(command, str) or not command.strip():
+        raise BrokerError("Empty command")
+    if "\n" in command or "\r" in command:
+        raise BrokerError("Commands must be a single line")
+    if len(command) > MAX_COMMAND:
+        raise BrokerError(f"Command longer than {MAX_COMMAND} characters")
+    return command.strip()
+
+
+class ConsoleBroker:
+    """
+    Serves the console socket and writes commands to the stdin of the process
+    attached with attach(). Commands arriving while no process is attached
+    are rejected.
+
+    log(line) writes the tag line of each command (default: stdout).
+    status() answers {"op": "status"} requests (default: attached or not).
+    """
+
+    def __init__(self, socket_path: Path = SOCKET_PATH, fifo_path: Path | None = None, log=None, status=None):
+        self.socket_path = Path(socket_path)
+        self.fifo_path = Path(fifo_path) if fifo_path else None
+        self.log = log or (lambda line: print(line, flush=True))
+        self.status = status or (lambda: {"state": "running" if self._stdin is not None else "stopped"})
+        self.seq = 0
+        self._stdin = None
+        self._server = None
+        self._fifo_fds = ()
+        self._listeners = []
+
+    def attach(self, stdin: asyncio.StreamWriter | None) -> None:
+        """Set the stdin of the running server (None while it is down)."""
+        self._stdin = stdin
+
+    def add_listener(self, callback) -> None:
+        """callback(seq, command) is called for every command written."""
+        self._listeners.append(callback)
+
+    async def start(self) -> None:
+        self.socket_path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o660)
+        if self.fifo_path is not None:
+            self._open_fifo()
+        print(f"[console_broker] listening on {self.socket_path}")
+
+    async def close(self) -> None:
+        if self._fifo_fds:
+            asyncio.get_running_loop().remove_reader(self._fifo_fds[0])
+            for fd in self._fifo_fds:
+                os.close(fd)
+            self._fifo_fds = ()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.socket_path.unlink(missing_ok=True)
+
+    async def write(self, command: str) -> int:
+        """Write one command to the server's stdin. Returns its sequence number."""
+        command = _check_command(command)
+        stdin = self._stdin
+        if stdin is None or stdin.is_closing():
+            raise BrokerError("Server is not running")
+        self.seq += 1
+        seq = self.seq
+        # Tag line in server.log (written in order with the server's output):
+        # whatever the command prints comes after it
+        self.log(f"[console_broker] > {command} (#{seq})")
+        stdin.write(command.encode() + b"\n")
+        try:
+            await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise BrokerError(f"Server stdin closed: {e}") from e
+        for callback in self._listeners:
+            callback(seq, command)
+        return seq
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if request.get("op") == "status":
+                        reply = {"id": request.get("id"), "ok": True, "status": {**self.status(), "seq": self.seq}}
+                    else:
+                        reply = {"id": request.get("id"), "ok": True, "seq": await self.write(request.get("command"))}
+                except (ValueError, AttributeError):
+                    reply = {"id": None, "ok": False, "error": "Invalid request"}
+                except BrokerError as e:
+                    reply = {"id": request.get("id"), "ok": False, "error": str(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _open_fifo(self) -> None:
+        """Forward lines written to the legacy FIFO (kept open for writing so EOF never spins)."""
+        try:
+            if not stat.S_ISFIFO(os.stat(self.fifo_path).st_mode):
+                return
+            read_fd = os.open(self.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            write_fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            print(f"[console_broker] FIFO {self.fifo_path} not used: {e}")
+            return
+        self._fifo_fds = (read_fd, write_fd)
+        buffer = bytearray()
+
+        def readable():
+            try:
+                buffer.extend(os.read(read_fd, 65536))
+            except BlockingIOError:
+                return
+            *lines, rest = buffer.split(b"\n")
+            buffer[:] = rest
+            for line in lines:
+                text = line.decode("utf-8", errors="replace").strip()
+                if text:
+                    asyncio.ensure_future(self._write_logged(text))
+
+        asyncio.get_running_loop().add_reader(read_fd, readable)
+
+    async def _write_logged(self, command: str) -> None:
+        try:
+            await self.write(command)
+        except BrokerError as e:
+            print(f"[console_broker] dropped FIFO command: {e}")
+
+
+async def run(cmd: list[str], socket_path: Path = SOCKET_PATH, fifo_path: Path | None = None) -> int:
+    """Run cmd with its stdin owned by a ConsoleBroker. Returns its exit code."""
+    started = time.time()
+    proc = None
+    broker = ConsoleBroker(socket_path, fifo_path,
+                           status=lambda: {"state": "running", "pid": proc.pid if proc else None, "started": started})
+    await broker.start()
+    proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE)
+    broker.attach(proc.stdin)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        loop.add_signal_handler(sig, proc.send_signal, sig)
+    try:
+        returncode = await proc.wait()
+        return 128 - returncode if returncode < 0 else returncode  # killed by a signal: like a shell
+    finally:
+        broker.attach(None)
+        await broker.close()
+
+
+# Clients
+
+
+def _fallback(commands: list[str], socket_path: Path) -> list[dict]:
+    """
+    No broker running: queue the commands for server-wrapper.sh's command file
+    if HYTALE_CONSOLE_FILE_FALLBACK is set, otherwise reject them.
+    """
+    if not FILE_FALLBACK:
+        error = f"Console broker not running (no socket at {socket_path})"
+        return [{"id": n, "ok": False, "error": error} for n in range(len(commands))]
+    with open(COMMAND_FILE, "a") as f:
+        f.write("".join(f"{command}\n" for command in commands))
+    return [{"id": n, "ok": True, "seq": None, "via": "file"} for n in range(len(commands))]
+
+
+def send_commands(*commands: str, socket_path: Path = SOCKET_PATH, timeout: float = CLIENT_TIMEOUT) -> list[dict]:
+    """
+    Send commands in order and return one ack per command
+    ({"id", "ok", "seq"} or {"id", "ok": False, "error"}).
+    Without a broker socket, see _fallback().
+    """
+    commands = [_check_command(c) for c in commands]
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        return _fallback(commands, socket_path)
+    with sock, sock.makefile("rwb") as f:
+        f.write(b"".join(json.dumps({"id": n, "command": c}).encode() + b"\n" for n, c in enumerate(commands)))
+        f.flush()
+        try:
+            return [json.loads(f.readline()) for _ in commands]
+        except (OSError, ValueError) as e:
+            raise BrokerError(f"No ack from console broker: {e}") from e
+
+
+async def send_commands_async(*commands: str, socket_path: Path = SOCKET_PATH,
+                              timeout: float = CLIENT_TIMEOUT) -> list[dict]:
+    """send_commands() for the event loop."""
+    commands = [_check_command(c) for c in commands]
+    try:
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        return await asyncio.to_thread(_fallback, commands, socket_path)
+    try:
+        writer.write(b"".join(json.dumps({"id": n, "command": c}).encode() + b"\n" for n, c in enumerate(commands)))
+        await writer.drain()
+        return [json.loads(await asyncio.wait_for(reader.readline(), timeout)) for _ in commands]
+    except (OSError, ValueError, asyncio.TimeoutError) as e:
+        raise BrokerError(f"No ack from console broker: {e}") from e
+    finally:
+        writer.close()
+
+
+def get_status(socket_path: Path = SOCKET_PATH, timeout: float = 1.0) -> dict | None:
+    """Status of the process behind the broker ({"state", "pid", ...}), or None if no broker is listening."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            with sock.makefile("rwb") as f:
+                f.write(b'{"id": 0, "op": "status"}\n')
+                f.flush()
+                reply = json.loads(f.readline())
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except (OSError, ValueError) as e:
+        raise BrokerError(f"No status from console broker: {e}") from e
+    return reply.get("status")
+
+
+def main(argv: list[str]) -> int:
+    if argv[:1] == ["send"] and len(argv) > 1:
+        try:
+            acks = send_commands(*argv[1:])
+        except (BrokerError, OSError) as e:
+            print(f"[console_broker] ERROR: {e}")
+            return 1
+        for ack in acks:
+            print(json.dumps(ack))
+        return 0 if all(ack["ok"] for ack in acks) else 1
+    if argv[:1] == ["status"]:
+        try:
+            status = get_status()
+        except BrokerError as e:
+            print(f"[console_broker] ERROR: {e}")
+            return 1
+        print(json.dumps(status))
+        return 0 if status is not None else 1
+    if argv[:1] != ["run"] or "--" not in argv:
+        print(__doc__)
+        return 2
+    split = argv.index("--")
+    parser = argparse.ArgumentParser(prog="console_broker.py run")
+    parser.add_argument("--socket", type=Path, default=SOCKET_PATH)
+    parser.add_argument("--fifo", type=Path, default=None)
+    args = parser.parse_args(argv[1:split])
+    if not argv[split + 1:]:
+        print("[console_broker] ERROR: no command to run")
+        return 2
+    sys.stdout.reconfigure(line_buffering=True)  # our lines go to server.log along with the server's
+    return asyncio.run(run(argv[split + 1:], args.socket, args.fifo))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,123 @@
+"""
+Console output of a single command.
+
+The console broker logs "[console_broker] > COMMAND (#SEQ)" to server.log
+right before it writes a command to the server's stdin, so everything the
+command prints comes after that tag line. stream_command() sends a command,
+waits for the tag line with the seq from the ack (through the log event
+pipeline, no polling) and then passes on the server's lines until
+
+- quiet: no new line for `quiet` seconds
+- marker: a line contains the text `until`
+- max_lines: `max_lines` lines were captured
+- timeout: `timeout` seconds after the command was sent
+
+Lines logged by other sources in that window (players, other commands) are
+passed on as well; the tag lines of other commands are left out. On a log
+that never goes quiet for `quiet` seconds, use `until` or a short timeout.
+Without a broker (command file fallback) there is no tag line, so capturing
+starts right after sending and the result is marked "tagged": false.
+"""
+
+import asyncio
+import re
+from pathlib import Path
+
+from console_broker import SOCKET_PATH, send_commands_async
+
+TAG_RE = re.compile(r"^\[console_broker\] > .* \(#(\d+)\)$")
+QUIET = 0.3
+TIMEOUT = 10.0
+MAX_LINES = 1000
+MAX_UNTIL = 200
+
+
+async def stream_command(command: str, quiet: float = QUIET, timeout: float = TIMEOUT, until=None,
+                         max_lines: int = MAX_LINES, pipeline=None, socket_path: Path = SOCKET_PATH):
+    """
+    Send a command and yield its console output as it is logged:
+
+        {"type": "ack", "ok", "seq" | "error"}
+        {"type": "lines", "lines": [...]}          (any number)
+        {"type": "done", "reason", "lines", "tagged", "seconds"}
+
+    until is a literal text (no regular expression) that ends the capture at
+    the first line containing it.
+    """
+    if pipeline is None:
+        from log_events import get_pipeline
+        pipeline = get_pipeline()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def on_events(events):
+        # Ingestion thread
+        loop.call_soon_threadsafe(queue.put_nowait, [event["line"] for event in events])
+
+    # Subscribe before sending, so the tag line cannot be missed
+    pipeline.subscribe(on_events)
+    try:
+        sent = loop.time()
+        ack = (await send_commands_async(command, socket_path=socket_path))[0]
+        yield {"type": "ack", **ack}
+        if not ack["ok"]:
+            return
+        tagged = ack["seq"] is not None
+        started = not tagged
+        deadline = sent + timeout
+        last = loop.time()
+        count = 0
+        reason = None
+        while reason is None:
+            now = loop.time()
+            wait = min(deadline, last + quiet) - now if started else deadline - now
+            if wait <= 0:
+                reason = "timeout" if now >= deadline else "quiet"
+                break
+            try:
+                lines = await asyncio.wait_for(queue.get(), wait)
+            except asyncio.TimeoutError:
+                continue
+            output = []
+            for line in lines:
+                tag = TAG_RE.match(line)
+                if not started:
+                    started = tag is not None and int(tag.group(1)) == ack["seq"]
+                    continue
+                if tag is not None:
+                    continue
+                output.append(line)
+                if until and until in line:
+                    reason = "marker"
+                    break
+                if count + len(output) >= max_lines:
+                    reason = "max_lines"
+                    break
+            if started:
+                last = loop.time()
+            if output:
+                count += len(output)
+                yield {"type": "lines", "lines": output}
+        yield {"type": "done", "reason": reason, "lines": count, "tagged": tagged,
+               "seconds": round(loop.time() - sent, 3)}
+    finally:
+        pipeline.unsubscribe(on_events)
+
+
+async def run_command(command: str, **kwargs) -> dict:
+    """
+    stream_command() collected into one result:
+    {"ok", "seq", "output": [...], "reason", "tagged", "seconds"} or {"ok": False, "error"}.
+    """
+    result = {"output": []}
+    async for item in stream_command(command, **kwargs):
+        kind = item.pop("type")
+        if kind == "lines":
+            result["output"].extend(item["lines"])
+        elif kind == "ack":
+            item.pop("id", None)
+            result.update(item)
+        else:
+            item.pop("lines")
+            result.update(item)
+    return result
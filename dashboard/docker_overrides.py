@@ -3,29 +3,91 @@ Docker-specific overrides for the Hytale Dashboard.
 This file replaces systemd-dependent functions with supervisord equivalents.
 """
 
+import hashlib
+import io
 import os
 import re
+import tarfile
+import time
+import asyncio
 import subprocess
 import json
+import xmlrpc.client
+from contextlib import ExitStack
 from pathlib import Path
 from datetime import datetime, timezone
 from threading import Lock
 
+from log_tail import strip_ansi, tail_lines, read_since
+from log_rotation import tail_lines_across
+from log_events import get_pipeline
+from player_index import PlayerIndex
+from async_exec import run_command
+from backup_writer import SUFFIXES as BACKUP_SUFFIXES, ParallelCompressedWriter, default_threads, resolve_codec
+from backup_store import STORE_DIR_NAME, BackupStore
+from backup_catalog import ARCHIVE_RE, BackupCatalog, BackupScheduler, retention_enabled
+from snapshot import take_snapshot
+from restore import (
+    MANIFEST_NAME, RESTORE_DIR_NAME, RestoreError, extract_archive, prepare_workspace, remove_staging,
+    remove_workspace, swap_in, world_subdir,
+)
+from s3_upload import (
+    PREFIX as S3_PREFIX, MultipartUploadWriter, configured as s3_configured, get_client as get_s3_client,
+    pending_upload,
+)
+from jobs import get_job_manager, run_in_thread
+from version_cache import VersionCache
+from update_apply import UpdateError
+from staged_update import get_pointer, stage_version, switch_version
+from console_broker import BrokerError, get_status as get_runner_status
+from jvm_launcher import PROFILES as JVM_PROFILES
+from supervisor_rpc import (
+    FAULT_ALREADY_STARTED, FAULT_NOT_RUNNING, RPC_ERRORS, StatusCache, SupervisorClient,
+)
 
-# ANSI escape code pattern for stripping terminal colors
-ANSI_PATTERN = re.compile(r'\x1b\[[0-9;]*m|\[(?:[0-9;]*)?m')
-
-
-def strip_ansi(text: str) -> str:
-    """Remove ANSI escape codes from text."""
-    return ANSI_PATTERN.sub('', text)
 
 # Configuration
 SERVICE_NAME = "hytale-server"  # supervisord program name
 SERVER_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
 LOG_DIR = SERVER_DIR / "logs"
 LOG_LINES = 150
+ERROR_LOG_LINES = 50
+CONSOLE_LINES = 50
 DOWNLOAD_SCRIPT = "/usr/local/bin/hytale-download.sh"
+UPDATE_PROGRESS_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s?%")
+BACKUP_MODE = os.environ.get("HYTALE_BACKUP_MODE", "full").lower()  # full | incremental
+# Back up from a consistent staging copy taken during a short save pause (see snapshot.py)
+BACKUP_SNAPSHOT = os.environ.get("HYTALE_BACKUP_SNAPSHOT", "false").lower() in ("1", "true", "yes")
+# Where full backups go: local archive, streamed to S3 (see s3_upload.py), or both
+BACKUP_TARGET = os.environ.get("HYTALE_BACKUP_TARGET", "local").lower()  # local | s3 | both
+S3_STATE_FILE_NAME = ".s3-upload.json"
+# Updates: extract over the live install, or stage into versions/ and switch on restart (see staged_update.py)
+UPDATE_MODE = os.environ.get("HYTALE_UPDATE_MODE", "inplace").lower()  # inplace | staged
+
+# supervisord XML-RPC (pooled UNIX socket connections, status kept current by
+# the hytale-status eventlistener)
+_supervisor = SupervisorClient()
+_status_cache = StatusCache(_supervisor)
+
+# Supervisor state -> (ActiveState, SubState) as reported by systemd
+SUPERVISOR_STATES = {
+    "RUNNING": ("active", "running"),
+    "STOPPED": ("inactive", "dead"),
+    "STARTING": ("activating", "start"),
+    "FATAL": ("failed", "failed"),
+}
+
+# Server runner state -> (ActiveState, SubState), see server_runner.py
+RUNNER_STATES = {
+    "starting": ("active", "start"),
+    "running": ("active", "running"),
+    "stopping": ("deactivating", "stop"),
+    "backoff": ("activating", "auto-restart"),
+    "waiting": ("inactive", "waiting"),
+}
+
+# Player list projected from the log event pipeline (created on first use)
+_player_index = None
 
 # Runtime config file (persisted in volume)
 CONFIG_FILE = SERVER_DIR / ".dashboard_config.json"
@@ -128,71 +190,51 @@ def run_cmd(cmd: list[str], timeout: int = 10) -> tuple[str, int]:
 
 
 def get_service_status() -> dict:
-    """Query supervisorctl for hytale-server status."""
-    cmd = ["supervisorctl", "status", SERVICE_NAME]
-    output, rc = run_cmd(cmd)
-    
-    # Parse supervisorctl output
-    # Format: "hytale-server  RUNNING   pid 12345, uptime 1:23:45"
-    # or:     "hytale-server  STOPPED   Jan 25 12:00 PM"
-    
+    """
+    Return hytale-server status from supervisord (cached, no supervisorctl
+    fork), refined by the server runner's status (state and the JVM's pid).
+    """
     data = {}
-    if rc != 0:
-        data["error"] = output
-        data["ActiveState"] = "unknown"
-        data["SubState"] = "unknown"
-        data["MainPID"] = "0"
-        data["StartTime"] = "n/a"
-        return data
-    
-    # Parse the status line
-    parts = output.split()
-    if len(parts) < 2:
+    try:
+        info = _status_cache.get(SERVICE_NAME)
+    except RPC_ERRORS as e:
+        data["error"] = str(e)
         data["ActiveState"] = "unknown"
         data["SubState"] = "unknown"
         data["MainPID"] = "0"
         data["StartTime"] = "n/a"
         return data
-    
-    status = parts[1].upper()
-    
-    if status == "RUNNING":
-        data["ActiveState"] = "active"
-        data["SubState"] = "running"
-        # Extract PID if present
-        pid = "0"
-        for i, part in enumerate(parts):
-            if part == "pid" and i + 1 < len(parts):
-                pid = parts[i + 1].rstrip(",")
-                break
-        data["MainPID"] = pid
-        # Note: supervisorctl doesn't provide exact start timestamp in standard output
-        # The uptime is available but converting it to a timestamp would be imprecise
-        data["StartTime"] = "running"
-    elif status == "STOPPED":
-        data["ActiveState"] = "inactive"
-        data["SubState"] = "dead"
-        data["MainPID"] = "0"
-        data["StartTime"] = "n/a"
-    elif status == "STARTING":
-        data["ActiveState"] = "activating"
-        data["SubState"] = "start"
-        data["MainPID"] = "0"
-        data["StartTime"] = "n/a"
-    elif status == "FATAL":
-        data["ActiveState"] = "failed"
-        data["SubState"] = "failed"
-        data["MainPID"] = "0"
-        data["StartTime"] = "n/a"
+
+    status = info.get("statename", "UNKNOWN").upper()
+    data["ActiveState"], data["SubState"] = SUPERVISOR_STATES.get(status, ("unknown", status.lower()))
+    pid, start = (info.get("pid", 0), info.get("start")) if status == "RUNNING" else (0, None)
+    # supervisord only knows the runner; the runner (or console broker) knows the server process
+    runner = _runner_status() if status == "RUNNING" else None
+    if runner is not None:
+        data["Runner"] = runner
+        if runner.get("state") in RUNNER_STATES:
+            data["ActiveState"], data["SubState"] = RUNNER_STATES[runner["state"]]
+        pid, start = (runner["pid"], runner.get("started")) if runner.get("pid") else (0, None)
+    if start:
+        data["MainPID"] = str(pid)
+        # Same format as systemd's ActiveEnterTimestamp
+        started = datetime.fromtimestamp(start).astimezone()
+        data["StartTime"] = started.strftime("%a %Y-%m-%d %H:%M:%S %Z")
+        data["Uptime"] = max(0, int(datetime.now().timestamp() - start))
     else:
-        data["ActiveState"] = "unknown"
-        data["SubState"] = status.lower()
         data["MainPID"] = "0"
         data["StartTime"] = "n/a"
-    
     return data
 
 
+def _runner_status() -> dict | None:
+    """Status from the server runner's console socket, or None if it does not answer."""
+    try:
+        return get_runner_status()
+    except BrokerError:
+        return None
+
+
 def get_logs() -> list[str]:
     """Fetch logs from the server log file."""
     log_file = LOG_DIR / "server.log"
@@ -203,22 +245,23 @@ def get_logs() -> list[str]:
     # Try to read the error log first (if it has content)
     if error_log_file.exists():
         try:
-            with open(error_log_file, "r", encoding="utf-8", errors="replace") as f:
-                error_lines = f.readlines()
-                if error_lines:
-                    lines.append("=== Error Log ===")
-                    lines.extend([strip_ansi(line.rstrip()) for line in error_lines[-50:]])
-                    lines.append("")
+            error_lines = tail_lines(error_log_file, ERROR_LOG_LINES)
+            if error_lines:
+                lines.append("=== Error Log ===")
+                lines.extend([strip_ansi(line.rstrip()) for line in error_lines])
+                lines.append("")
         except (PermissionError, OSError) as e:
             lines.append(f"[Error reading error log: {e}]")
 
     # Then read the main server log
     if log_file.exists():
         try:
-            with open(log_file, "r", encoding="utf-8", errors="replace") as f:
-                log_lines = f.readlines()
-                lines.append("=== Server Log ===")
-                lines.extend([strip_ansi(line.rstrip()) for line in log_lines[-LOG_LINES:]])
+            # Served from the event pipeline's buffer when it holds enough lines
+            log_lines = get_pipeline().recent_lines(LOG_LINES)
+            if len(log_lines) < LOG_LINES:
+                log_lines = tail_lines_across(log_file, LOG_LINES)
+            lines.append("=== Server Log ===")
+            lines.extend([strip_ansi(line.rstrip()) for line in log_lines])
         except (PermissionError, OSError) as e:
             lines.append(f"[Error reading server log: {e}]")
     else:
@@ -229,7 +272,7 @@ def get_logs() -> list[str]:
 
 
 def get_server_control_commands() -> dict:
-    """Return supervisorctl commands for server control."""
+    """Return supervisorctl commands for server control (fallback without RPC)."""
     return {
         "start": ["supervisorctl", "start", SERVICE_NAME],
         "stop": ["supervisorctl", "stop", SERVICE_NAME],
@@ -237,67 +280,483 @@ def get_server_control_commands() -> dict:
     }
 
 
-# Backup frequency configuration is not applicable in Docker
-# The backup system should be configured through environment variables or config files
-# rather than systemd service overrides
-def get_backup_frequency() -> int:
+def run_server_action(action: str) -> tuple[str, int]:
     """
-    Get backup frequency from environment or config file.
-    In Docker, this is not managed via systemd overrides.
+    Start, stop or restart hytale-server via supervisord XML-RPC.
+    Output mirrors supervisorctl. Falls back to supervisorctl if the socket
+    is unreachable. If a staged update is pending, start and restart switch
+    to it while the server is down.
+
+    Returns:
+        tuple: (output string, return code int)
     """
-    # For Docker deployment, backup frequency could be managed differently
-    # For now, return 0 (disabled) as a safe default
-    return 0
+    if action not in ("start", "stop", "restart"):
+        return f"Unbekannte Aktion: {action}", 1
+    pending = get_pointer(SERVER_DIR, "pending") if action != "stop" else None
+    if pending:
+        try:
+            entry = _switch_version(pending, "update", start=True)
+        except (UpdateError, OSError) as e:
+            return f"{SERVICE_NAME}: ERROR (Version {pending}: {e})", 1
+        return (f"{SERVICE_NAME}: Version {pending} aktiviert / activated, "
+                f"Downtime {entry['downtime_ms']:.0f} ms"), 0
+    return _server_action(action)
+
+
+def _server_action(action: str) -> tuple[str, int]:
+
+    output = []
+    try:
+        if action in ("stop", "restart"):
+            try:
+                _supervisor.stop_process(SERVICE_NAME)
+                output.append(f"{SERVICE_NAME}: stopped")
+            except xmlrpc.client.Fault as e:
+                if e.faultCode != FAULT_NOT_RUNNING:
+                    raise
+                if action == "stop":
+                    return f"{SERVICE_NAME}: ERROR (not running)", 1
+        if action in ("start", "restart"):
+            try:
+                _supervisor.start_process(SERVICE_NAME)
+                output.append(f"{SERVICE_NAME}: started")
+            except xmlrpc.client.Fault as e:
+                if e.faultCode != FAULT_ALREADY_STARTED:
+                    raise
+                return f"{SERVICE_NAME}: ERROR (already started)", 1
+    except xmlrpc.client.Fault as e:
+        return f"{SERVICE_NAME}: ERROR ({e.faultString})", 1
+    except RPC_ERRORS as e:
+        print(f"[docker_overrides] supervisor RPC unavailable ({e}), using supervisorctl")
+        return run_cmd(get_server_control_commands()[action], timeout=60)
+    finally:
+        _status_cache.invalidate()
+    return "\n".join(output), 0
+
+
+# Backup frequency: hours between scheduled backups (0 = off). Stored in the
+# dashboard config file instead of a systemd timer; the in-process
+# BackupScheduler (backup_catalog.py) starts the backups.
+MAX_BACKUP_FREQUENCY = 168  # one week
+
+
+def get_backup_frequency() -> int:
+    """Get backup frequency in hours from the config file (default: HYTALE_BACKUP_FREQUENCY or 0)."""
+    try:
+        return int(get_config_value("backup_frequency", os.environ.get("HYTALE_BACKUP_FREQUENCY", "0")))
+    except (TypeError, ValueError):
+        return 0
 
 
 def set_backup_frequency(freq: int) -> bool:
+    """Set backup frequency in hours (0 disables scheduled backups)."""
+    try:
+        freq = int(freq)
+    except (TypeError, ValueError):
+        return False
+    if not 0 <= freq <= MAX_BACKUP_FREQUENCY:
+        return False
+    return set_config_value("backup_frequency", freq)
+
+
+# JVM profile (jvm_launcher.py): read by start.sh on every server start, so a
+# change applies from the next (re)start. None goes back to HYTALE_JVM_PROFILE.
+def set_jvm_profile(profile: str | None) -> bool:
+    """Set the JVM profile for the next server start (None: HYTALE_JVM_PROFILE)."""
+    if profile is not None and profile not in JVM_PROFILES:
+        return False
+    config = load_config()
+    if profile is None:
+        config.pop("jvm_profile", None)
+    else:
+        config["jvm_profile"] = profile
+    return save_config(config)
+
+
+# Created on first use and started from the dashboard's startup hook, so that
+# importing this module (bench scripts, CLIs, the compat check) opens no
+# database and starts no backups
+_backup_catalog = None
+_backup_scheduler = None
+_backup_lock = Lock()
+
+
+def get_backup_catalog() -> BackupCatalog:
+    """Catalog of finished backups (backups/.catalog.sqlite)."""
+    global _backup_catalog
+    with _backup_lock:
+        if _backup_catalog is None:
+            _backup_catalog = BackupCatalog(SERVER_DIR / "backups")
+        return _backup_catalog
+
+
+def start_backup_scheduler() -> None:
+    """Start scheduled backups (dashboard startup hook; idempotent)."""
+    global _backup_scheduler
+    catalog = get_backup_catalog()
+    with _backup_lock:
+        if _backup_scheduler is None:
+            _backup_scheduler = BackupScheduler(catalog, get_backup_frequency, start_backup_job)
+            _backup_scheduler.start()
+
+
+class _HashingWriter:
+    """Write-through wrapper copying to one or more files and computing the SHA-256 of everything written."""
+
+    def __init__(self, *files):
+        self.files = files
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        for f in self.files:
+            f.write(data)
+        self.bytes += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.bytes
+
+
+class _ProgressReader:
+    """File wrapper that reports bytes read to a job, honors cancellation and hashes what was read."""
+
+    def __init__(self, f, job):
+        self.f = f
+        self.job = job
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        self.job.check_cancelled()
+        data = self.f.read(size)
+        self.sha256.update(data)
+        self.job.update(bytes_done=self.job.bytes_done + len(data))
+        return data
+
+
+def _universe_dir() -> Path:
+    """The server's universe: Server/universe since Hytale Server 2026.01, universe/ before."""
+    current = SERVER_DIR / "Server" / "universe"
+    legacy = SERVER_DIR / "universe"
+    return legacy if legacy.exists() and not current.exists() else current
+
+
+# Backups, restores and prunes never run at the same time (a prune must not
+# delete the archive or snapshot a restore is extracting)
+_universe_lock = Lock()
+
+
+def _exclusive(fn):
+    """Wrap a job worker so it holds _universe_lock (waiting, cancellable, while another one runs)."""
+    def run(job):
+        while not _universe_lock.acquire(timeout=1):
+            job.check_cancelled()
+            job.update(message="Warte auf Backup/Restore / Waiting for backup or restore")
+        try:
+            return fn(job)
+        finally:
+            _universe_lock.release()
+    return run
+
+
+def _backup_source(job) -> tuple[Path, dict | None]:
+    """
+    Directory to back up: the live universe, or with HYTALE_BACKUP_SNAPSHOT a
+    fresh staging copy taken while saves are paused. Returns (path, snapshot stats).
+    """
+    universe_dir = _universe_dir()
+    if not universe_dir.exists():
+        raise FileNotFoundError("Universe directory not found")
+    if not BACKUP_SNAPSHOT:
+        return universe_dir, None
+    running = get_service_status().get("ActiveState") == "active"
+    stats = take_snapshot(universe_dir, server_running=running, job=job)
+    return Path(stats["path"]), stats
+
+
+def _backup_universe(job) -> dict:
+    """
+    Write a compressed tar of the universe directory (runs in a job worker
+    thread). Compression is parallel, see backup_writer. With
+    HYTALE_BACKUP_TARGET s3/both the stream is uploaded while it is written.
+    The archive ends with a manifest of per-file SHA-256 checksums, checked
+    on restore.
+    """
+    keep_local = BACKUP_TARGET != "s3"
+    upload = BACKUP_TARGET in ("s3", "both")
+    if upload and not s3_configured():
+        raise RuntimeError("HYTALE_BACKUP_TARGET=s3 needs HYTALE_S3_ENDPOINT, HYTALE_S3_BUCKET, "
+                           "HYTALE_S3_ACCESS_KEY and HYTALE_S3_SECRET_KEY")
+    backup_dir = SERVER_DIR / "backups"
+    started = time.time()
+    universe_dir, snapshot = _backup_source(job)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+
+    # Totals first, so progress can be reported as a percentage
+    entries = [universe_dir]
+    total = 0
+    files_total = 0
+    fingerprint = hashlib.sha256()
+    for root, dirs, names in os.walk(universe_dir):
+        dirs.sort()
+        for name in dirs:
+            entries.append(Path(root) / name)
+        for name in sorted(names):
+            path = Path(root) / name
+            try:
+                st = path.lstat()
+            except OSError:
+                continue
+            total += st.st_size
+            fingerprint.update(f"{path.relative_to(universe_dir)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+            entries.append(path)
+            files_total += 1
+    job.update(message="Backup läuft / Backup running", bytes_total=total, files_total=files_total)
+
+    codec = resolve_codec()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    backup_file = backup_dir / f"hytale_{timestamp}.tar{BACKUP_SUFFIXES[codec]}"
+    created = started
+    source = {"fingerprint": fingerprint.hexdigest()}
+    state_file = backup_dir / S3_STATE_FILE_NAME
+    pending = pending_upload(state_file) if upload else None
+    pending_source = (pending or {}).get("source") or {}
+    if (pending and pending.get("key", "").startswith(S3_PREFIX)
+            and pending_source.get("fingerprint") == source["fingerprint"]):
+        # Interrupted upload of the same universe: write the same stream again
+        # (same name and creation time), the parts already uploaded are skipped
+        name = pending["key"][len(S3_PREFIX):]
+        if ARCHIVE_RE.match(name) and name.endswith(f".tar{BACKUP_SUFFIXES[codec]}"):
+            backup_file = backup_dir / name
+            created = pending_source.get("created", started)
+    source["created"] = created
+    tmp = backup_file.with_name(backup_file.name + ".part")
+    files_done = 0
+    checksums = {}
+    uploader = None
+    try:
+        with ExitStack() as stack:
+            sinks = []
+            if keep_local:
+                sinks.append(stack.enter_context(open(tmp, "wb")))
+            if upload:
+                uploader = stack.enter_context(MultipartUploadWriter(
+                    get_s3_client(), S3_PREFIX + backup_file.name, state_file=state_file, source=source))
+                sinks.append(uploader)
+            raw = _HashingWriter(*sinks)
+            with ParallelCompressedWriter(raw, codec) as writer, tarfile.open(fileobj=writer, mode="w|") as tar:
+                for path in entries:
+                    job.check_cancelled()
+                    arcname = "universe" if path == universe_dir else f"universe/{path.relative_to(universe_dir).as_posix()}"
+                    try:
+                        tarinfo = tar.gettarinfo(str(path), arcname)
+                    except FileNotFoundError:
+                        continue  # removed by the running server meanwhile
+                    if tarinfo.isreg():
+                        with open(path, "rb") as f:
+                            reader = _ProgressReader(f, job)
+                            tar.addfile(tarinfo, reader)
+                        checksums[path.relative_to(universe_dir).as_posix()] = reader.sha256.hexdigest()
+                    else:
+                        tar.addfile(tarinfo)
+                    if not tarinfo.isdir():
+                        files_done += 1
+                        job.update(files_done=files_done)
+                manifest = json.dumps({"version": 1, "created": created, "files": checksums}).encode()
+                tarinfo = tarfile.TarInfo(MANIFEST_NAME)
+                tarinfo.size = len(manifest)
+                tarinfo.mtime = int(created)
+                tarinfo.mode = 0o644
+                tar.addfile(tarinfo, io.BytesIO(manifest))
+        if keep_local:
+            os.replace(tmp, backup_file)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    location = "both" if keep_local and upload else ("s3" if upload else "local")
+    get_backup_catalog().add(backup_file.name, "full", created, raw.bytes, data_bytes=total, files=files_done,
+                             duration=time.time() - started, checksum=raw.sha256.hexdigest(),
+                             consistent=snapshot["consistent"] if snapshot else None, location=location)
+    job.update(message=f"Backup created: {backup_file.name}")
+    if retention_enabled():
+        start_prune_job()
+    result = {"file": backup_file.name, "bytes": raw.bytes, "snapshot": snapshot, "location": location}
+    if uploader is not None:
+        result["s3"] = {"key": uploader.key, "uploaded_bytes": uploader.bytes_uploaded,
+                        "skipped_bytes": uploader.bytes_skipped}
+    return result
+
+
+def _backup_universe_incremental(job) -> dict:
+    """
+    Add a deduplicated snapshot of the universe to the backup store
+    (backups/.store, see backup_store). Runs in a job worker thread.
     """
-    Set backup frequency.
-    In Docker, this is not managed via systemd overrides.
+    started = time.time()
+    universe_dir, snapshot = _backup_source(job)
+    store = BackupStore(SERVER_DIR / "backups" / STORE_DIR_NAME)
+    name = f"hytale_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    summary = store.create_snapshot(universe_dir, name, job)
+    checksum = hashlib.sha256(store.manifest_path(name).read_bytes()).hexdigest()
+    get_backup_catalog().add(name, "incremental", started, summary["new_bytes"], data_bytes=summary["bytes"],
+                             files=summary["files"], duration=time.time() - started, checksum=checksum,
+                             consistent=snapshot["consistent"] if snapshot else None)
+    job.update(message=f"Backup created: {name} (+{summary['new_bytes'] / 1024 ** 2:.1f} MB)")
+    if retention_enabled():
+        start_prune_job()
+    return {"file": name, "bytes": summary["new_bytes"], "incremental": True,
+            "files": summary["files"], "reused_files": summary["reused_files"], "snapshot": snapshot}
+
+
+def start_backup_job() -> tuple:
+    """Start a backup in the background (single-flight). Returns (job, created)."""
+    backup = _backup_universe_incremental if BACKUP_MODE == "incremental" else _backup_universe
+    return get_job_manager().submit("backup", lambda job: run_in_thread(job, _exclusive(backup)))
+
+
+def start_prune_job() -> tuple:
+    """Apply the backup retention policy in the background. Returns (job, created)."""
+    return get_job_manager().submit("prune", lambda job: run_in_thread(job, _exclusive(get_backup_catalog().prune)))
+
+
+def _restore_backup(job, name: str, world: str = "") -> dict:
     """
-    # For Docker deployment, this would need to be implemented differently
-    # Perhaps through environment variables or a config file
-    # For now, this is a no-op
-    return False
+    Restore backup `name`, the whole universe or one world (runs in a job
+    worker thread). The backup is extracted and verified into a staging
+    directory while the server runs; only the swap happens with the server
+    stopped. See restore.py.
+    """
+    backup = next((b for b in get_backup_catalog().backups() if b["name"] == name), None)
+    if backup is None:
+        raise RestoreError(f"Backup {name} nicht gefunden / not found")
+    if backup["location"] == "s3":
+        raise RestoreError(f"Backup {name} liegt nur in S3 / is only stored in S3, download it to backups/ first")
+    subdir = world_subdir(world) if world else ""
+    universe_dir = _universe_dir()
+    universe_dir.mkdir(parents=True, exist_ok=True)
+    workspace = universe_dir / RESTORE_DIR_NAME
+    staged = workspace / "new"
+    prepare_workspace(universe_dir)  # left over from an interrupted restore; refuses if previous holds data
+
+    job.update(message="Backup wird entpackt und geprüft / Extracting and verifying backup")
+    extract_start = time.monotonic()
+    try:
+        if backup["kind"] == "incremental":
+            store = BackupStore(SERVER_DIR / "backups" / STORE_DIR_NAME)
+            checksum = hashlib.sha256(store.manifest_path(name).read_bytes()).hexdigest()
+            if backup["checksum"] and checksum != backup["checksum"]:
+                raise RestoreError(f"Manifest of {name} does not match the catalog checksum")
+            # Every chunk is checked against its digest while it is read
+            stats = store.restore(name, staged, job, prefix=subdir, threads=default_threads())
+            stats["verified_files"] = stats["files"]
+        else:
+            stats = extract_archive(SERVER_DIR / "backups" / name, staged, subdir,
+                                    expected_sha256=backup["checksum"], job=job)
+        job.check_cancelled()
+    except BaseException:
+        remove_staging(universe_dir)
+        raise
+    extract_ms = (time.monotonic() - extract_start) * 1000
+
+    # Downtime: stop, swap, start
+    running = get_service_status().get("ActiveState") == "active"
+    down_start = time.monotonic()
+    if running:
+        job.update(message="Server wird gestoppt / Stopping server")
+        output, code = run_server_action("stop")
+        if code != 0:
+            remove_staging(universe_dir)
+            raise RestoreError(f"Server stop failed: {output}")
+    job.update(message="Universe wird ersetzt / Swapping universe")
+    swap_start = time.monotonic()
+    try:
+        swap_in(staged / subdir, universe_dir / subdir, workspace / "previous")
+    finally:
+        swap_ms = (time.monotonic() - swap_start) * 1000
+        if running:
+            job.update(message="Server wird gestartet / Starting server")
+            start_output, start_code = run_server_action("start")
+    downtime_ms = (time.monotonic() - down_start) * 1000
+    job.update(message="Alte Daten werden entfernt / Removing previous data")
+    remove_workspace(universe_dir)
+
+    print(f"[docker_overrides] restored {name}{f' ({subdir})' if subdir else ''}: {stats['files']} files, "
+          f"downtime {downtime_ms:.0f} ms (swap {swap_ms:.0f} ms)")
+    if running and start_code != 0:
+        raise RestoreError(f"Restored, but the server did not start: {start_output}")
+    job.update(message=f"Backup wiederhergestellt / Restored: {name}")
+    return {
+        "backup": name,
+        "world": world or None,
+        "files": stats["files"],
+        "bytes": stats["bytes"],
+        "verified_files": stats["verified_files"],
+        "extract_ms": round(extract_ms, 1),
+        "swap_ms": round(swap_ms, 1),
+        "downtime_ms": round(downtime_ms, 1),
+        "server_restarted": running,
+    }
+
+
+def start_restore_job(name: str, world: str = "") -> tuple:
+    """Restore a backup in the background (single-flight). Returns (job, created)."""
+    return get_job_manager().submit(
+        "restore", lambda job: run_in_thread(job, _exclusive(lambda job: _restore_backup(job, name, world))))
+
 
 
 def run_backup() -> tuple[str, int]:
     """
     Run backup in Docker.
-    In Docker, we don't have the hytale-backup.sh script.
-    This could be implemented with a simple tar command or similar.
+    Starts a background backup job and returns at once; progress is available
+    at /api/jobs/{id}. A second call while a backup runs returns that job.
     """
-    import tarfile
-    from datetime import datetime
+    if not _universe_dir().exists():
+        return "Universe directory not found", 1
+    job, created = start_backup_job()
+    if created:
+        return f"Backup gestartet / Backup started (Job {job.id})", 0
+    return f"Backup läuft bereits / Backup already running (Job {job.id})", 0
 
-    backup_dir = SERVER_DIR / "backups"
-    universe_dir = SERVER_DIR / "universe"
 
-    if not universe_dir.exists():
-        return "Universe directory not found", 1
+async def _print_latest_version(downloader_bin: Path) -> tuple[str | None, str | None]:
+    """Ask the downloader for the latest version. Returns (version, error)."""
+    try:
+        stdout, stderr, rc = await run_command(
+            [str(downloader_bin), "-print-version"],
+            timeout=30,
+            cwd=str(downloader_bin.parent),
+        )
+    except asyncio.TimeoutError:
+        return None, "Version check timed out"
+    except OSError as e:
+        return None, f"Failed to run downloader: {e}"
+    if rc == 0 and stdout.strip():
+        return stdout.strip(), None
+    return None, f"Downloader error: {stderr.strip()}" if stderr.strip() else None
 
-    backup_dir.mkdir(parents=True, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = backup_dir / f"hytale_{timestamp}.tar.gz"
+async def _fetch_latest_version() -> tuple[str | None, str | None]:
+    downloader_bin = SERVER_DIR / ".downloader" / "hytale-downloader-linux-amd64"
+    if not downloader_bin.exists():
+        return None, "Downloader not found for version check"
+    return await _print_latest_version(downloader_bin)
 
-    try:
-        with tarfile.open(backup_file, "w:gz") as tar:
-            tar.add(universe_dir, arcname="universe")
-        return f"Backup created: {backup_file.name}", 0
-    except Exception as e:
-        return f"Backup failed: {e}", 1
 
+# Latest version from hytale-downloader -print-version, served from memory and
+# .latest_version and refreshed in the background (see version_cache.py)
+_version_cache = VersionCache(_fetch_latest_version, SERVER_DIR / ".latest_version")
+UPDATE_VERSION_MAX_AGE = 60  # seconds; an update re-checks older answers
 
-def check_version() -> dict:
+
+async def check_version_async() -> dict:
     """
     Check for updates in Docker.
-    Uses the hytale-downloader -print-version to get the latest available version.
+    The latest version comes from the version cache and never waits for
+    hytale-downloader; a stale value triggers a background refresh.
     """
-    import subprocess
-
-    downloader_dir = SERVER_DIR / ".downloader"
-    downloader_bin = downloader_dir / "hytale-downloader-linux-amd64"
     version_file = SERVER_DIR / "last_version.txt"
 
     current = "unknown"
@@ -311,58 +770,53 @@ def check_version() -> dict:
     except (PermissionError, OSError) as e:
         error = f"Could not read current version: {e}"
 
-    # Get latest available version using downloader's -print-version
-    if downloader_bin.exists():
-        try:
-            result = subprocess.run(
-                [str(downloader_bin), "-print-version"],
-                cwd=str(downloader_dir),
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode == 0 and result.stdout.strip():
-                latest = result.stdout.strip()
-                # Cache the latest version for quick access
-                try:
-                    latest_file = SERVER_DIR / ".latest_version"
-                    latest_file.write_text(latest)
-                except:
-                    pass
-            elif result.stderr:
-                error = f"Downloader error: {result.stderr.strip()}"
-        except subprocess.TimeoutExpired:
-            error = "Version check timed out"
-        except Exception as e:
-            error = f"Failed to run downloader: {e}"
-    else:
-        # Fallback: try to read cached latest version
-        try:
-            latest_file = SERVER_DIR / ".latest_version"
-            if latest_file.exists():
-                latest = latest_file.read_text().strip()
-        except:
-            pass
-        if latest == "unknown":
-            error = "Downloader not found for version check"
+    cached = _version_cache.get()
+    if cached["version"]:
+        latest = cached["version"]
+    elif cached["error"]:
+        error = error or cached["error"]
 
     return {
         "current_version": current,
         "latest_version": latest,
         "update_available": current != latest and current != "unknown" and latest != "unknown",
+        "staged_version": get_pointer(SERVER_DIR, "pending"),
+        "latest_checked": cached["checked"],
+        "latest_stale": cached["stale"],
+        "refreshing": cached["refreshing"],
         "docker_mode": True,
         "error": error,
         "message": "Im Docker wird das Update über das Dashboard 'Download starten' oder 'docker pull' durchgeführt."
     }
 
 
-def run_update() -> dict:
+def check_version() -> dict:
+    """Blocking variant of check_version_async() for callers outside the event loop."""
+    return asyncio.run(check_version_async())
+
+
+async def _watch_update_log(log_file: Path, job) -> None:
+    """Report the last "NN%" printed by the downloader as job progress."""
+    while True:
+        await asyncio.sleep(0.5)
+        try:
+            with open(log_file, "rb") as f:
+                f.seek(max(0, f.seek(0, os.SEEK_END) - 4096))
+                tail = f.read().decode("utf-8", errors="replace")
+        except OSError:
+            continue
+        matches = UPDATE_PROGRESS_RE.findall(tail)
+        if matches:
+            job.update(percent=float(matches[-1]))
+
+
+async def run_update_async(job=None) -> dict:
     """
     Run update in Docker.
     Uses the hytale-downloader to download the latest server version.
+    The download runs as a child process; the event loop stays responsive.
+    With a job, download progress parsed from the log is reported to it.
     """
-    import subprocess
-
     downloader_dir = SERVER_DIR / ".downloader"
     downloader_bin = downloader_dir / "hytale-downloader-linux-amd64"
     download_script = downloader_dir / "download.sh"
@@ -374,20 +828,8 @@ def run_update() -> dict:
             "message": "Der Hytale Downloader wurde nicht gefunden. Bitte erst auf der Setup-Seite installieren."
         }
 
-    # Get latest version first
-    latest_version = "unknown"
-    try:
-        result = subprocess.run(
-            [str(downloader_bin), "-print-version"],
-            cwd=str(downloader_dir),
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        if result.returncode == 0:
-            latest_version = result.stdout.strip()
-    except:
-        pass
+    # Get latest version first (shares a check already in flight)
+    latest_version = (await _version_cache.get_fresh(UPDATE_VERSION_MAX_AGE))["version"] or "unknown"
 
     # Run the download script (same as setup page)
     if download_script.exists():
@@ -395,17 +837,24 @@ def run_update() -> dict:
             log_file = SERVER_DIR / "logs" / "update.log"
             log_file.parent.mkdir(parents=True, exist_ok=True)
 
-            # Run download in background and capture output
             with open(log_file, "w") as f:
-                result = subprocess.run(
-                    ["/bin/bash", str(download_script)],
-                    cwd=str(downloader_dir),
-                    stdout=f,
-                    stderr=subprocess.STDOUT,
-                    timeout=600  # 10 minute timeout
-                )
-
-            if result.returncode == 0:
+                watcher = asyncio.create_task(_watch_update_log(log_file, job)) if job else None
+                try:
+                    _, _, returncode = await run_command(
+                        ["/bin/bash", str(download_script)],
+                        timeout=600,  # 10 minute timeout
+                        cwd=str(downloader_dir),
+                        # Staged: download only, the version is prepared below
+                        env={**os.environ, "HYTALE_DOWNLOAD_ONLY": "true"} if UPDATE_MODE == "staged" else None,
+                        output_file=f,
+                    )
+                finally:
+                    if watcher:
+                        watcher.cancel()
+
+            if returncode == 0 and UPDATE_MODE == "staged":
+                return await _stage_update(job, downloader_dir / "game.zip", latest_version)
+            if returncode == 0:
                 # Update the version file
                 try:
                     version_file = SERVER_DIR / "last_version.txt"
@@ -427,12 +876,12 @@ def run_update() -> dict:
                 except:
                     pass
                 return {
-                    "error": f"Download failed with code {result.returncode}",
+                    "error": f"Download failed with code {returncode}",
                     "docker_mode": True,
                     "log": log_content,
                     "message": "Update fehlgeschlagen. Siehe Log für Details."
                 }
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return {
                 "error": "Update timed out after 10 minutes",
                 "docker_mode": True,
@@ -452,6 +901,92 @@ def run_update() -> dict:
         }
 
 
+async def _stage_update(job, archive: Path, latest_version: str) -> dict:
+    """Prepare the downloaded version in versions/ while the server keeps running."""
+    version = latest_version
+    if version == "unknown":
+        version = datetime.now().strftime("unknown-%Y%m%d-%H%M%S")
+    if job:
+        stats = await run_in_thread(job, lambda job: stage_version(archive, SERVER_DIR, version, job))
+    else:
+        stats = await asyncio.to_thread(stage_version, archive, SERVER_DIR, version)
+    if not stats["staged"]:
+        message = f"Version {version} ist bereits installiert / is already installed."
+    elif not (SERVER_DIR / "Server" / "HytaleServer.jar").exists():
+        # Nothing installed yet: nothing to keep running
+        await asyncio.to_thread(_switch_version, version, "update", True)
+        message = f"Version {version} installiert / installed."
+    else:
+        message = (f"Version {version} vorbereitet ({stats['written']} Dateien geändert), wird beim nächsten "
+                   f"(Neu-)Start aktiviert / staged, activated on the next (re)start.")
+    return {"error": None, "docker_mode": True, "version": version, "staged": stats, "message": message}
+
+
+def run_update() -> dict:
+    """Blocking variant of run_update_async() for callers outside the event loop."""
+    return asyncio.run(run_update_async())
+
+
+async def _update_job(job) -> dict:
+    job.update(message="Update läuft / Update running")
+    result = await run_update_async(job)
+    job.result = result
+    if result.get("error"):
+        raise RuntimeError(result["error"])
+    job.update(message=result.get("message", ""))
+    return result
+
+
+def start_update_job() -> dict:
+    """
+    Start the update as a background job (single-flight) and return at once.
+    The response mirrors run_update() plus the job id to poll.
+    """
+    job, created = get_job_manager().submit("update", _update_job)
+    if created:
+        message = f"Update gestartet (Job {job.id}). Fortschritt: /api/jobs/{job.id}"
+    else:
+        message = f"Update läuft bereits (Job {job.id})."
+    return {"error": None, "docker_mode": True, "job_id": job.id, "job": job.to_dict(), "created": created,
+            "message": message}
+
+
+_version_lock = Lock()
+
+
+def _switch_version(version: str, action: str, start: bool) -> dict:
+    """
+    Stop the server if it runs, swap in a staged version and start the server
+    again (if it ran or `start`). Returns the history entry with the downtime.
+    """
+    def server(server_action):
+        def run():
+            output, code = _server_action(server_action)
+            if code != 0:
+                raise UpdateError(f"Server {server_action} failed: {output}")
+        return run
+
+    with _version_lock:
+        running = get_service_status().get("ActiveState") == "active"
+        return switch_version(SERVER_DIR, version, server("stop") if running else None,
+                              server("start") if running or start else None, action)
+
+
+def _rollback(job) -> dict:
+    previous = get_pointer(SERVER_DIR, "previous")
+    if not previous:
+        raise UpdateError("Keine vorherige Version / No previous version to roll back to")
+    job.update(message=f"Rollback auf / to {previous}")
+    entry = _switch_version(previous, "rollback", start=False)
+    job.update(message=f"Version {previous} aktiv / active, Downtime {entry['downtime_ms']:.0f} ms")
+    return entry
+
+
+def start_rollback_job() -> tuple:
+    """Switch back to the previous staged version in the background. Returns (job, created)."""
+    return get_job_manager().submit("rollback", lambda job: run_in_thread(job, _rollback))
+
+
 def check_auto_update() -> None:
     """
     Auto-update check in Docker.
@@ -463,69 +998,52 @@ def check_auto_update() -> None:
 def get_players_from_logs() -> list[dict]:
     """
     Parse player events from log files instead of journalctl.
+    Answered from join/leave events of the log event pipeline.
     """
-    log_file = LOG_DIR / "server.log"
-    players = {}
+    global _player_index
+    if _player_index is None:
+        _player_index = PlayerIndex(get_pipeline())
+    return _player_index.refresh()
+
 
-    # Regex patterns for player join/leave events
-    # Log format: [2026/01/26 19:00:36   INFO] Adding player 'Name' to world 'default' at location ... (uuid)
-    join_re = re.compile(
-        r"\[?(\d{4}[/-]\d{2}[/-]\d{2}[T ]\d{2}:\d{2}:\d{2}).*Adding player '([^']+)' to world '([^']+)' at location .+\(([a-f0-9-]+)\)"
-    )
-    leave_re = re.compile(
-        r"\[?(\d{4}[/-]\d{2}[/-]\d{2}[T ]\d{2}:\d{2}:\d{2}).*Removing player '([^']+?)(?:\s*\([^)]+\))?'.*\(([a-f0-9-]+)\)"
-    )
+def get_console_update(since: str = "") -> dict:
+    """
+    Get console lines written after the `since` cursor.
+
+    An empty or unknown `since` returns the last CONSOLE_LINES lines. The
+    returned cursor must be passed back on the next poll; "reset" is set when
+    the log was truncated or rotated since the previous cursor.
+    """
+    log_file = LOG_DIR / "server.log"
 
     if not log_file.exists():
-        return []
+        return {
+            "lines": ["[Log file not found - server may not have started yet]"],
+            "cursor": "",
+            "reset": False,
+            "more": False,
+        }
 
     try:
-        with open(log_file, "r", encoding="utf-8", errors="replace") as f:
-            for raw_line in f:
-                # Strip ANSI codes before parsing
-                line = strip_ansi(raw_line)
-
-                m = join_re.search(line)
-                if m:
-                    ts, name, world, uuid = m.group(1), m.group(2), m.group(3), m.group(4)
-                    players[uuid] = {
-                        "name": name, "uuid": uuid,
-                        "online": True, "last_login": ts,
-                        "last_logout": None, "world": world, "position": None,
-                    }
-                    continue
-
-                m = leave_re.search(line)
-                if m:
-                    ts, name, uuid = m.group(1), m.group(2), m.group(3)
-                    if uuid in players:
-                        players[uuid]["online"] = False
-                        players[uuid]["last_logout"] = ts
-    except (PermissionError, OSError):
-        pass
+        # The event pipeline's buffer answers recent cursors without file I/O
+        update = get_pipeline().lines_since(since, CONSOLE_LINES)
+        if update is not None:
+            return update
+        update = read_since(log_file, since, initial_lines=CONSOLE_LINES)
+    except (PermissionError, OSError) as e:
+        return {"lines": [f"[Error reading log: {e}]"], "cursor": since, "reset": False, "more": False}
 
-    return list(players.values())
+    # Strip ANSI codes
+    update["lines"] = [strip_ansi(line.rstrip()) for line in update["lines"]]
+    return update
 
 
 def get_console_output(since: str = "") -> list[str]:
     """
     Get console output from log file instead of journalctl.
+    Honors `since` when it is a cursor from get_console_update().
     """
-    log_file = LOG_DIR / "server.log"
-    lines = []
-
-    if not log_file.exists():
-        return ["[Log file not found - server may not have started yet]"]
-
-    try:
-        with open(log_file, "r", encoding="utf-8", errors="replace") as f:
-            all_lines = f.readlines()
-            # Return last 50 lines, strip ANSI codes
-            lines = [strip_ansi(line.rstrip()) for line in all_lines[-50:]]
-    except (PermissionError, OSError) as e:
-        lines = [f"[Error reading log: {e}]"]
-
-    return lines
+    return get_console_update(since)["lines"]
 
 
 def get_port_mappings() -> dict:
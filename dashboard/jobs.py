@@ -0,0 +1,210 @@
+"""
+Background jobs for long dashboard operations (backups, updates).
+
+Jobs run on a dedicated event loop thread, so starting one returns at once
+and never holds a request worker or the uvicorn event loop. Each job type is
+single-flight: submitting a type that is already queued or running returns
+the existing job. Progress (bytes/files processed) and the final result are
+kept in an in-memory job table, polled through /api/jobs/{id}.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+MAX_FINISHED = 50  # finished jobs kept in the table
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = {QUEUED, RUNNING}
+
+
+class JobCancelled(Exception):
+    """Raised inside job work when the job was cancelled."""
+
+
+class Job:
+    """One background operation and its progress."""
+
+    def __init__(self, job_type: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.type = job_type
+        self.state = QUEUED
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.files_total = 0
+        self.percent = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._task = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if cancellation was requested (for thread workers)."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def update(self, message: str | None = None, percent: float | None = None, **counters) -> None:
+        """
+        Report progress. counters: bytes_done, bytes_total, files_done, files_total.
+        Without an explicit percent it is derived from bytes, else from files.
+        """
+        with self._lock:
+            if message is not None:
+                self.message = message
+            for key, value in counters.items():
+                setattr(self, key, value)
+            if percent is not None:
+                self.percent = percent
+            elif self.bytes_total:
+                self.percent = self.bytes_done * 100 / self.bytes_total
+            elif self.files_total:
+                self.percent = self.files_done * 100 / self.files_total
+            if self.percent is not None:
+                self.percent = round(min(100.0, self.percent), 1)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "type": self.type,
+                "state": self.state,
+                "message": self.message,
+                "percent": self.percent,
+                "bytes_done": self.bytes_done,
+                "bytes_total": self.bytes_total,
+                "files_done": self.files_done,
+                "files_total": self.files_total,
+                "result": self.result,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }
+
+
+class JobManager:
+    """Job table plus the event loop thread that runs the jobs."""
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="jobs", daemon=True)
+            thread.start()
+            self._loop = loop
+        return self._loop
+
+    def submit(self, job_type: str, func) -> tuple[Job, bool]:
+        """
+        Start `await func(job)` in the background unless a job of this type is
+        already active. Thread-safe; returns immediately.
+
+        Returns:
+            tuple: (job, created) - created is False if an active job was reused
+        """
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.type == job_type and job.state in ACTIVE_STATES:
+                    return job, False
+            job = Job(job_type)
+            self._jobs[job.id] = job
+            self._prune()
+            loop = self._ensure_loop()
+        asyncio.run_coroutine_threadsafe(self._run(job, func), loop)
+        return job, True
+
+    async def _run(self, job: Job, func) -> None:
+        job._task = asyncio.current_task()
+        job.state = RUNNING
+        job.started = time.time()
+        try:
+            if job.cancelled:
+                raise JobCancelled()
+            job.result = await func(job)
+            job.state = SUCCEEDED
+            job.update(percent=100.0)
+        except (JobCancelled, asyncio.CancelledError):
+            job.state = CANCELLED
+            job.message = "Abgebrochen / Cancelled"
+        except Exception as e:
+            job.state = FAILED
+            job.error = str(e)
+            print(f"[jobs] {job.type} job {job.id} failed: {e}")
+        finally:
+            job.finished = time.time()
+            job._task = None
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.state not in ACTIVE_STATES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation. Returns False if the job is unknown or already finished."""
+        job = self.get(job_id)
+        if job is None or job.state not in ACTIVE_STATES:
+            return False
+        job._cancel.set()
+        task = job._task
+        if task is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+        return True
+
+
+async def run_in_thread(job: Job, fn, *args):
+    """
+    Run blocking fn(job, *args) in a worker thread. fn should call
+    job.check_cancelled() regularly; on cancellation this waits until it has
+    stopped (and cleaned up) before the job is reported as cancelled.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(fn, job, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        job._cancel.set()
+        try:
+            await future
+        except Exception:
+            pass
+        raise
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
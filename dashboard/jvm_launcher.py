@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+JVM options for the Hytale server, sized from the container's limits.
+
+start.sh used to run java with only -Xms/-Xmx from HYTALE_MEMORY_MIN/MAX.
+A heap that ignores the container's memory limit gets the server OOM-killed
+(or leaves most of a large limit unused), and the JVM picks its GC and
+thread counts from the host.
+
+The memory and CPU limits are read from cgroup v2 (memory.max, cpu.max) or
+v1 (memory.limit_in_bytes, cpu.cfs_quota_us), along with the CPU affinity.
+From the memory limit, minus OTHER_PROCESSES for the dashboard and the other
+processes in the container, come:
+
+    metaspace       5 % (128 MB - 512 MB)
+    direct memory   10 % (128 MB - 1 GB; network buffers)
+    code cache      240 MB
+    native          256 MB (thread stacks, GC and symbol tables)
+    heap            the rest, less the GC's own overhead (G1 5 %, ZGC 3 %)
+
+HYTALE_MEMORY_MAX / HYTALE_MEMORY_MIN given as sizes (4G, 3072M) set the
+heap as before; "auto" derives it (-Xms = -Xmx). Without a memory limit the
+old defaults apply (2G - 4G). A heap that does not fit the limit is reported.
+
+Profiles (HYTALE_JVM_PROFILE, or "jvm_profile" set from the dashboard):
+
+    auto     G1 below 8 GB of heap or 4 CPUs, generational ZGC above
+    g1       G1 with a 50 ms pause target
+    zgc      generational ZGC (pauses under a millisecond, needs spare CPUs)
+    legacy   only -Xms/-Xmx, as before
+
+All profiles but legacy set ActiveProcessorCount and the GC thread counts
+from the CPU limit, and exit on OutOfMemoryError (the runner restarts the
+server). They also map the class data sharing archive of the installed
+version, or record one on the first start (cds_archive.py). HYTALE_JVM_OPTS
+is appended as is.
+
+Usage:
+    python3 jvm_launcher.py options [--profile NAME] [--record FILE] [-- JAVA ARGS...]
+        one JVM option per line (start.sh); --record saves the plan and
+        the full command line as JSON
+    python3 jvm_launcher.py show [--profile NAME]
+"""
+
+import argparse
+import json
+import math
+import os
+import shlex
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import cds_archive
+
+SERVER_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+CONFIG_FILE = SERVER_DIR / ".dashboard_config.json"
+RECORD_FILE = SERVER_DIR / ".jvm_command.json"
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+MB = 1024 ** 2
+GB = 1024 ** 3
+OTHER_PROCESSES = 384 * MB
+CODE_CACHE = 240 * MB
+NATIVE_BASE = 256 * MB
+GC_OVERHEAD = {"g1": 0.05, "zgc": 0.03}
+MIN_HEAP = 512 * MB
+DEFAULT_HEAP_MIN = 2 * GB  # without a memory limit, as before
+DEFAULT_HEAP_MAX = 4 * GB
+ZGC_MIN_HEAP = 8 * GB
+ZGC_MIN_CPUS = 4
+G1_PAUSE_MS = 50
+
+PROFILES = {
+    "auto": "G1 below 8 GB of heap or 4 CPUs, generational ZGC above",
+    "g1": "G1, 50 ms pause target",
+    "zgc": "Generational ZGC, sub-millisecond pauses (needs spare CPUs)",
+    "legacy": "Only -Xms/-Xmx from HYTALE_MEMORY_MIN/MAX",
+}
+
+
+def parse_size(text) -> int | None:
+    """Bytes of a JVM-style size (4G, 512m, 1048576); None for "auto", empty or invalid."""
+    text = str(text or "").strip().upper()
+    units = {"K": 1024, "M": MB, "G": GB, "T": 1024 * GB}
+    try:
+        if text[-1:] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        return None
+
+
+def _mb(size: int) -> str:
+    return f"{size // MB}m"
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dirs(controller: str | None) -> list[Path]:
+    """Candidate cgroup directories of this process (own path first, then the mount root)."""
+    own = None
+    for line in (_read(Path("/proc/self/cgroup")) or "").splitlines():
+        hierarchy, controllers, path = line.split(":", 2)
+        if (controller is None and hierarchy == "0") or (controller and controller in controllers.split(",")):
+            own = path.lstrip("/")
+    base = CGROUP_ROOT if controller is None else CGROUP_ROOT / controller
+    return [base / own, base] if own else [base]
+
+
+def host_memory() -> int:
+    for line in (_read(Path("/proc/meminfo")) or "").splitlines():
+        if line.startswith("MemTotal:"):
+            return int(line.split()[1]) * 1024
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def memory_limit() -> int | None:
+    """Container memory limit in bytes (None without one)."""
+    limits = []
+    for directory in _cgroup_dirs(None):
+        value = _read(directory / "memory.max")
+        if value is not None:
+            limits.append(None if value == "max" else int(value))
+            break
+    for directory in _cgroup_dirs("memory"):
+        value = _read(directory / "memory.limit_in_bytes")
+        if value is not None:
+            limits.append(int(value))
+            break
+    limits = [limit for limit in limits if limit is not None and limit < host_memory()]
+    return min(limits) if limits else None
+
+
+def cpu_limit() -> float | None:
+    """CPUs allowed by the CFS quota (None without one)."""
+    for directory in _cgroup_dirs(None):
+        value = _read(directory / "cpu.max")
+        if value is not None:
+            quota, _, period = value.partition(" ")
+            return None if quota == "max" else int(quota) / int(period or 100000)
+    for directory in _cgroup_dirs("cpu"):
+        quota = _read(directory / "cpu.cfs_quota_us")
+        period = _read(directory / "cpu.cfs_period_us")
+        if quota is not None and period is not None:
+            return None if int(quota) <= 0 else int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs the server may use: the affinity mask, capped by the CFS quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    quota = cpu_limit()
+    return max(1, min(cpus, math.ceil(quota))) if quota else cpus
+
+
+def java_release() -> dict:
+    """Fields of the release file of the java on PATH (no fork); empty if unknown."""
+    java = shutil.which("java")
+    if java is None:
+        return {}
+    release = _read(Path(java).resolve().parent.parent / "release") or ""
+    return {key: value.strip('"') for key, _, value in (line.partition("=") for line in release.splitlines()) if value}
+
+
+def java_version() -> int | None:
+    """Feature version of the java on PATH."""
+    try:
+        return int(java_release().get("JAVA_VERSION", "").split(".")[0])
+    except ValueError:
+        return None
+
+
+def selected_profile() -> tuple[str, str]:
+    """(profile, where it was set): dashboard config, then HYTALE_JVM_PROFILE."""
+    try:
+        profile = json.loads(CONFIG_FILE.read_text()).get("jvm_profile")
+        if profile in PROFILES:
+            return profile, "dashboard"
+    except (OSError, ValueError, AttributeError):
+        pass
+    profile = os.environ.get("HYTALE_JVM_PROFILE", "auto").strip().lower()
+    return (profile, "env") if profile in PROFILES else ("auto", "default")
+
+
+def _clamp(value: float, low: int, high: int) -> int:
+    return int(min(high, max(low, value)))
+
+
+def plan(profile: str | None = None) -> dict:
+    """
+    JVM options for the given (or the selected) profile, with the limits and
+    budgets they were derived from.
+
+    Returns:
+        dict: profile, source, gc, limits, budgets, options, warnings
+    """
+    source = "request"
+    if profile is None:
+        profile, source = selected_profile()
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown JVM profile: {profile}")
+    limit = memory_limit()
+    cpus = available_cpus()
+    warnings = []
+
+    heap_max = parse_size(os.environ.get("HYTALE_MEMORY_MAX"))
+    heap_min = parse_size(os.environ.get("HYTALE_MEMORY_MIN"))
+    available = (limit if limit else host_memory()) - OTHER_PROCESSES
+    metaspace = _clamp(available * 0.05, 128 * MB, 512 * MB)
+    direct = _clamp(available * 0.10, 128 * MB, GB)
+    fixed = metaspace + direct + CODE_CACHE + NATIVE_BASE
+
+    gc = profile
+    if profile in ("auto", "legacy"):
+        # Sized for G1 first; ZGC only pays off for large heaps with CPUs to spare
+        gc = "g1"
+    if heap_max is None:
+        if limit:
+            heap_max = int((available - fixed) / (1 + GC_OVERHEAD[gc])) // (64 * MB) * 64 * MB
+            if heap_max < MIN_HEAP:
+                warnings.append(f"Memory limit {_mb(limit)} leaves only {_mb(max(heap_max, 0))} for the heap; "
+                                f"using {_mb(MIN_HEAP)}")
+                heap_max = MIN_HEAP
+        else:
+            heap_max = min(DEFAULT_HEAP_MAX, host_memory() // 2 // (64 * MB) * 64 * MB)
+            heap_min = heap_min or min(DEFAULT_HEAP_MIN, heap_max)
+    if profile == "auto" and heap_max >= ZGC_MIN_HEAP and cpus >= ZGC_MIN_CPUS:
+        gc = "zgc"
+    heap_min = min(heap_min or heap_max, heap_max)
+
+    needed = int(heap_max * (1 + GC_OVERHEAD[gc])) + fixed + OTHER_PROCESSES
+    if limit and needed > limit:
+        warnings.append(f"Heap {_mb(heap_max)} needs about {_mb(needed)} with the JVM's other memory "
+                        f"and the dashboard, more than the memory limit {_mb(limit)}")
+
+    options = [f"-Xms{_mb(heap_min)}", f"-Xmx{_mb(heap_max)}"]
+    if profile == "legacy":
+        gc = None
+    else:
+        parallel = cpus if cpus <= 8 else 8 + (cpus - 8) * 5 // 8
+        options += [
+            f"-XX:MaxMetaspaceSize={_mb(metaspace)}",
+            f"-XX:MaxDirectMemorySize={_mb(direct)}",
+            f"-XX:ReservedCodeCacheSize={_mb(CODE_CACHE)}",
+            f"-XX:ActiveProcessorCount={cpus}",
+            f"-XX:ParallelGCThreads={parallel}",
+        ]
+        if gc == "zgc":
+            options += ["-XX:+UseZGC", f"-XX:ConcGCThreads={max(1, cpus // 4)}"]
+            if java_version() in (21, 22):
+                options.append("-XX:+ZGenerational")  # the default (and only mode) from 23 on
+        else:
+            options += ["-XX:+UseG1GC", f"-XX:MaxGCPauseMillis={G1_PAUSE_MS}",
+                        f"-XX:ConcGCThreads={max(1, (parallel + 2) // 4)}", "-XX:+ParallelRefProcEnabled"]
+        options += ["-XX:+DisableExplicitGC", "-XX:+ExitOnOutOfMemoryError"]
+    extra = shlex.split(os.environ.get("HYTALE_JVM_OPTS", ""))
+    if profile == "legacy":
+        cds = {"mode": "off", "reason": "legacy profile", "archive": None, "fingerprint": None, "options": []}
+    else:
+        release = java_release()
+        cds = cds_archive.jvm_options(SERVER_DIR, release.get("JAVA_RUNTIME_VERSION") or release.get("JAVA_VERSION"),
+                                      java_version(), gc, extra)
+    options += cds["options"] + extra
+
+    return {
+        "profile": profile,
+        "source": source,
+        "gc": gc,
+        "limits": {"memory": limit, "host_memory": host_memory(), "cpus": cpus, "cpu_quota": cpu_limit(),
+                   "java": java_version()},
+        "budgets": {"heap_min": heap_min, "heap_max": heap_max, "metaspace": metaspace, "direct": direct,
+                    "code_cache": CODE_CACHE, "native": NATIVE_BASE, "other_processes": OTHER_PROCESSES},
+        "options": options,
+        "cds": cds,
+        "warnings": warnings,
+    }
+
+
+def last_command() -> dict | None:
+    """Plan and command line recorded by the last server start."""
+    try:
+        return json.loads(RECORD_FILE.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv: list[str]) -> int:
+    java_args = []
+    if "--" in argv:
+        java_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=("options", "show"))
+    parser.add_argument("--profile", choices=sorted(PROFILES))
+    parser.add_argument("--record", type=Path)
+    args = parser.parse_args(argv)
+
+    result = plan(args.profile)
+    if args.action == "show":
+        print(json.dumps(result, indent=2))
+        return 0
+    for warning in result["warnings"]:
+        print(f"[jvm_launcher] WARNING: {warning}", file=sys.stderr)
+    limit = result["limits"]["memory"]
+    print(f"[jvm_launcher] profile {result['profile']} ({result['source']}): {result['gc'] or 'JVM default'} GC, "
+          f"heap {_mb(result['budgets']['heap_max'])}, memory limit {_mb(limit) if limit else 'none'}, "
+          f"{result['limits']['cpus']} CPUs", file=sys.stderr)
+    cds = result["cds"]
+    print(f"[jvm_launcher] class data sharing: {cds['mode']}"
+          + (f" ({cds['reason']})" if cds["reason"] else "") + (f", {cds['archive']}" if cds["archive"] else ""),
+          file=sys.stderr)
+    if args.record:
+        # start.sh execs java next, so the JVM gets its pid
+        record = {**result, "command": ["java", *result["options"], *java_args], "recorded": time.time(),
+                  "pid": os.getppid()}
+        tmp = args.record.with_name(args.record.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(record, indent=2))
+            os.replace(tmp, args.record)
+        except OSError as e:
+            print(f"[jvm_launcher] Could not record the command line: {e}", file=sys.stderr)
+    print("\n".join(result["options"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,458 @@
+"""
+Structured event pipeline for the Hytale server log.
+
+A single ingestion stage tails logs/server.log once, strips ANSI codes and
+classifies every line into a typed event (join, leave, warn, error, chat,
+command, lag, ready, or plain log). Events go into an in-memory ring buffer;
+typed events are additionally appended to logs/events.jsonl. Consumers
+(console output, log panel, player list, live stream) query the buffer or
+subscribe to new events instead of re-reading and re-parsing the log.
+
+The ingest position is checkpointed in $HYTALE_DIR/.event_pipeline.json, so a
+dashboard restart only processes what was logged while it was down.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+from log_rotation import find_segment, line_timestamp, open_segment
+from log_tail import decode_cursor, encode_cursor, strip_ansi
+
+SERVER_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+RING_SIZE = int(os.environ.get("HYTALE_EVENT_RING_SIZE", "2000"))
+SPILL_MAX_BYTES = 16 * 1024 * 1024
+READ_CHUNK = 4 * 1024 * 1024
+# Lines longer than READ_CHUNK (stack dumps, binary garbage) are cut to this
+MAX_LINE_BYTES = 64 * 1024
+# When catching up on a backlog, only this many trailing bytes are fully
+# classified (to fill the ring buffer); older bytes are scanned for typed
+# events only.
+FULL_WINDOW_BYTES = 1024 * 1024
+CHECKPOINT_VERSION = 1
+
+# Log format: [2026/01/26 19:00:36   INFO] Adding player 'Name' to world 'default' at location ... (uuid)
+LEVEL_RE = re.compile(r"^\[\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}\s+(\w+)\]")
+JOIN_RE = re.compile(
+    r"\[?(\d{4}[/-]\d{2}[/-]\d{2}[T ]\d{2}:\d{2}:\d{2}).*Adding player '([^']+)' to world '([^']+)' at location .+\(([a-f0-9-]+)\)"
+)
+LEAVE_RE = re.compile(
+    r"\[?(\d{4}[/-]\d{2}[/-]\d{2}[T ]\d{2}:\d{2}:\d{2}).*Removing player '([^']+?)(?:\s*\([^)]+\))?'.*\(([a-f0-9-]+)\)"
+)
+READY_RE = re.compile(r"Server started|Hytale Server Booted|Done \(\d|Listening on")
+LAG_RE = re.compile(r"Can't keep up|running behind|overloaded|[Tt]ick took (\d+)\s?ms")
+COMMAND_RE = re.compile(r"(?:(\S+) (?:issued|executed) (?:server )?command:?\s*|^> )(/?\S.*)$")
+CHAT_RE = re.compile(r"\]\s*(?:\[Chat\]\s*)?<([^>]+)>\s(.*)$")
+
+ERROR_LEVELS = {"SEVERE", "ERROR", "FATAL"}
+WARN_LEVELS = {"WARN", "WARNING"}
+
+# Byte patterns that can only match lines of a typed event. Used to skip plain
+# lines quickly when catching up on a large backlog. Kept as separate literal
+# searches: one alternation regex is several times slower on large buffers.
+SPARSE_NEEDLES = [re.compile(p) for p in (
+    rb"Adding player '", rb"Removing player '", rb"Server started", rb"Hytale Server Booted",
+    rb"Done \(", rb"Listening on", rb"Can't keep up", rb"running behind", rb"overloaded",
+    rb"ick took", rb"command", rb"> ",  # "> " covers console echo and <player> chat
+    rb" SEVERE\]", rb" ERROR\]", rb" FATAL\]", rb" WARN\]", rb" WARNING\]",
+)]
+
+
+def _candidate_lines(data: bytes, end: int) -> list[tuple[int, int]]:
+    """(start, end) of lines in data[:end] that may hold a typed event, in order."""
+    lines = {}
+    for needle in SPARSE_NEEDLES:
+        for m in needle.finditer(data, 0, end):
+            line_start = data.rfind(b"\n", 0, m.start()) + 1
+            if line_start not in lines:
+                lines[line_start] = data.find(b"\n", m.start())
+    return sorted(lines.items())
+
+
+def _next_newline(f, start: int, end: int) -> int | None:
+    """Offset of the first newline in [start, end) of f, or None."""
+    f.seek(start)
+    pos = start
+    while pos < end:
+        block = f.read(min(1024 * 1024, end - pos))
+        if not block:
+            return None
+        idx = block.find(b"\n")
+        if idx != -1:
+            return pos + idx
+        pos += len(block)
+    return None
+
+
+def classify(line: str) -> dict:
+    """Classify one ANSI-stripped log line into an event dict."""
+    ts = None
+    level = None
+    m = LEVEL_RE.match(line)
+    if m:
+        level = m.group(1).upper()
+    event = {"type": "log", "ts": ts, "level": level, "line": line}
+
+    m = JOIN_RE.search(line)
+    if m:
+        event.update(type="join", ts=m.group(1), name=m.group(2), world=m.group(3), uuid=m.group(4))
+        return event
+    m = LEAVE_RE.search(line)
+    if m:
+        event.update(type="leave", ts=m.group(1), name=m.group(2), uuid=m.group(3))
+        return event
+    if READY_RE.search(line):
+        event["type"] = "ready"
+    elif (m := LAG_RE.search(line)):
+        event["type"] = "lag"
+        if m.group(1):
+            event["tick_ms"] = int(m.group(1))
+    elif (m := COMMAND_RE.search(line)):
+        event.update(type="command", source=m.group(1) or "console", command=m.group(2))
+    elif (m := CHAT_RE.search(line)):
+        event.update(type="chat", player=m.group(1), message=m.group(2))
+    elif level in ERROR_LEVELS:
+        event["type"] = "error"
+    elif level in WARN_LEVELS:
+        event["type"] = "warn"
+    return event
+
+
+class EventBatch(list):
+    """
+    The events of one ingested chunk; since and cursor bound the bytes it
+    covers. A batch from a backlog scan is not dense: it only has the typed
+    lines of that range.
+    """
+    since = ""
+    cursor = ""
+    dense = True
+
+
+class EventPipeline:
+    """Single-pass log ingestion with ring buffer, spill file and subscribers."""
+
+    def __init__(self, log_file: Path, checkpoint_file: Path, spill_file: Path, ring_size: int = RING_SIZE):
+        self.log_file = Path(log_file)
+        self.checkpoint_file = Path(checkpoint_file)
+        self.spill_file = Path(spill_file)
+        # Ring entries: (inode, start_offset, end_offset, dense, event). Entries
+        # from a backlog scan are not dense: plain lines around them were skipped.
+        self._ring = deque(maxlen=ring_size)
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._inode = None
+        self._offset = 0
+        self._seq = 0
+        self._loaded = False
+        self._thread = None
+
+    # -- checkpoint ------------------------------------------------------
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            with open(self.checkpoint_file, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CHECKPOINT_VERSION:
+                self._inode, self._offset, self._seq = data["inode"], data["offset"], data["seq"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, PermissionError, OSError):
+            self._inode, self._offset, self._seq = None, 0, 0
+
+    def _save(self) -> None:
+        data = {"version": CHECKPOINT_VERSION, "inode": self._inode, "offset": self._offset, "seq": self._seq}
+        tmp = self.checkpoint_file.with_name(self.checkpoint_file.name + ".tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.checkpoint_file)
+        except (PermissionError, OSError) as e:
+            print(f"[log_events] Failed to save checkpoint: {e}")
+
+    # -- ingestion -------------------------------------------------------
+
+    def _emit(self, inode: int, start: int, end: int, raw: bytes, batch: list, spill: list,
+              dense: bool = True) -> None:
+        line = strip_ansi(raw.decode("utf-8", errors="replace").rstrip())
+        event = classify(line)
+        if event["ts"] is None:
+            event["ts"] = line_timestamp(raw)
+        self._seq += 1
+        event["seq"] = self._seq
+        event["cursor"] = encode_cursor(inode, end)
+        self._ring.append((inode, start, end, dense, event))
+        batch.append(event)
+        if event["type"] != "log":
+            spill.append(event)
+
+    def _ingest(self, f, inode: int, start: int, end: int) -> int:
+        """Process complete lines in [start, end) of f; return the new offset."""
+        batch, spill = EventBatch(), []
+        full_from = max(start, end - FULL_WINDOW_BYTES)
+        offset = start
+        f.seek(start)
+        while offset < end:
+            data = f.read(min(READ_CHUNK, end - offset))
+            if not data:
+                break
+            cut = data.rfind(b"\n")
+            if cut == -1:
+                if len(data) < READ_CHUNK:
+                    break  # incomplete trailing line
+                # A line longer than a whole chunk: keep its start, skip the rest
+                line_end = _next_newline(f, offset + len(data), end)
+                if line_end is None:
+                    break  # not complete yet
+                self._emit(inode, offset, line_end + 1, data[:MAX_LINE_BYTES], batch, spill,
+                           dense=offset >= full_from)
+                cut = line_end - offset
+            elif offset + cut + 1 <= full_from:
+                # Backlog: jump between candidate lines only.
+                for line_start, line_end in _candidate_lines(data, cut):
+                    self._emit(inode, offset + line_start, offset + line_end + 1,
+                               data[line_start:line_end], batch, spill, dense=False)
+            else:
+                pos = 0
+                while pos <= cut:
+                    line_end = data.find(b"\n", pos)
+                    raw = data[pos:line_end]
+                    if offset + pos >= full_from:
+                        self._emit(inode, offset + pos, offset + line_end + 1, raw, batch, spill)
+                    elif any(needle.search(raw) for needle in SPARSE_NEEDLES):
+                        self._emit(inode, offset + pos, offset + line_end + 1, raw, batch, spill, dense=False)
+                    pos = line_end + 1
+            batch.since = encode_cursor(inode, offset)
+            batch.dense = offset >= full_from
+            offset += cut + 1
+            batch.cursor = encode_cursor(inode, offset)
+            f.seek(offset)
+            self._flush(batch, spill)
+            batch, spill = EventBatch(), []
+        return offset
+
+    def _flush(self, batch: list, spill: list) -> None:
+        if spill:
+            try:
+                with open(self.spill_file, "a") as f:
+                    for event in spill:
+                        f.write(json.dumps(event) + "\n")
+                if self.spill_file.stat().st_size > SPILL_MAX_BYTES:
+                    self._compact_spill()
+            except (PermissionError, OSError) as e:
+                print(f"[log_events] Failed to write spill file: {e}")
+        if batch:
+            for callback in list(self._subscribers):
+                try:
+                    callback(batch)
+                except Exception as e:
+                    print(f"[log_events] Subscriber failed: {e}")
+
+    def _compact_spill(self) -> None:
+        """Keep the newest join/leave per player and the newest half of other events."""
+        events = list(self.replay())
+        keep = {}
+        for event in events:
+            if event["type"] in ("join", "leave"):
+                keep[(event["uuid"], event["type"])] = event["seq"]
+        others = [e["seq"] for e in events if e["type"] not in ("join", "leave")]
+        keep_seqs = set(keep.values()) | set(others[len(others) // 2:])
+        tmp = self.spill_file.with_name(self.spill_file.name + ".tmp")
+        with open(tmp, "w") as f:
+            for event in events:
+                if event["seq"] in keep_seqs:
+                    f.write(json.dumps(event) + "\n")
+        os.replace(tmp, self.spill_file)
+
+    def pump(self) -> None:
+        """Ingest everything appended since the last checkpoint."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            try:
+                with open(self.log_file, "rb") as f:
+                    st = os.fstat(f.fileno())
+                    if st.st_ino != self._inode:
+                        self._drain_rotated()
+                        self._inode, self._offset = st.st_ino, 0
+                    elif st.st_size < self._offset:
+                        self._offset = 0  # truncated
+                    if st.st_size > self._offset:
+                        new_offset = self._ingest(f, st.st_ino, self._offset, st.st_size)
+                        if new_offset != self._offset:
+                            self._offset = new_offset
+                            self._save()
+            except FileNotFoundError:
+                pass
+            except (PermissionError, OSError) as e:
+                print(f"[log_events] Failed to read {self.log_file}: {e}")
+
+    def _drain_rotated(self) -> None:
+        """Ingest the unread tail of the previous live file from the log archive."""
+        if self._inode is None:
+            return
+        for _ in range(2):  # the segment may be renamed by compression meanwhile
+            entry = find_segment(self.log_file, self._inode)
+            if entry is None or self._offset >= entry.get("bytes", 0):
+                return
+            try:
+                with open_segment(self.log_file, entry) as f:
+                    self._ingest(f, self._inode, self._offset, entry["bytes"])
+                return
+            except FileNotFoundError:
+                continue
+            except (PermissionError, OSError, EOFError) as e:
+                print(f"[log_events] Could not read rotated segment {entry.get('file')}: {e}")
+                return
+
+    def _run(self) -> None:
+        from log_stream import POLL_INTERVAL, _Inotify
+
+        try:
+            watcher = _Inotify(self.log_file.parent)
+        except (OSError, AttributeError) as e:
+            print(f"[log_events] inotify unavailable ({e}), polling every {POLL_INTERVAL}s")
+            watcher = None
+        while True:
+            self.pump()
+            if watcher is not None:
+                while not watcher.wait(self.log_file.name, timeout=60):
+                    pass
+            else:
+                threading.Event().wait(POLL_INTERVAL)
+
+    def start(self) -> None:
+        """Start the background ingestion thread (idempotent)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-events", daemon=True)
+                self._thread.start()
+
+    # -- subscriptions ---------------------------------------------------
+
+    def subscribe(self, callback, replay_types: set | None = None) -> None:
+        """
+        Call callback(events) from the ingestion thread for each new batch
+        (an EventBatch: the events of the byte range events.since to
+        events.cursor of the log).
+        With replay_types, spilled events of those types are delivered first,
+        atomically with the subscription, so no event is missed or repeated.
+        """
+        with self._lock:
+            if replay_types:
+                callback(list(self.replay(replay_types)))
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    # -- queries ---------------------------------------------------------
+
+    def catch_up(self) -> None:
+        """
+        Ingest before answering, but only without the background thread
+        (standalone use). With start(), queries read the ring as the thread
+        left it and never block on a backlog ingest.
+        """
+        if self._thread is None:
+            self.pump()
+
+    def recent(self, n: int, types: set | None = None) -> list[dict]:
+        """Return up to n newest events (optionally filtered by type), oldest first."""
+        self.catch_up()
+        with self._lock:
+            entries = list(self._ring)
+        if n <= 0:
+            return []
+        if types is None:
+            return [entry[4] for entry in entries[-n:]]
+        out = [entry[4] for entry in reversed(entries) if entry[4]["type"] in types]
+        return out[:n][::-1]
+
+    def _dense_tail(self, entries: list[tuple] | None = None) -> list[tuple]:
+        """Ring entries after the last gap (i.e. a contiguous run of log lines)."""
+        if entries is None:
+            with self._lock:
+                entries = list(self._ring)
+        for i in range(len(entries) - 1, -1, -1):
+            if not entries[i][3]:
+                return entries[i + 1:]
+        return entries
+
+    def recent_lines(self, n: int) -> list[str]:
+        """
+        Return up to n newest log lines (ANSI-stripped) from the contiguous
+        part of the buffer. Fewer than n lines means the buffer cannot answer.
+        """
+        self.catch_up()
+        return [entry[4]["line"] for entry in self._dense_tail()[-n:]] if n > 0 else []
+
+    def lines_since(self, cursor: str, initial_lines: int = 50) -> dict | None:
+        """
+        Console lines after a log cursor, answered from the ring buffer.
+        Returns None when the cursor is outside the contiguous part of the
+        buffer (caller falls back to reading the file).
+        """
+        self.catch_up()
+        # One snapshot: lines appended after it must not be returned with the older cursor
+        with self._lock:
+            current = encode_cursor(self._inode, self._offset) if self._inode is not None else ""
+            at_end = decode_cursor(cursor) == (self._inode, self._offset)
+            entries = list(self._ring)
+        entries = self._dense_tail(entries)
+        if not cursor:
+            if len(entries) < initial_lines:
+                return None
+            return {"lines": [e[4]["line"] for e in entries[-initial_lines:]] if initial_lines > 0 else [],
+                    "cursor": current, "reset": False, "more": False}
+        if at_end:
+            return {"lines": [], "cursor": current, "reset": False, "more": False}
+        position = decode_cursor(cursor)
+        if position is None:
+            return None
+        for i in range(len(entries) - 1, -1, -1):
+            e_inode, e_start, e_end = entries[i][:3]
+            if (e_inode, e_end) == position:
+                return {"lines": [e[4]["line"] for e in entries[i + 1:]], "cursor": current,
+                        "reset": False, "more": False}
+            if (e_inode, e_start) == position:
+                return {"lines": [e[4]["line"] for e in entries[i:]], "cursor": current,
+                        "reset": False, "more": False}
+        return None
+
+    def replay(self, types: set | None = None):
+        """Yield spilled events (optionally filtered by type) from the JSONL file."""
+        try:
+            with open(self.spill_file, "r") as f:
+                for raw in f:
+                    try:
+                        event = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue
+                    if types is None or event.get("type") in types:
+                        yield event
+        except (FileNotFoundError, PermissionError, OSError):
+            return
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> EventPipeline:
+    """Return the process-wide pipeline for logs/server.log, starting it on first use."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            log_dir = SERVER_DIR / "logs"
+            _pipeline = EventPipeline(
+                log_dir / "server.log",
+                SERVER_DIR / ".event_pipeline.json",
+                log_dir / "events.jsonl",
+            )
+            _pipeline.start()
+        return _pipeline
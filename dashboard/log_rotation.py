@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Size/time based rotation for the Hytale server log.
+
+Used as a `tee` replacement in server-wrapper.sh: the sink copies stdin to
+stdout and appends it to logs/server.log. When the file exceeds
+HYTALE_LOG_MAX_BYTES or is older than HYTALE_LOG_ROTATE_SECONDS it is moved to
+logs/archive/, compressed (gzip, or zstd if available) in the background and
+recorded in a small JSON manifest with time range, line count and a sparse
+index (the timestamp and byte offset of the first line after every
+INDEX_STRIDE bytes), built while the lines are written, so log_search.py can
+seek into archived segments.
+
+The manifest also keeps the live file's counters ("live": when it was
+started, bytes, lines, time range), saved at rotation and when the sink
+closes. A restarted sink continues from them and only reads what was
+appended since, and the age for time-based rotation keeps counting across
+restarts. A file without matching counters (e.g. a large log from before
+rotation existed) is not scanned: its time range comes from its first and
+last lines, its age from its first timestamp, and its line count is unknown.
+
+The reader helpers at the bottom let the dashboard read across the live file
+and its archived segments transparently.
+
+Usage:
+    python3 log_rotation.py [LOG_FILE]
+"""
+
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from log_tail import tail_lines
+
+DEFAULT_LOG_FILE = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server")) / "logs" / "server.log"
+MAX_BYTES = int(os.environ.get("HYTALE_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+ROTATE_SECONDS = int(os.environ.get("HYTALE_LOG_ROTATE_SECONDS", "86400"))  # 0 = size only
+KEEP_SEGMENTS = int(os.environ.get("HYTALE_LOG_BACKUPS", "30"))
+INDEX_STRIDE = 1024 * 1024  # one [timestamp, offset] index entry per MiB of a segment
+COMPRESSION = os.environ.get("HYTALE_LOG_COMPRESSION", "gzip").lower()  # gzip | zstd | none
+
+ARCHIVE_DIR_NAME = "archive"
+# Log format: [2026/01/26 19:00:36   INFO] ...
+TS_RE = re.compile(rb"\[(\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2})")
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+
+def archive_dir(log_file: Path) -> Path:
+    """Directory holding rotated segments of log_file."""
+    return Path(log_file).parent / ARCHIVE_DIR_NAME
+
+
+def manifest_path(log_file: Path) -> Path:
+    """Manifest describing the rotated segments of log_file."""
+    return archive_dir(log_file) / f"{Path(log_file).stem}.manifest.json"
+
+
+def line_timestamp(line: bytes) -> str | None:
+    """Return the "YYYY/MM/DD HH:MM:SS" prefix of a raw log line, if any."""
+    m = TS_RE.search(line, 0, 64)
+    return m.group(1).decode() if m else None
+
+
+class LogSink:
+    """Copies a byte stream into a rotating log file."""
+
+    def __init__(self, log_file: Path, max_bytes: int = MAX_BYTES, rotate_seconds: int = ROTATE_SECONDS,
+                 keep_segments: int = KEEP_SEGMENTS, compression: str = COMPRESSION, echo=None):
+        self.log_file = Path(log_file)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.keep_segments = keep_segments
+        if compression == "zstd" and zstandard is None:
+            print("[log-sink] zstandard module not available, falling back to gzip", file=sys.stderr)
+            compression = "gzip"
+        self.compression = compression if compression in SUFFIXES else "gzip"
+        self.echo = echo
+        self._manifest_lock = threading.Lock()
+        self._workers = []
+        self._open()
+
+    # -- live file -------------------------------------------------------
+
+    def _open(self) -> None:
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.log_file, "ab")
+        st = os.fstat(self._f.fileno())
+        self._inode = st.st_ino
+        self._size = st.st_size
+        self._opened_at = time.time()
+        self._started = datetime.now().isoformat(timespec="seconds")
+        self._lines = 0
+        self._first_ts = None
+        self._last_ts = None
+        self._index = []
+        self._index_next = 0
+        if self._size:
+            self._resume_existing(st)
+
+    def _resume_existing(self, st: os.stat_result) -> None:
+        """Recover counters, time range and age when appending to an existing file."""
+        live = read_live_state(self.log_file)
+        if live and live.get("inode") == st.st_ino and isinstance(live.get("bytes"), int) \
+                and live["bytes"] <= st.st_size:
+            self._opened_at = live.get("opened_at", self._opened_at)
+            self._started = live.get("started", self._started)
+            self._lines = live.get("lines")
+            self._first_ts, self._last_ts = live.get("first_ts"), live.get("last_ts")
+            self._index = live.get("index") or []
+            self._index_next = self._index[-1][1] + INDEX_STRIDE if self._index else 0
+            # Only what was appended since the counters were saved
+            offset = live["bytes"]
+            with open(self.log_file, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    self._account(line, offset)
+                    offset += len(line)
+            return
+        # No counters for this file: do not read all of it (and index only what is appended)
+        self._lines = None
+        self._index_next = st.st_size
+        with open(self.log_file, "rb") as f:
+            for line in f.read(64 * 1024).split(b"\n"):
+                self._first_ts = line_timestamp(line)
+                if self._first_ts:
+                    break
+        for line in reversed(tail_lines(self.log_file, 20)):
+            self._last_ts = line_timestamp(line.encode())
+            if self._last_ts:
+                break
+        try:
+            self._opened_at = datetime.strptime(self._first_ts, "%Y/%m/%d %H:%M:%S").timestamp()
+        except (TypeError, ValueError):
+            self._opened_at = st.st_ctime
+        self._started = datetime.fromtimestamp(self._opened_at).isoformat(timespec="seconds")
+
+    def _live_state(self) -> dict:
+        return {"inode": self._inode, "bytes": self._size, "lines": self._lines, "first_ts": self._first_ts,
+                "last_ts": self._last_ts, "started": self._started, "opened_at": self._opened_at,
+                "index": self._index}
+
+    def _save_live_state(self) -> None:
+        with self._manifest_lock:
+            self._write_manifest(read_manifest(self.log_file), self._live_state())
+
+    def _account(self, line: bytes, offset: int) -> None:
+        """Count a line that starts at offset."""
+        if self._lines is not None:
+            self._lines += 1
+        ts = line_timestamp(line)
+        if ts:
+            if self._first_ts is None:
+                self._first_ts = ts
+            if offset >= self._index_next and (not self._index or ts >= self._index[-1][0]):
+                self._index.append([ts, offset])
+                self._index_next = offset + INDEX_STRIDE
+            self._last_ts = ts
+
+    def _rotation_due(self) -> bool:
+        if self._size >= self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and self._size > 0 and time.time() - self._opened_at >= self.rotate_seconds
+
+    def write_line(self, line: bytes) -> None:
+        """Append one line (including its newline) and rotate if needed."""
+        if self._rotation_due():
+            self.rotate()
+        self._f.write(line)
+        self._account(line, self._size)
+        self._size += len(line)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def run(self, stream) -> None:
+        """Copy stream to the log (and echo target) until EOF."""
+        pending = b""
+        while True:
+            chunk = stream.read1(64 * 1024) if hasattr(stream, "read1") else stream.read(64 * 1024)
+            if not chunk:
+                break
+            if self.echo is not None:
+                try:
+                    self.echo.write(chunk)
+                    self.echo.flush()
+                except (BrokenPipeError, OSError):
+                    # Terminal went away; keep logging to the file.
+                    self.echo = None
+            data = pending + chunk
+            lines = data.split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                self.write_line(line + b"\n")
+            self.flush()
+        if pending:
+            self.write_line(pending)
+        self.close()
+
+    def close(self) -> None:
+        self._f.close()
+        for worker in self._workers:
+            worker.join()
+        try:
+            self._save_live_state()
+        except OSError as e:
+            print(f"[log-sink] Failed to save the live file state: {e}", file=sys.stderr)
+
+    # -- rotation --------------------------------------------------------
+
+    def rotate(self) -> None:
+        """Move the live file into the archive and start a new one."""
+        self._f.close()
+        target_dir = archive_dir(self.log_file)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        segment = target_dir / f"{self.log_file.stem}-{stamp}{self.log_file.suffix}"
+        n = 1
+        while segment.exists() or Path(str(segment) + SUFFIXES[self.compression]).exists():
+            segment = target_dir / f"{self.log_file.stem}-{stamp}-{n}{self.log_file.suffix}"
+            n += 1
+        os.rename(self.log_file, segment)
+
+        entry = {
+            "file": segment.name,
+            "source": self.log_file.name,
+            "inode": self._inode,
+            "bytes": self._size,
+            "lines": self._lines,
+            "first_ts": self._first_ts,
+            "last_ts": self._last_ts,
+            "index": self._index,
+            "started": self._started,
+            "closed": datetime.now().isoformat(timespec="seconds"),
+            "compression": "none",
+        }
+        self._open()
+
+        with self._manifest_lock:
+            entries = read_manifest(self.log_file)
+            entries.append(entry)
+            self._write_manifest(entries, self._live_state())
+
+        if self.compression != "none":
+            worker = threading.Thread(target=self._compress, args=(segment,), daemon=True)
+            worker.start()
+            self._workers = [w for w in self._workers if w.is_alive()] + [worker]
+        else:
+            self._prune()
+
+    def _compress(self, segment: Path) -> None:
+        target = Path(str(segment) + SUFFIXES[self.compression])
+        tmp = target.with_name(target.name + ".tmp")
+        try:
+            with open(segment, "rb") as src, open(tmp, "wb") as raw:
+                if self.compression == "zstd":
+                    with zstandard.ZstdCompressor(level=10).stream_writer(raw) as dst:
+                        while chunk := src.read(1024 * 1024):
+                            dst.write(chunk)
+                else:
+                    with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as dst:
+                        while chunk := src.read(1024 * 1024):
+                            dst.write(chunk)
+            os.replace(tmp, target)
+        except OSError as e:
+            print(f"[log-sink] Failed to compress {segment.name}: {e}", file=sys.stderr)
+            tmp.unlink(missing_ok=True)
+            return
+
+        with self._manifest_lock:
+            entries = read_manifest(self.log_file)
+            for entry in entries:
+                if entry["file"] == segment.name:
+                    entry["file"] = target.name
+                    entry["compression"] = self.compression
+                    entry["compressed_bytes"] = target.stat().st_size
+            self._write_manifest(entries)
+        segment.unlink(missing_ok=True)
+        self._prune()
+
+    def _prune(self) -> None:
+        """Delete the oldest segments beyond keep_segments."""
+        with self._manifest_lock:
+            entries = read_manifest(self.log_file)
+            excess = len(entries) - self.keep_segments
+            if excess <= 0:
+                return
+            for entry in entries[:excess]:
+                (archive_dir(self.log_file) / entry["file"]).unlink(missing_ok=True)
+            self._write_manifest(entries[excess:])
+
+    def _write_manifest(self, entries: list[dict], live: dict | None = None) -> None:
+        """Write the segment list; the live state is kept unless given (only the writing thread has it)."""
+        path = manifest_path(self.log_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if live is None:
+            live = read_live_state(self.log_file)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"segments": entries, "live": live}, f, indent=2)
+        os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Readers
+# ---------------------------------------------------------------------------
+
+def read_manifest(log_file: Path) -> list[dict]:
+    """Return the archived segments of log_file, oldest first."""
+    try:
+        with open(manifest_path(log_file), "r") as f:
+            return json.load(f).get("segments", [])
+    except (FileNotFoundError, json.JSONDecodeError, PermissionError, OSError):
+        return []
+
+
+def read_live_state(log_file: Path) -> dict | None:
+    """The live file's counters as last saved by the sink, or None."""
+    try:
+        with open(manifest_path(log_file), "r") as f:
+            return json.load(f).get("live")
+    except (FileNotFoundError, json.JSONDecodeError, PermissionError, OSError, AttributeError):
+        return None
+
+
+def open_segment(log_file: Path, entry: dict):
+    """Open an archived segment for binary reading (decompressing if needed)."""
+    path = archive_dir(log_file) / entry["file"]
+    compression = entry.get("compression", "none")
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise OSError(f"zstandard module required to read {path.name}")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def find_segment(log_file: Path, inode: int) -> dict | None:
+    """Find the archived segment that was the live file with the given inode."""
+    for entry in reversed(read_manifest(log_file)):
+        if entry.get("inode") == inode:
+            return entry
+    return None
+
+
+def _tail_segment(log_file: Path, entry: dict, n: int) -> list[str]:
+    if entry.get("compression", "none") == "none":
+        return tail_lines(archive_dir(log_file) / entry["file"], n)
+    last = deque(maxlen=n)
+    with open_segment(log_file, entry) as f:
+        for line in f:
+            last.append(line.rstrip(b"\r\n"))
+    return [line.decode("utf-8", errors="replace") for line in last]
+
+
+def tail_lines_across(log_file: Path, n: int) -> list[str]:
+    """
+    Return the last n lines of log_file, continuing into archived segments
+    when the live file (e.g. right after a rotation) has fewer than n lines.
+    """
+    log_file = Path(log_file)
+    lines = tail_lines(log_file, n) if log_file.exists() else []
+    if len(lines) >= n:
+        return lines
+    for entry in reversed(read_manifest(log_file)):
+        try:
+            lines = _tail_segment(log_file, entry, n - len(lines)) + lines
+        except OSError as e:
+            print(f"[log_rotation] Skipping segment {entry.get('file')}: {e}")
+            continue
+        if len(lines) >= n:
+            break
+    return lines
+
+
+def main():
+    log_file = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LOG_FILE
+    sink = LogSink(log_file, echo=sys.stdout.buffer)
+    try:
+        sink.run(sys.stdin.buffer)
+    except KeyboardInterrupt:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
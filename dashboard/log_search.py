@@ -0,0 +1,268 @@
+"""
+Time-range and text search over the server log and its archived segments.
+
+A sparse index maps the "[YYYY/MM/DD HH:MM:SS" prefix of the first line after
+every INDEX_STRIDE bytes of the live log to its byte offset. A query bisects
+the index and seeks straight to the start of the window. Archived segments are
+skipped by the time range recorded in the rotation manifest, and seeked into
+with the index the log sink recorded for them. Results are paged;
+the page cursor has the same "<inode>:<offset>" format as log_tail cursors, so
+it stays valid after the live file is rotated into the archive.
+"""
+
+import bisect
+import json
+import os
+import re
+from pathlib import Path
+from threading import Lock
+
+from log_rotation import line_timestamp, open_segment, read_manifest
+from log_tail import decode_cursor, encode_cursor, strip_ansi
+
+INDEX_STRIDE = 128 * 1024   # one index entry per 128 KiB of log
+PROBE_BYTES = 8 * 1024      # bytes read at each stride boundary to find a timestamp
+SCAN_CHUNK = 1024 * 1024
+MAX_SCAN_BYTES = 64 * 1024 * 1024  # per request; larger windows continue via cursor
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 2000
+INDEX_VERSION = 1
+
+_TS_INPUT_RE = re.compile(r"^(\d{4})[-/](\d{2})[-/](\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2}))?)?$")
+
+
+def normalize_timestamp(text: str, upper: bool = False) -> str | None:
+    """
+    Convert user input ("2026-01-26 19:00", "2026/01/26T19:00:36", ...) into
+    the log's sortable "YYYY/MM/DD HH:MM:SS" form. Empty input returns None.
+    Missing fields are filled with the start of the minute or day, or with
+    its end if upper is True (for an inclusive end bound).
+
+    Raises:
+        ValueError: If the text is not a supported date/time
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    m = _TS_INPUT_RE.match(text)
+    if not m:
+        raise ValueError(f"Invalid timestamp: {text}")
+    y, mo, d, h, mi, s = m.groups()
+    if upper:
+        return f"{y}/{mo}/{d} {h or '23'}:{mi or '59'}:{s or '59'}"
+    return f"{y}/{mo}/{d} {h or '00'}:{mi or '00'}:{s or '00'}"
+
+
+class SparseIndex:
+    """Persistent sparse timestamp -> byte offset index for one log file."""
+
+    def __init__(self, log_file: Path, index_file: Path, stride: int = INDEX_STRIDE):
+        self.log_file = Path(log_file)
+        self.index_file = Path(index_file)
+        self.stride = stride
+        self._lock = Lock()
+        self._inode = None
+        self._next = 0
+        self._keys = []
+        self._offsets = []
+        self._loaded = False
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            with open(self.index_file, "r") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or data.get("stride") != self.stride:
+                return
+            self._inode = data["inode"]
+            self._next = data["next"]
+            self._keys = [ts for ts, _ in data["entries"]]
+            self._offsets = [offset for _, offset in data["entries"]]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError, PermissionError, OSError):
+            self._inode, self._next, self._keys, self._offsets = None, 0, [], []
+
+    def _save(self) -> None:
+        data = {
+            "version": INDEX_VERSION,
+            "stride": self.stride,
+            "inode": self._inode,
+            "next": self._next,
+            "entries": list(zip(self._keys, self._offsets)),
+        }
+        tmp = self.index_file.with_name(self.index_file.name + ".tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.index_file)
+        except (PermissionError, OSError) as e:
+            print(f"[log_search] Failed to save index: {e}")
+
+    def _probe(self, f, boundary: int) -> tuple[str, int] | None:
+        """Find the first timestamped line starting at or after boundary."""
+        f.seek(boundary)
+        data = f.read(PROBE_BYTES)
+        pos = 0
+        if boundary > 0:
+            pos = data.find(b"\n") + 1
+            if pos == 0:
+                return None
+        while pos < len(data):
+            end = data.find(b"\n", pos)
+            if end == -1:
+                return None
+            ts = line_timestamp(data[pos:end])
+            if ts:
+                return ts, boundary + pos
+            pos = end + 1
+        return None
+
+    def refresh(self) -> int:
+        """Index any new stride boundaries and return the file's inode."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            with open(self.log_file, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self._inode or st.st_size < self._next - self.stride:
+                    self._inode, self._next, self._keys, self._offsets = st.st_ino, 0, [], []
+                added = False
+                # Only probe boundaries whose probe window is fully written.
+                while self._next + PROBE_BYTES <= st.st_size:
+                    entry = self._probe(f, self._next)
+                    if entry and (not self._keys or entry[0] >= self._keys[-1]):
+                        self._keys.append(entry[0])
+                        self._offsets.append(entry[1])
+                        added = True
+                    self._next += self.stride
+                if added:
+                    self._save()
+                return st.st_ino
+
+    def seek(self, ts: str | None) -> int:
+        """Offset of the last indexed line strictly before ts (0 if none)."""
+        if ts is None:
+            return 0
+        with self._lock:
+            i = bisect.bisect_left(self._keys, ts) - 1
+            return self._offsets[i] if i >= 0 else 0
+
+
+def _segment_seek(entry: dict, ts: str | None) -> int:
+    """Offset of the last line before ts in an archived segment, from its index in the manifest."""
+    index = entry.get("index") or []
+    if ts is None or not index:
+        return 0
+    i = bisect.bisect_left([key for key, _ in index], ts) - 1
+    return index[i][1] if i >= 0 else 0
+
+
+def _iter_lines(f, offset: int, limit: int | None):
+    """Yield (start_offset, end_offset, raw_line) for complete lines from offset."""
+    f.seek(offset)
+    pending = b""
+    pos = offset
+    while True:
+        chunk = f.read(SCAN_CHUNK)
+        if not chunk:
+            return
+        data = pending + chunk
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end == -1:
+                break
+            line_end = pos + end + 1
+            if limit is not None and line_end > limit:
+                return
+            yield pos + start, line_end, data[start:end]
+            start = end + 1
+        pending = data[start:]
+        pos += start
+
+
+def search_logs(log_file: Path, index: SparseIndex, start: str | None = None, end: str | None = None,
+                query: str = "", regex: bool = False, limit: int = DEFAULT_LIMIT, cursor: str = "") -> dict:
+    """
+    Search the live log and its archived segments in chronological order.
+
+    Args:
+        log_file: Live log file (archived segments are found via its manifest)
+        index: SparseIndex of the live log file
+        start, end: Normalized timestamps bounding the window (None = open)
+        query: Substring (or regular expression if regex is True) to match
+        limit: Maximum number of matches per page
+        cursor: Cursor from a previous page to continue from
+
+    Returns:
+        dict: {"matches": [{"ts", "line"}], "next": cursor or None, "scanned_bytes": int}
+
+    Raises:
+        ValueError: If query is an invalid regular expression
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    if regex and query:
+        pattern = re.compile(query)
+        matches_query = lambda line: pattern.search(line) is not None  # noqa: E731
+    elif query:
+        needle = query.lower()
+        matches_query = lambda line: needle in line.lower()  # noqa: E731
+    else:
+        matches_query = lambda line: True  # noqa: E731
+
+    sources = [dict(entry, live=False) for entry in read_manifest(log_file)]
+    if log_file.exists():
+        live_inode = index.refresh()
+        sources.append({"inode": live_inode, "live": True, "first_ts": None, "last_ts": None})
+
+    resume = decode_cursor(cursor) if cursor else None
+    if resume:
+        inodes = [src.get("inode") for src in sources]
+        if resume[0] in inodes:
+            sources = sources[inodes.index(resume[0]):]
+        else:
+            resume = None
+
+    results = []
+    scanned = 0
+    for src in sources:
+        if resume and src.get("inode") == resume[0]:
+            offset = resume[1]
+        else:
+            if (start and src.get("last_ts") and src["last_ts"] < start) or \
+                    (end and src.get("first_ts") and src["first_ts"] > end):
+                continue
+            offset = index.seek(start) if src["live"] else _segment_seek(src, start)
+
+        try:
+            if src["live"]:
+                f = open(log_file, "rb")
+                limit_offset = os.fstat(f.fileno()).st_size
+            else:
+                f = open_segment(log_file, src)
+                limit_offset = src.get("bytes")
+        except OSError as e:
+            print(f"[log_search] Skipping {src.get('file', log_file.name)}: {e}")
+            continue
+
+        with f:
+            current_ts = None
+            for line_start, line_end, raw in _iter_lines(f, offset, limit_offset):
+                scanned += line_end - line_start
+                ts = line_timestamp(raw)
+                if ts:
+                    current_ts = ts
+                if end and current_ts and current_ts > end:
+                    return {"matches": results, "next": None, "scanned_bytes": scanned}
+                if start and (current_ts is None or current_ts < start):
+                    continue
+                line = strip_ansi(raw.decode("utf-8", errors="replace").rstrip())
+                if matches_query(line):
+                    results.append({"ts": current_ts, "line": line})
+                    if len(results) >= limit:
+                        return {"matches": results, "next": encode_cursor(src["inode"], line_end),
+                                "scanned_bytes": scanned}
+                if scanned >= MAX_SCAN_BYTES:
+                    return {"matches": results, "next": encode_cursor(src["inode"], line_end),
+                            "scanned_bytes": scanned}
+
+    return {"matches": results, "next": None, "scanned_bytes": scanned}
@@ -0,0 +1,258 @@
+"""
+Live log streaming for the dashboard.
+One tailer thread per log file follows appended lines (inotify, or a stat poll
+where inotify is unavailable) and fans ANSI-stripped batches out to every
+connected client through a bounded per-client queue. server.log is fed from
+the log event pipeline (PipelineFeed) instead of a tailer of its own.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from pathlib import Path
+
+from log_tail import MAX_READ_BYTES, decode_cursor, encode_cursor, read_since, strip_ansi
+
+# inotify constants (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct("iIII")
+
+POLL_INTERVAL = 0.5      # seconds between stat checks without inotify
+CLIENT_QUEUE_SIZE = 256  # batches buffered per client before dropping the oldest
+INITIAL_LINES = 50
+
+
+class _Inotify:
+    """Minimal ctypes wrapper around inotify for a single directory watch."""
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, name: str, timeout: float) -> bool:
+        """Block until an event for `name` arrives (or overflow); False on timeout."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        target = os.fsencode(name)
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(buf):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(buf, pos)
+            event_name = buf[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + length].rstrip(b"\0")
+            pos += _EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW or event_name == target:
+                return True
+        return False
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Subscription:
+    """A client's bounded view of a tailer. Consumed from the event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = CLIENT_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def _put(self, batch: dict) -> None:
+        # Runs on the event loop. A slow client loses its oldest batches
+        # instead of making the tailer (or other clients) wait.
+        if self.queue.full():
+            old = self.queue.get_nowait()
+            self.dropped += len(old["lines"])
+        self.queue.put_nowait(batch)
+
+    def publish(self, batch: dict) -> None:
+        """Thread-safe hand-off from the tailer thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, batch)
+        except RuntimeError:
+            # Event loop already closed; the client is gone.
+            pass
+
+
+class LogTailer:
+    """Follows one log file in a background thread and fans out new lines."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.cursor = ""
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _start_locked(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"tail:{self.path.name}", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> Subscription:
+        sub = Subscription(loop)
+        with self._lock:
+            self._subscribers.add(sub)
+            self._stop.clear()
+            if self._thread is None:
+                self._start_locked()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+            if not self._subscribers:
+                self._stop.set()
+
+    def _poll(self) -> None:
+        """Read everything appended since the last cursor and publish it."""
+        while True:
+            try:
+                update = read_since(self.path, self.cursor, initial_lines=0)
+            except FileNotFoundError:
+                return
+            except (PermissionError, OSError) as e:
+                print(f"[log_stream] Failed to read {self.path}: {e}")
+                return
+            since = encode_cursor(decode_cursor(update["cursor"])[0], 0) if update["reset"] else self.cursor
+            self.cursor = update["cursor"]
+            if update["lines"] or update["reset"]:
+                batch = {
+                    "lines": [strip_ansi(line.rstrip()) for line in update["lines"]],
+                    "since": since,
+                    "cursor": self.cursor,
+                    "reset": update["reset"],
+                }
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for sub in subscribers:
+                    sub.publish(batch)
+            if not update["more"]:
+                return
+
+    def read_range(self, start: tuple[int, int], end: tuple[int, int]) -> list[dict] | None:
+        return read_range(self.path, start, end)
+
+    def _run(self) -> None:
+        # Start at the current end of file; clients fetch history themselves.
+        self.cursor = ""
+        self._poll()
+        try:
+            watcher = _Inotify(self.path.parent)
+        except (OSError, AttributeError) as e:
+            print(f"[log_stream] inotify unavailable ({e}), polling {self.path} every {POLL_INTERVAL}s")
+            watcher = None
+
+        try:
+            while not self._stop.is_set():
+                if watcher is not None:
+                    # The timeout only bounds how long a stop request waits.
+                    if not watcher.wait(self.path.name, timeout=1.0):
+                        continue
+                elif self._stop.wait(POLL_INTERVAL):
+                    break
+                self._poll()
+        finally:
+            if watcher is not None:
+                watcher.close()
+            with self._lock:
+                self._thread = None
+                # A client may have subscribed while this thread was exiting.
+                if self._subscribers:
+                    self._start_locked()
+
+
+class PipelineFeed:
+    """
+    LogTailer-compatible fan-out fed by the log event pipeline, so streaming
+    server.log adds no reader of its own.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> Subscription:
+        sub = Subscription(loop)
+
+        def on_events(events):
+            sub.publish({
+                "lines": [event["line"] for event in events],
+                "types": [event["type"] for event in events],
+                "since": events.since,
+                "cursor": events.cursor,
+                "reset": False,
+                "dense": events.dense,
+            })
+
+        sub.callback = on_events
+        self.pipeline.subscribe(on_events)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self.pipeline.unsubscribe(sub.callback)
+
+    def read_range(self, start: tuple[int, int], end: tuple[int, int]) -> list[dict] | None:
+        from log_events import classify
+
+        batches = read_range(self.pipeline.log_file, start, end)
+        for batch in batches or ():
+            batch["types"] = [classify(line)["type"] for line in batch["lines"]]
+        return batches
+
+
+def read_range(path: Path, start: tuple[int, int], end: tuple[int, int]) -> list[dict] | None:
+    """
+    The lines between two (inode, offset) positions of a log file as stream
+    batches. None if the file no longer holds them (rotated or truncated).
+    """
+    batches = []
+    cursor, offset = encode_cursor(*start), start[1]
+    while offset < end[1]:
+        try:
+            update = read_since(path, cursor, initial_lines=0, max_bytes=min(MAX_READ_BYTES, end[1] - offset))
+        except OSError:
+            return None
+        position = decode_cursor(update["cursor"])
+        if update["reset"] or position[1] <= offset:
+            return None
+        batches.append({
+            "lines": [strip_ansi(line.rstrip()) for line in update["lines"]],
+            "since": cursor,
+            "cursor": update["cursor"],
+            "reset": False,
+        })
+        cursor, offset = update["cursor"], position[1]
+    return batches
+
+
+_tailers = {}
+_tailers_lock = threading.Lock()
+
+
+def get_tailer(path: Path) -> LogTailer:
+    """Return the shared tailer for a log file, creating it on first use."""
+    path = Path(path)
+    with _tailers_lock:
+        tailer = _tailers.get(path)
+        if tailer is None:
+            tailer = _tailers[path] = LogTailer(path)
+        return tailer
@@ -0,0 +1,163 @@
+"""
+Reverse-seeking tail reader for the Hytale server logs.
+Reads backwards from EOF in fixed-size blocks, so fetching the last N lines
+costs memory and time proportional to N instead of the size of the log file.
+
+Incremental readers use an opaque cursor (inode + byte offset), so each poll
+only reads what was appended since the previous one.
+"""
+
+import os
+import re
+from pathlib import Path
+
+# ANSI escape code pattern for stripping terminal colors
+ANSI_PATTERN = re.compile(r'\x1b\[[0-9;]*m|\[(?:[0-9;]*)?m')
+
+# Bytes read per backwards seek. 64 KiB covers ~500 typical server log lines.
+BLOCK_SIZE = 64 * 1024
+
+
+def strip_ansi(text: str) -> str:
+    """Remove ANSI escape codes from text."""
+    return ANSI_PATTERN.sub('', text)
+
+
+def tail_raw_lines(f, n: int, end: int | None = None, block_size: int = BLOCK_SIZE) -> list[bytes]:
+    """
+    Return the last n lines (without line terminators) of a binary file object.
+
+    Args:
+        f: File object opened in binary mode
+        n: Number of lines to return
+        end: Byte offset to treat as EOF (defaults to the current file size)
+        block_size: Bytes read per backwards step
+
+    Returns:
+        list: Up to n raw lines, oldest first
+    """
+    if n <= 0:
+        return []
+
+    if end is None:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+
+    pos = end
+    chunks = []
+    newlines = 0
+
+    # One extra newline is needed to know that the oldest line is complete
+    # (and to account for the terminator of the final line).
+    while pos > 0 and newlines <= n:
+        size = min(block_size, pos)
+        pos -= size
+        f.seek(pos)
+        chunk = f.read(size)
+        chunks.append(chunk)
+        newlines += chunk.count(b"\n")
+
+    data = b"".join(reversed(chunks))
+    lines = data.split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+
+    return [line.rstrip(b"\r") for line in lines[-n:]]
+
+
+def tail_lines(path: Path, n: int, block_size: int = BLOCK_SIZE) -> list[str]:
+    """
+    Return the last n lines of a text file, decoded as UTF-8.
+
+    Invalid byte sequences are replaced instead of raising, matching the
+    errors="replace" behaviour the dashboard uses for log files.
+    """
+    with open(path, "rb") as f:
+        raw = tail_raw_lines(f, n, block_size=block_size)
+    return [line.decode("utf-8", errors="replace") for line in raw]
+
+
+# Upper bound for a single incremental read, so a client that was away for a
+# long time catches up in pages instead of pulling megabytes in one response.
+MAX_READ_BYTES = 256 * 1024
+
+
+def encode_cursor(inode: int, offset: int) -> str:
+    """Build an opaque cursor from a file's inode and byte offset."""
+    return f"{inode:x}:{offset:x}"
+
+
+def decode_cursor(cursor: str) -> tuple[int, int] | None:
+    """Parse a cursor built by encode_cursor(), or return None if invalid."""
+    try:
+        inode, offset = cursor.split(":")
+        return int(inode, 16), int(offset, 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _complete_end(f, size: int, block_size: int = BLOCK_SIZE) -> int:
+    """Return the offset just past the last newline before size (0 if none)."""
+    pos = size
+    while pos > 0:
+        start = max(0, pos - block_size)
+        f.seek(start)
+        idx = f.read(pos - start).rfind(b"\n")
+        if idx != -1:
+            return start + idx + 1
+        pos = start
+    return 0
+
+
+def read_since(path: Path, cursor: str = "", initial_lines: int = 50,
+               max_bytes: int = MAX_READ_BYTES) -> dict:
+    """
+    Read the lines appended to a log file after a cursor.
+
+    Without a valid cursor the last initial_lines lines are returned. A cursor
+    whose inode no longer matches (rotation) or whose offset lies past EOF
+    (truncation) restarts at the beginning of the current file and sets
+    "reset". A trailing line without newline is held back until it is complete.
+
+    Returns:
+        dict: {"lines": [...], "cursor": str, "reset": bool, "more": bool}
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        complete = _complete_end(f, st.st_size)
+        position = decode_cursor(cursor) if cursor else None
+
+        if position is None:
+            raw = tail_raw_lines(f, initial_lines, end=complete)
+            return {
+                "lines": [line.decode("utf-8", errors="replace") for line in raw],
+                "cursor": encode_cursor(st.st_ino, complete),
+                "reset": False,
+                "more": False,
+            }
+
+        inode, offset = position
+        reset = inode != st.st_ino or offset > st.st_size
+        if reset:
+            offset = 0
+
+        end = min(complete, offset + max_bytes)
+        f.seek(offset)
+        data = f.read(max(0, end - offset))
+        if end < complete:
+            # Cut at the last full line; a single oversized line is passed as-is.
+            cut = data.rfind(b"\n")
+            if cut != -1:
+                data = data[:cut + 1]
+        new_offset = offset + len(data)
+
+        lines = data.split(b"\n")
+        if lines and lines[-1] == b"":
+            lines.pop()
+
+        return {
+            "lines": [line.rstrip(b"\r").decode("utf-8", errors="replace") for line in lines],
+            "cursor": encode_cursor(st.st_ino, new_offset),
+            "reset": reset,
+            "more": new_offset < complete,
+        }
@@ -0,0 +1,48 @@
+"""
+Player join/leave state projected from the log event pipeline.
+The state is rebuilt from the pipeline's spilled join/leave events on startup
+and then kept current by subscription, so a player list request never parses
+the log itself.
+"""
+
+from threading import Lock
+
+
+class PlayerIndex:
+    """Player join/leave state derived from pipeline events."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self._lock = Lock()
+        self._init_lock = Lock()
+        self._players = None
+
+    def apply_event(self, event: dict) -> None:
+        """Update player state from a single join/leave event."""
+        if event["type"] == "join":
+            self._players[event["uuid"]] = {
+                "name": event["name"], "uuid": event["uuid"],
+                "online": True, "last_login": event["ts"],
+                "last_logout": None, "world": event["world"], "position": None,
+            }
+        elif event["type"] == "leave":
+            player = self._players.get(event["uuid"])
+            if player is not None:
+                player["online"] = False
+                player["last_logout"] = event["ts"]
+
+    def _on_events(self, events: list[dict]) -> None:
+        with self._lock:
+            for event in events:
+                if event["type"] in ("join", "leave"):
+                    self.apply_event(event)
+
+    def refresh(self) -> list[dict]:
+        """Return all known players (as far as the pipeline has ingested the log)."""
+        with self._init_lock:
+            if self._players is None:
+                self._players = {}
+                self.pipeline.subscribe(self._on_events, replay_types={"join", "leave"})
+        self.pipeline.catch_up()
+        with self._lock:
+            return [dict(p) for p in self._players.values()]
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Restore backups into the universe.
+
+1. Extract: the backup is unpacked into a staging directory inside the
+   universe volume (universe/.restore/new) while the server keeps running.
+   Our gzip archives are multi-member (see backup_writer), so members are
+   inflated in parallel; file writes and hashing run in a thread pool too.
+2. Verify: full archives end with a manifest (MANIFEST_NAME) holding the
+   SHA-256 of every file, written at backup time. Every restored file is
+   checked against it, and the archive itself against the catalog checksum.
+   Incremental snapshots check every chunk against its digest.
+3. Swap: only now the server is stopped. The current contents move to
+   universe/.restore/previous and the staged ones take their place, by
+   renames on the same filesystem (the universe is usually a volume mount
+   point, which cannot be renamed itself). The server is started again and
+   the previous contents are deleted.
+
+The downtime is only step 3. A single world (universe/worlds/NAME) can be
+restored on its own; the rest of the universe is left alone.
+
+Usage:
+    python3 restore.py extract ARCHIVE TARGET_DIR [worlds/NAME]
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tarfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from backup_writer import default_threads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST_NAME = "hytale-backup.json"  # last member of full archives
+ARCHIVE_ROOT = "universe"
+RESTORE_DIR_NAME = ".restore"
+READ_SIZE = 8 * 1024 * 1024
+MAX_SEGMENT = 64 * 1024 * 1024  # no member boundary found: inflate sequentially
+MAX_PENDING_BYTES = 256 * 1024 * 1024  # file data queued for the write pool
+LARGE_FILE = 64 * 1024 * 1024  # written by the reading thread in pieces
+
+# Header of the gzip members written by backup_writer (gzip.compress with
+# mtime=0): magic, deflate, no flags, mtime 0, XFL 0/2/4, OS unknown
+_MEMBER_RE = re.compile(rb"\x1f\x8b\x08\x00\x00\x00\x00\x00[\x00\x02\x04]\xff")
+WORLD_RE = re.compile(r"^[\w.\- ]+$")
+
+
+class RestoreError(Exception):
+    """Damaged or unsuitable backup, failed verification or swap."""
+
+
+def _inflate(segment: bytes) -> bytes | None:
+    """Inflate one or more complete gzip members. None if the segment is not."""
+    out = []
+    try:
+        while segment:
+            d = zlib.decompressobj(31)
+            out.append(d.decompress(segment))
+            if not d.eof:
+                return None
+            segment = d.unused_data
+    except zlib.error:
+        return None
+    return b"".join(out)
+
+
+class ParallelGzipReader:
+    """
+    Readable stream over a gzip file, inflating members in a thread pool.
+
+    The compressed stream is split at member headers; a header pattern that
+    turns out to be member data is detected (the segment does not inflate)
+    and merged with the next one. Files without such boundaries (single-member
+    gzip from other tools) are inflated sequentially.
+    """
+
+    def __init__(self, raw, threads: int | None = None):
+        self.raw = raw
+        self.threads = max(1, threads or default_threads())
+        self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="inflate")
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._carry = b""
+        self._out = bytearray()
+        self._sequential = None  # decompressobj once in sequential mode
+        self._eof = False
+        self._started = False
+        self._in_member = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while (size < 0 or len(self._out) < size) and not (self._eof and not self._pending):
+            self._fill()
+        if size < 0:
+            size = len(self._out)
+        data = bytes(self._out[:size])
+        del self._out[:size]
+        return data
+
+    def _fill(self) -> None:
+        if self._pending and (self._eof or len(self._pending) >= 2 * self.threads):
+            self._drain_one()
+            return
+        chunk = self.raw.read(READ_SIZE)
+        if self._sequential is not None:
+            self._feed_sequential(chunk)
+            return
+        if not chunk:
+            self._eof = True
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            return
+        self._buffer += chunk
+        if not self._started:
+            if len(self._buffer) < 10:
+                return
+            self._started = True
+            if not _MEMBER_RE.match(self._buffer):
+                self._switch_sequential()
+                return
+        # Split off every complete member (up to the last header found)
+        last = 0
+        for m in _MEMBER_RE.finditer(self._buffer, 1):
+            self._submit(bytes(self._buffer[last:m.start()]))
+            last = m.start()
+        if last:
+            del self._buffer[:last]
+        elif len(self._buffer) > MAX_SEGMENT:
+            self._switch_sequential()
+
+    def _submit(self, segment: bytes) -> None:
+        self._pending.append((self._pool.submit(_inflate, segment), segment))
+
+    def _drain_one(self) -> None:
+        future, segment = self._pending.popleft()
+        data = future.result()
+        if data is None:
+            # Not a complete member: a false boundary inside member data
+            self._carry += segment
+            data = _inflate(self._carry)
+            if data is None:
+                if self._eof and not self._pending:
+                    raise RestoreError("Backup archive is truncated or damaged")
+                return
+        elif self._carry:
+            raise RestoreError("Backup archive is damaged (incomplete gzip member)")
+        self._carry = b""
+        self._out += data
+
+    def _switch_sequential(self) -> None:
+        while self._pending:
+            self._drain_one()
+        data = self._carry + bytes(self._buffer)
+        self._carry = b""
+        self._buffer.clear()
+        self._sequential = zlib.decompressobj(31)
+        self._feed_sequential(data)
+
+    def _feed_sequential(self, data: bytes) -> None:
+        if not data:
+            self._eof = True
+            if self._in_member:
+                raise RestoreError("Backup archive is truncated")
+            return
+        while data:
+            self._in_member = True
+            self._out += self._sequential.decompress(data)
+            if not self._sequential.eof:
+                return
+            self._in_member = False
+            data = self._sequential.unused_data
+            self._sequential = zlib.decompressobj(31)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _HashingReader:
+    """Read-through wrapper computing the SHA-256 of the archive and reporting progress."""
+
+    def __init__(self, f, job=None):
+        self.f = f
+        self.job = job
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if self.job is not None:
+            self.job.check_cancelled()
+        data = self.f.read(size)
+        self.sha256.update(data)
+        self.bytes += len(data)
+        if self.job is not None:
+            self.job.update(bytes_done=self.bytes)
+        return data
+
+
+def open_stream(raw, name: str, threads: int | None = None):
+    """Decompressed tar stream for an archive named `name` (.tar, .tar.gz, .tar.zst)."""
+    if name.endswith(".gz"):
+        return ParallelGzipReader(raw, threads)
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RestoreError("zstd backups need the zstandard module")
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    return raw
+
+
+def _write_file(path: Path, data: bytes, mode: int, mtime: float) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    os.chmod(path, mode)
+    os.utime(path, (mtime, mtime))
+    return hashlib.sha256(data).hexdigest()
+
+
+def _in_subdir(rel: str, subdir: str) -> bool:
+    return not subdir or rel == subdir or rel.startswith(subdir + "/")
+
+
+def extract_archive(archive: Path, target: Path, subdir: str = "", expected_sha256: str | None = None,
+                    threads: int | None = None, job=None) -> dict:
+    """
+    Extract the universe from a full backup archive into `target`, verifying
+    every file against the archive's manifest. subdir limits the extraction to
+    one directory below the universe (e.g. "worlds/default").
+
+    Returns:
+        dict: files, bytes, verified_files, manifest (bool), archive_checksum (sha256)
+
+    Raises:
+        RestoreError: Damaged archive, checksum mismatch, subdir not found
+    """
+    archive, target = Path(archive), Path(target)
+    threads = max(1, threads or default_threads())
+    subdir = subdir.strip("/")
+    target.mkdir(parents=True, exist_ok=True)
+    if job is not None:
+        job.update(bytes_total=archive.stat().st_size)
+    data_filter = getattr(tarfile, "data_filter", None)
+    hashes = {}
+    manifest = None
+    dirs = []
+    pending = deque()
+    pending_bytes = 0
+    files = total = 0
+
+    def finish_one():
+        nonlocal pending_bytes
+        rel, future, size = pending.popleft()
+        hashes[rel] = future.result()
+        pending_bytes -= size
+
+    with open(archive, "rb") as f:
+        raw = _HashingReader(f, job)
+        stream = open_stream(raw, archive.name, threads)
+        try:
+            with tarfile.open(fileobj=stream, mode="r|") as tar, \
+                    ThreadPoolExecutor(max_workers=threads, thread_name_prefix="restore") as pool:
+                for member in tar:
+                    if member.name == MANIFEST_NAME:
+                        manifest = json.load(tar.extractfile(member))
+                        continue
+                    if member.name.rstrip("/") == ARCHIVE_ROOT:
+                        continue
+                    if not member.name.startswith(ARCHIVE_ROOT + "/"):
+                        raise RestoreError(f"Unexpected entry in backup: {member.name}")
+                    rel = member.name[len(ARCHIVE_ROOT) + 1:].rstrip("/")
+                    if not _in_subdir(rel, subdir):
+                        continue
+                    member.name = rel
+                    if data_filter is not None:
+                        try:
+                            member = data_filter(member, str(target))
+                        except tarfile.FilterError as e:
+                            raise RestoreError(f"Unsafe entry in backup: {e}") from None
+                    elif rel.startswith("/") or ".." in rel.split("/"):
+                        raise RestoreError(f"Unsafe entry in backup: {rel}")
+                    path = target / rel
+                    if member.isdir():
+                        path.mkdir(parents=True, exist_ok=True)
+                        dirs.append((path, member))
+                        continue
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    if member.issym():
+                        os.symlink(member.linkname, path)
+                    elif member.isreg():
+                        src = tar.extractfile(member)
+                        if member.size > LARGE_FILE:
+                            digest = hashlib.sha256()
+                            with open(path, "wb") as out:
+                                while block := src.read(READ_SIZE):
+                                    digest.update(block)
+                                    out.write(block)
+                            os.chmod(path, member.mode)
+                            os.utime(path, (member.mtime, member.mtime))
+                            hashes[rel] = digest.hexdigest()
+                        else:
+                            data = src.read()
+                            pending.append((rel, pool.submit(_write_file, path, data, member.mode, member.mtime),
+                                            len(data)))
+                            pending_bytes += len(data)
+                            while pending_bytes > MAX_PENDING_BYTES or len(pending) > 4 * threads:
+                                finish_one()
+                        total += member.size
+                    else:
+                        continue  # devices, hardlinks: not part of a universe
+                    files += 1
+                    if job is not None:
+                        job.update(files_done=files)
+                while pending:
+                    finish_one()
+            # Rest of the stream (tar padding), so the archive checksum covers the whole file
+            while stream.read(READ_SIZE):
+                pass
+        finally:
+            if stream is not raw:
+                stream.close()
+
+    if subdir and not files and not dirs:
+        raise RestoreError(f"{subdir} not found in {archive.name}")
+    checksum = raw.sha256.hexdigest()
+    if expected_sha256 and checksum != expected_sha256:
+        raise RestoreError(f"{archive.name}: archive checksum {checksum} does not match the catalog")
+    verified = 0
+    if manifest is not None:
+        expected = {rel: digest for rel, digest in manifest.get("files", {}).items() if _in_subdir(rel, subdir)}
+        bad = [rel for rel, digest in expected.items() if hashes.get(rel) != digest]
+        if bad:
+            raise RestoreError(f"{len(bad)} files do not match the backup manifest, e.g. {bad[0]}")
+        verified = len(expected)
+    for path, member in reversed(dirs):
+        if member.mode is not None:  # None: left as is by tarfile.data_filter
+            os.chmod(path, member.mode)
+        os.utime(path, (member.mtime, member.mtime))
+    return {"files": files, "bytes": total, "verified_files": verified, "manifest": manifest is not None,
+            "archive_checksum": checksum}
+
+
+def swap_in(staged: Path, target: Path, previous: Path) -> None:
+    """
+    Replace the contents of directory `target` with those of `staged` by
+    renames, moving the current contents to `previous`. All three must be on
+    one filesystem. On failure, the original contents are moved back.
+    """
+    staged, target, previous = Path(staged), Path(target), Path(previous)
+    target.mkdir(parents=True, exist_ok=True)
+    previous.mkdir(parents=True)
+    moved_out, moved_in = [], []
+    try:
+        for name in os.listdir(target):
+            if name == RESTORE_DIR_NAME:
+                continue
+            os.rename(target / name, previous / name)
+            moved_out.append(name)
+        for name in os.listdir(staged):
+            os.rename(staged / name, target / name)
+            moved_in.append(name)
+    except OSError as e:
+        for name in moved_in:
+            os.rename(target / name, staged / name)
+        for name in moved_out:
+            os.rename(previous / name, target / name)
+        raise RestoreError(f"Swap failed, previous state kept: {e}") from e
+
+
+def world_subdir(world: str) -> str:
+    """Universe-relative path of a world folder. Raises RestoreError for invalid names."""
+    if not world or world in (".", "..") or not WORLD_RE.match(world):
+        raise RestoreError(f"Invalid world name: {world!r}")
+    return f"worlds/{world}"
+
+
+def prepare_workspace(universe_dir: Path) -> None:
+    """
+    Clear what an interrupted restore left in the workspace. Raises
+    RestoreError if .restore/previous still holds files: after a crash or a
+    failed rollback during the swap, it can be the only copy of the live
+    universe.
+    """
+    workspace = Path(universe_dir) / RESTORE_DIR_NAME
+    previous = workspace / "previous"
+    if previous.is_dir() and any(previous.iterdir()):
+        raise RestoreError(f"{previous} enthält Daten einer unterbrochenen Wiederherstellung / holds data of an "
+                           "interrupted restore (possibly the only copy of the universe); move it back or delete it")
+    remove_staging(universe_dir)
+    if previous.is_dir():
+        previous.rmdir()
+
+
+def remove_staging(universe_dir: Path) -> None:
+    """Delete the extracted backup (.restore/new), never the previous contents."""
+    shutil.rmtree(Path(universe_dir) / RESTORE_DIR_NAME / "new", ignore_errors=True)
+
+
+def remove_workspace(universe_dir: Path) -> None:
+    """Delete the whole workspace, including the previous contents (after a successful swap)."""
+    shutil.rmtree(Path(universe_dir) / RESTORE_DIR_NAME, ignore_errors=True)
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) in (3, 4) and argv[0] == "extract":
+        print(extract_archive(Path(argv[1]), Path(argv[2]), argv[3] if len(argv) == 4 else ""))
+        return 0
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
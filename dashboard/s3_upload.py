@@ -0,0 +1,427 @@
+"""
+Streaming backup upload to S3-compatible object storage.
+
+MultipartUploadWriter is a write-only file object: the backup tar stream is
+cut into parts of HYTALE_S3_PART_SIZE bytes, and up to HYTALE_S3_CONCURRENCY
+parts upload at once over pooled keep-alive connections. Nothing is written
+to local disk, and memory stays bounded at about part size x (concurrency + 2).
+
+Every part is sent with Content-MD5 (the server rejects corrupted parts) and
+its returned ETag is compared with the local MD5. After completion a HEAD
+request checks the object's size and multipart ETag.
+
+Uploads are resumable: an interrupted upload (network error, container
+restart) is kept open and recorded in backups/.s3-upload.json together with
+what the caller says the stream was made from (`source`). The upload is only
+resumed for the same source; the stream is then re-created and every part
+whose MD5 already matches the uploaded part is skipped. Compressed backup
+streams are deterministic (gzip members with mtime 0), so re-creating an
+unchanged stream costs CPU but no bandwidth. Any change shifts every later
+part boundary, so for a changed source the old upload is aborted instead.
+
+Stdlib only (SigV4 signing, path-style URLs), so it works with AWS S3, MinIO,
+Garage, Ceph RGW and moto. Configure with HYTALE_S3_ENDPOINT, HYTALE_S3_BUCKET,
+HYTALE_S3_ACCESS_KEY, HYTALE_S3_SECRET_KEY and optionally HYTALE_S3_REGION and
+HYTALE_S3_PREFIX.
+"""
+
+import base64
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from jobs import JobCancelled
+
+ENDPOINT = os.environ.get("HYTALE_S3_ENDPOINT", "")
+BUCKET = os.environ.get("HYTALE_S3_BUCKET", "")
+PREFIX = os.environ.get("HYTALE_S3_PREFIX", "hytale/")
+REGION = os.environ.get("HYTALE_S3_REGION", "us-east-1")
+ACCESS_KEY = os.environ.get("HYTALE_S3_ACCESS_KEY", "")
+SECRET_KEY = os.environ.get("HYTALE_S3_SECRET_KEY", "")
+PART_SIZE = int(os.environ.get("HYTALE_S3_PART_SIZE", str(16 * 1024 * 1024)))
+CONCURRENCY = int(os.environ.get("HYTALE_S3_CONCURRENCY", "4"))
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for all but the last part
+MAX_PARTS = 10000
+REQUEST_TIMEOUT = 60
+RETRIES = 5
+
+# Errors worth retrying: connection problems and throttling/server errors
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+_NETWORK_ERRORS = (OSError, http.client.HTTPException)
+
+
+class S3Error(Exception):
+    """Failed S3 request or checksum mismatch."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+def configured() -> bool:
+    return bool(ENDPOINT and BUCKET and ACCESS_KEY and SECRET_KEY)
+
+
+def _xml_find(root: ET.Element, tag: str) -> str | None:
+    """Text of the first element named tag, ignoring XML namespaces."""
+    for elem in root.iter():
+        if elem.tag == tag or elem.tag.endswith("}" + tag):
+            return elem.text
+    return None
+
+
+def _xml_findall(root: ET.Element, tag: str) -> list[ET.Element]:
+    return [elem for elem in root.iter() if elem.tag == tag or elem.tag.endswith("}" + tag)]
+
+
+def _query_string(query: dict) -> str:
+    """Canonical (sorted, URI-encoded) query string, also used as the request query."""
+    return "&".join(f"{quote(k, safe='-_.~')}={quote(str(v), safe='-_.~')}" for k, v in sorted(query.items()))
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+class S3Client:
+    """Minimal thread-safe S3 client (SigV4, path-style) with a connection pool."""
+
+    def __init__(self, endpoint: str = ENDPOINT, bucket: str = BUCKET, access_key: str = ACCESS_KEY,
+                 secret_key: str = SECRET_KEY, region: str = REGION, pool_size: int = CONCURRENCY + 1):
+        url = urlsplit(endpoint)
+        self.https = url.scheme == "https"
+        self.host = url.netloc
+        self.base_path = url.path.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    # Connections
+
+    def _get_connection(self) -> http.client.HTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            return cls(self.host, timeout=REQUEST_TIMEOUT)
+
+    def _put_connection(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    # Signing
+
+    def _sign(self, method: str, path: str, query: dict, headers: dict, payload_hash: str) -> None:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = now.strftime("%Y%m%d")
+        headers["host"] = self.host
+        headers["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = payload_hash
+        canonical_query = _query_string(query)
+        names = sorted(name.lower() for name in headers)
+        lowered = {name.lower(): str(value).strip() for name, value in headers.items()}
+        canonical_headers = "".join(f"{name}:{lowered[name]}\n" for name in names)
+        signed_headers = ";".join(names)
+        canonical = "\n".join([method, quote(path, safe="/-_.~"), canonical_query, canonical_headers,
+                               signed_headers, payload_hash])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+        key = _hmac(_hmac(_hmac(_hmac(f"AWS4{self.secret_key}".encode(), date), self.region), "s3"), "aws4_request")
+        signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["Authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={signed_headers}, Signature={signature}")
+
+    def request(self, method: str, key: str = "", query: dict | None = None, body: bytes = b"",
+                headers: dict | None = None, ok: tuple = (200,)) -> tuple[int, dict, bytes]:
+        """
+        Send a signed request for bucket/key, retrying network errors and
+        5xx/429 responses with backoff.
+
+        Returns:
+            tuple: (status, lower-cased response headers, body)
+
+        Raises:
+            S3Error: Non-ok status after retries, or persistent network error
+        """
+        query = query or {}
+        path = f"{self.base_path}/{self.bucket}" + (f"/{key}" if key else "")
+        payload_hash = hashlib.sha256(body).hexdigest()
+        for attempt in range(RETRIES):
+            req_headers = dict(headers or {})
+            self._sign(method, path, query, req_headers, payload_hash)
+            url = quote(path, safe="/-_.~") + (f"?{_query_string(query)}" if query else "")
+            conn = self._get_connection()
+            try:
+                conn.request(method, url, body=body, headers=req_headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except _NETWORK_ERRORS as e:
+                conn.close()
+                if attempt == RETRIES - 1:
+                    raise S3Error(f"{method} {key or self.bucket}: {e}") from e
+                time.sleep(min(8, 0.5 * 2 ** attempt))
+                continue
+            if resp.will_close:
+                conn.close()
+            else:
+                self._put_connection(conn)
+            if resp.status in ok:
+                return resp.status, {k.lower(): v for k, v in resp.getheaders()}, data
+            if resp.status not in _RETRY_STATUS or attempt == RETRIES - 1:
+                code = message = None
+                try:
+                    root = ET.fromstring(data)
+                    code, message = _xml_find(root, "Code"), _xml_find(root, "Message")
+                except ET.ParseError:
+                    pass
+                raise S3Error(f"{method} {key or self.bucket}: HTTP {resp.status} {code or ''} {message or ''}".strip(),
+                              resp.status)
+            time.sleep(min(8, 0.5 * 2 ** attempt))
+        raise S3Error(f"{method} {key or self.bucket}: retries exhausted")
+
+    # Multipart API
+
+    def create_multipart_upload(self, key: str) -> str:
+        _, _, data = self.request("POST", key, {"uploads": ""},
+                                  headers={"Content-Type": "application/octet-stream"})
+        upload_id = _xml_find(ET.fromstring(data), "UploadId")
+        if not upload_id:
+            raise S3Error(f"No UploadId for {key}")
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, number: int, data: bytes, md5: bytes) -> str:
+        """Upload one part and check the returned ETag against its MD5. Returns the ETag."""
+        _, headers, _ = self.request("PUT", key, {"partNumber": number, "uploadId": upload_id}, body=data,
+                                     headers={"Content-MD5": base64.b64encode(md5).decode(),
+                                              "Content-Length": str(len(data))})
+        etag = headers.get("etag", "").strip('"')
+        if etag and etag != md5.hex():
+            raise S3Error(f"Part {number} of {key}: ETag {etag} does not match MD5 {md5.hex()}")
+        return etag or md5.hex()
+
+    def list_parts(self, key: str, upload_id: str) -> dict[int, tuple[str, int]]:
+        """Parts already uploaded: {number: (etag, size)}."""
+        parts = {}
+        marker = 0
+        while True:
+            _, _, data = self.request("GET", key, {"uploadId": upload_id, "part-number-marker": marker})
+            root = ET.fromstring(data)
+            for part in _xml_findall(root, "Part"):
+                number = int(_xml_find(part, "PartNumber"))
+                parts[number] = (_xml_find(part, "ETag").strip('"'), int(_xml_find(part, "Size")))
+            if (_xml_find(root, "IsTruncated") or "false").lower() != "true":
+                return parts
+            marker = int(_xml_find(root, "NextPartNumberMarker") or 0)
+
+    def complete_multipart_upload(self, key: str, upload_id: str, etags: list[str]) -> None:
+        parts = "".join(f"<Part><PartNumber>{n}</PartNumber><ETag>\"{etag}\"</ETag></Part>"
+                        for n, etag in enumerate(etags, 1))
+        body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode()
+        _, _, data = self.request("POST", key, {"uploadId": upload_id}, body=body,
+                                  headers={"Content-Type": "application/xml"})
+        # S3 can report an error inside a 200 response
+        if b"<Error>" in data:
+            root = ET.fromstring(data)
+            raise S3Error(f"Complete {key}: {_xml_find(root, 'Code')} {_xml_find(root, 'Message')}")
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        self.request("DELETE", key, {"uploadId": upload_id}, ok=(200, 204, 404))
+
+    def head_object(self, key: str) -> dict:
+        _, headers, _ = self.request("HEAD", key)
+        return headers
+
+    def delete_object(self, key: str) -> None:
+        self.request("DELETE", key, ok=(200, 204, 404))
+
+
+class MultipartUploadWriter:
+    """
+    Write-only file object streaming into a multipart upload.
+
+    close() uploads the last part, completes and verifies the upload. Used as
+    a context manager, an exception keeps the upload open for resuming (see
+    state_file) unless it is a cancellation, which aborts it. A recorded
+    upload is resumed only for the same key and source.
+    """
+
+    def __init__(self, client: S3Client, key: str, part_size: int = PART_SIZE,
+                 concurrency: int = CONCURRENCY, state_file: Path | None = None, source: dict | None = None):
+        self.client = client
+        self.key = key
+        self.source = source
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.concurrency = max(1, concurrency)
+        self.state_file = Path(state_file) if state_file else None
+        self.bytes_in = 0
+        self.bytes_uploaded = 0
+        self.bytes_skipped = 0
+        self._buffer = bytearray()
+        self._etags = []
+        self._pending = deque()
+        self._closed = False
+        self._md5_all = hashlib.md5()
+        self.upload_id, self._resume_parts = self._start_or_resume()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="s3-part")
+
+    def _start_or_resume(self) -> tuple[str, dict]:
+        state = pending_upload(self.state_file)
+        if (state and state["key"] == self.key and state.get("part_size") == self.part_size
+                and state.get("source") == self.source):
+            try:
+                parts = self.client.list_parts(self.key, state["upload_id"])
+                print(f"[s3_upload] resuming {self.key} ({len(parts)} parts already uploaded)")
+                return state["upload_id"], parts
+            except S3Error as e:
+                print(f"[s3_upload] cannot resume {self.key} ({e}), starting over")
+        if state and state.get("bucket", self.client.bucket) == self.client.bucket:
+            # The recorded upload is replaced: abort it, or its parts stay in the bucket
+            try:
+                self.client.abort_multipart_upload(state["key"], state["upload_id"])
+                print(f"[s3_upload] aborted unfinished upload of {state['key']}")
+            except S3Error as e:
+                print(f"[s3_upload] could not abort unfinished upload of {state['key']}: {e}")
+        upload_id = self.client.create_multipart_upload(self.key)
+        if self.state_file is not None:
+            self.state_file.write_text(json.dumps({
+                "key": self.key, "upload_id": upload_id, "part_size": self.part_size,
+                "bucket": self.client.bucket, "started": time.time(), "source": self.source,
+            }))
+        return upload_id, {}
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self._closed:
+            raise ValueError("write to closed upload")
+        self._buffer += data
+        self.bytes_in += len(data)
+        while len(self._buffer) >= self.part_size:
+            with memoryview(self._buffer) as view:
+                part = bytes(view[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def _submit(self, part: bytes) -> None:
+        number = len(self._etags) + len(self._pending) + 1
+        if number > MAX_PARTS:
+            raise S3Error(f"{self.key}: more than {MAX_PARTS} parts, raise HYTALE_S3_PART_SIZE")
+        md5 = hashlib.md5(part).digest()
+        self._md5_all.update(md5)
+        done = self._resume_parts.get(number)
+        if done and done[0] == md5.hex() and done[1] == len(part):
+            self.bytes_skipped += len(part)
+            self._pending.append((None, md5.hex()))
+        else:
+            self._pending.append((self._pool.submit(self.client.upload_part, self.key, self.upload_id,
+                                                    number, part, md5), len(part)))
+        # Bound memory: at most `concurrency` parts queued or uploading
+        while len(self._pending) > self.concurrency:
+            self._drain_one()
+
+    def _drain_one(self) -> None:
+        future, value = self._pending.popleft()
+        if future is None:
+            self._etags.append(value)
+        else:
+            self._etags.append(future.result())
+            self.bytes_uploaded += value
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._buffer or not (self._etags or self._pending):
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._drain_one()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self.client.complete_multipart_upload(self.key, self.upload_id, self._etags)
+        self._verify()
+        if self.state_file is not None:
+            self.state_file.unlink(missing_ok=True)
+
+    def _verify(self) -> None:
+        headers = self.client.head_object(self.key)
+        size = int(headers.get("content-length", -1))
+        if size != self.bytes_in:
+            raise S3Error(f"{self.key}: uploaded size {size} != {self.bytes_in} bytes written")
+        etag = headers.get("etag", "").strip('"')
+        expected = f"{self._md5_all.hexdigest()}-{len(self._etags)}"
+        if "-" in etag and etag != expected:
+            raise S3Error(f"{self.key}: multipart ETag {etag} != expected {expected}")
+
+    def abort(self) -> None:
+        """Give up the upload and delete its parts."""
+        self._closed = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        try:
+            self.client.abort_multipart_upload(self.key, self.upload_id)
+        finally:
+            if self.state_file is not None:
+                self.state_file.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        # Cancelled by the user: drop the upload. Anything else: keep it for resuming.
+        if self.state_file is None or issubclass(exc_type, (JobCancelled, KeyboardInterrupt)):
+            try:
+                self.abort()
+            except S3Error as e:
+                print(f"[s3_upload] abort of {self.key} failed: {e}")
+        else:
+            self._closed = True
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            print(f"[s3_upload] upload of {self.key} interrupted ({exc}), will resume on the next backup")
+
+
+def pending_upload(state_file: Path | None) -> dict | None:
+    """The interrupted upload recorded in state_file, if any."""
+    if state_file is None:
+        return None
+    try:
+        return json.loads(Path(state_file).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> S3Client:
+    """Process-wide client for the configured endpoint."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = S3Client()
+        return _client
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Server runner: keeps the Hytale server running (supervisord's hytale-server
+program, replacing the screen loop of server-wrapper.sh).
+
+The wrapper looped every second, forking `screen -list | grep` several times
+per pass to notice a dead server and to poll the command file. The runner is
+one asyncio loop that only wakes up for something to do:
+
+- start.sh is run with HYTALE_RUNNER=1, so it execs java directly; its
+  stdin is a pipe owned by the console broker, which stays up across
+  restarts (commands are rejected while the server is down)
+- stdout and stderr go through a pipe into the rotating log sink
+  (log_rotation.LogSink), in order with the broker's command tag lines
+- the exit is noticed through a pidfd (a thread blocked in waitpid where
+  pidfds are not available) and reaped with waitpid
+- after an exit the server is started again after HYTALE_RESTART_BACKOFF
+  seconds, doubled for every run shorter than STABLE_SECONDS (at most
+  BACKOFF_MAX)
+- SIGINT/SIGTERM (supervisorctl stop) sends /stop to the console, then
+  SIGTERM after STOP_TIMEOUT and SIGKILL after KILL_TIMEOUT; the server runs
+  in its own session, so only the runner decides how it is stopped
+
+The first start of a server version is a training run for the class data
+sharing archive (cds_archive.py): TRAIN_DELAY seconds after the server is
+ready, the runner has the JVM write it.
+
+The runner's state answers {"op": "status"} on the console socket
+(console_broker.get_status()): state (waiting, starting, running, stopping,
+backoff), the JVM's pid, start and ready time, restarts and the last exit.
+
+Usage:
+    python3 server_runner.py
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import cds_archive
+from console_broker import SOCKET_PATH, BrokerError, ConsoleBroker
+from jvm_launcher import last_command
+from log_events import READY_RE
+from log_rotation import LogSink
+
+SERVER_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+START_SCRIPT = SERVER_DIR / "start.sh"
+LOG_FILE = SERVER_DIR / "logs" / "server.log"
+FIFO_PATH = SERVER_DIR / ".console_pipe"
+SETUP_WAIT = float(os.environ.get("HYTALE_SETUP_WAIT_SECONDS", "5"))
+BACKOFF_MIN = float(os.environ.get("HYTALE_RESTART_BACKOFF", "5"))
+BACKOFF_MAX = 300
+STABLE_SECONDS = 60
+STOP_COMMAND = "/stop"
+STOP_TIMEOUT = 30  # supervisord stopwaitsecs is 60
+KILL_TIMEOUT = 10
+READ_SIZE = 64 * 1024
+
+
+def server_files_present(server_dir: Path = SERVER_DIR) -> bool:
+    return (server_dir / "Server" / "HytaleServer.jar").is_file() and (server_dir / "Assets.zip").is_file()
+
+
+async def _pipe_writer(pipe) -> asyncio.StreamWriter:
+    """StreamWriter for the write end of a pipe (the server's stdin)."""
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, pipe)
+    return asyncio.StreamWriter(transport, protocol, None, loop)
+
+
+async def _wait_exit(proc: subprocess.Popen) -> int:
+    """Wait for proc to exit without polling and reap it. Returns its exit code."""
+    try:
+        pidfd = os.pidfd_open(proc.pid)
+    except (AttributeError, OSError):
+        return await asyncio.to_thread(proc.wait)
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+    return proc.wait()
+
+
+class ServerRunner:
+    def __init__(self, command: list[str] | None = None, server_dir: Path = SERVER_DIR,
+                 socket_path: Path = SOCKET_PATH, fifo_path: Path | None = FIFO_PATH,
+                 log_file: Path = LOG_FILE):
+        self.command = command or [str(START_SCRIPT)]
+        self.server_dir = Path(server_dir)
+        self.fifo_path = fifo_path
+        self.log_file = log_file
+        self.broker = ConsoleBroker(socket_path, fifo_path, log=self._log_tag, status=self.status)
+        self.sink = None
+        self.state = "stopped"
+        self.proc = None
+        self.started = None
+        self.ready = None
+        self.restarts = 0
+        self.last_exit = None
+        self.next_start = None
+        self._stopping = None
+        self._output_fd = None
+        self._pending = b""
+        self._cds_task = None
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "pid": self.proc.pid if self.proc is not None else None,
+            "started": self.started,
+            "ready": self.ready,
+            "restarts": self.restarts,
+            "last_exit": self.last_exit,
+            "next_start": self.next_start,
+            "runner_pid": os.getpid(),
+        }
+
+    def stop(self) -> None:
+        if not self._stopping.is_set():
+            print("[server_runner] Stop requested")
+            self._stopping.set()
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Sleep unless a stop is requested. Returns False on stop."""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    # -- output ------------------------------------------------------------
+
+    def _read_output(self) -> None:
+        """Copy what the server wrote to the log sink (also called before each tag line)."""
+        fd = self._output_fd
+        if fd is None:
+            return
+        while True:
+            try:
+                chunk = os.read(fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not chunk:
+                self._close_output()
+                break
+            *lines, self._pending = (self._pending + chunk).split(b"\n")
+            for line in lines:
+                self.sink.write_line(line + b"\n")
+                if self.ready is None and READY_RE.search(line.decode("utf-8", errors="replace")):
+                    self.ready = time.time()
+                    self.state = "running"
+                    print(f"[server_runner] Server ready after {self.ready - self.started:.1f} s")
+                    self._cds_task = asyncio.ensure_future(self._train_cds(self.proc.pid))
+        self.sink.flush()
+
+    def _close_output(self) -> None:
+        asyncio.get_running_loop().remove_reader(self._output_fd)
+        os.close(self._output_fd)
+        self._output_fd = None
+        if self._pending:
+            self.sink.write_line(self._pending + b"\n")
+            self._pending = b""
+        self.sink.flush()
+
+    def _log_tag(self, line: str) -> None:
+        self._read_output()
+        self.sink.write_line(line.encode() + b"\n")
+        self.sink.flush()
+
+    # -- process -----------------------------------------------------------
+
+    async def _run_once(self) -> int:
+        """Start the server, wait until it exits (or stop it on request). Returns its exit code."""
+        read_fd, write_fd = os.pipe()
+        try:
+            self.proc = subprocess.Popen(self.command, cwd=self.server_dir, stdin=subprocess.PIPE,
+                                         stdout=write_fd, stderr=write_fd, start_new_session=True,
+                                         env={**os.environ, "HYTALE_RUNNER": "1"})
+        except OSError:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        self.started, self.ready, self.state = time.time(), None, "starting"
+        print(f"[server_runner] Server started (pid {self.proc.pid})")
+        os.set_blocking(read_fd, False)
+        self._output_fd = read_fd
+        asyncio.get_running_loop().add_reader(read_fd, self._read_output)
+        stdin = await _pipe_writer(self.proc.stdin)
+        self.broker.attach(stdin)
+
+        exit_task = asyncio.ensure_future(_wait_exit(self.proc))
+        stop_task = asyncio.ensure_future(self._stopping.wait())
+        try:
+            await asyncio.wait({exit_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not exit_task.done():
+                await self._shutdown(exit_task)
+            returncode = await exit_task
+        finally:
+            stop_task.cancel()
+            if self._cds_task is not None:
+                self._cds_task.cancel()
+                self._cds_task = None
+            self.broker.attach(None)
+            stdin.close()
+        self._read_output()  # what is left in the pipe
+        if self._output_fd is not None:
+            self._close_output()  # a leftover child still holds the pipe open
+        self.proc = None
+        return returncode
+
+    async def _train_cds(self, pid: int) -> None:
+        """Training run (first start of a version): have the JVM write its CDS archive."""
+        record = last_command()
+        if record is None or record.get("pid") != pid or record.get("cds", {}).get("mode") != "train":
+            return
+        if not await self._sleep(cds_archive.TRAIN_DELAY) or self.proc is None or self.proc.pid != pid:
+            return
+        try:
+            result = await asyncio.to_thread(cds_archive.dump, pid, record["cds"])
+        except (OSError, TimeoutError) as e:
+            print(f"[server_runner] CDS archive not written: {e}")
+            return
+        print(f"[server_runner] CDS archive written: {result['archive']} "
+              f"({result['size'] // 1024 ** 2} MB, {result['seconds']} s), used from the next start")
+
+    async def _shutdown(self, exit_task: asyncio.Future) -> None:
+        self.state = "stopping"
+        try:
+            await self.broker.write(STOP_COMMAND)
+        except BrokerError as e:
+            print(f"[server_runner] {STOP_COMMAND} not sent: {e}")
+        for timeout, name, send in ((STOP_TIMEOUT, "SIGTERM", self.proc.terminate),
+                                    (KILL_TIMEOUT, "SIGKILL", self.proc.kill)):
+            try:
+                await asyncio.wait_for(asyncio.shield(exit_task), timeout)
+                return
+            except asyncio.TimeoutError:
+                print(f"[server_runner] Server still running after {timeout} s, sending {name}")
+                send()
+
+    async def run(self) -> int:
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            loop.add_signal_handler(sig, self.stop)
+        self.sink = LogSink(self.log_file)
+        if self.fifo_path is not None and not Path(self.fifo_path).is_fifo():
+            # Legacy console pipe, forwarded by the broker (start.sh creates it otherwise)
+            Path(self.fifo_path).unlink(missing_ok=True)
+            os.mkfifo(self.fifo_path)
+            os.chmod(self.fifo_path, 0o660)
+        await self.broker.start()
+        failures = 0
+        try:
+            while not self._stopping.is_set():
+                if not server_files_present(self.server_dir):
+                    if self.state != "waiting":
+                        print("[server_runner] Server files not found. Waiting for setup "
+                              "(Server/HytaleServer.jar + Assets.zip)...")
+                        self.state = "waiting"
+                    await self._sleep(SETUP_WAIT)
+                    continue
+                try:
+                    returncode = await self._run_once()
+                except OSError as e:
+                    print(f"[server_runner] ERROR: could not start {self.command[0]}: {e}")
+                    returncode = None
+                uptime = time.time() - self.started if returncode is not None else 0
+                self.last_exit = {"code": returncode, "at": time.time(), "uptime": round(uptime, 1)}
+                if self._stopping.is_set():
+                    print(f"[server_runner] Server stopped (exit code {returncode})")
+                    break
+                failures = 0 if uptime >= STABLE_SECONDS else failures + 1
+                delay = min(BACKOFF_MAX, BACKOFF_MIN * 2 ** max(0, failures - 1))
+                print(f"[server_runner] Server exited (code {returncode}) after {uptime:.0f} s, "
+                      f"restarting in {delay:.0f} s")
+                self.state, self.next_start = "backoff", time.time() + delay
+                if await self._sleep(delay):
+                    self.restarts += 1
+                self.next_start = None
+        finally:
+            self.state = "stopped"
+            await self.broker.close()
+            self.sink.close()
+        return 0
+
+
+def main(argv: list[str]) -> int:
+    if argv:
+        print(__doc__)
+        return 2
+    sys.stdout.reconfigure(line_buffering=True)
+    return asyncio.run(ServerRunner().run())
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -4,13 +4,17 @@ These routes are added to the main app.py when running in Docker.
 """
 
 import os
-import subprocess
+import re
+import json
 import asyncio
 from pathlib import Path
-from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
+from async_exec import start_process, terminate
+from tailscale_routes import verify_credentials
+
 # Configuration
 HYTALE_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
 DOWNLOADER_DIR = HYTALE_DIR / ".downloader"
@@ -20,13 +24,26 @@ DOWNLOAD_LOG = HYTALE_DIR / "logs" / "download.log"
 SERVER_JAR = HYTALE_DIR / "Server" / "HytaleServer.jar"
 ASSETS_ZIP = HYTALE_DIR / "Assets.zip"
 
+LOG_DIR = HYTALE_DIR / "logs"
+STREAM_LOG_FILES = {
+    "server": LOG_DIR / "server.log",
+    "error": LOG_DIR / "server-error.log",
+}
+STREAM_HEARTBEAT = 15  # seconds between SSE keep-alive comments
+ALLOW_CONTROL = os.environ.get("ALLOW_CONTROL", "false").lower() in ("1", "true", "yes")
+_search_indexes = {}
+
 router = APIRouter()
 templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
 
-# Track download process
+# Track download process (asyncio subprocess, output is logged by download.sh)
 download_process = None
 
 
+def _download_running() -> bool:
+    return download_process is not None and download_process.returncode is None
+
+
 @router.get("/setup", response_class=HTMLResponse)
 async def setup_page(request: Request):
     """Render the setup wizard page."""
@@ -40,7 +57,7 @@ async def setup_status():
         "downloader_exists": DOWNLOADER_BIN.exists(),
         "credentials_exist": CREDENTIALS_FILE.exists(),
         "server_installed": SERVER_JAR.exists() and ASSETS_ZIP.exists(),
-        "download_running": download_process is not None and download_process.poll() is None,
+        "download_running": _download_running(),
     })
 
 
@@ -56,7 +73,7 @@ async def start_download():
         }, status_code=400)
 
     # Check if already running
-    if download_process is not None and download_process.poll() is None:
+    if _download_running():
         return JSONResponse({
             "error": "Download läuft bereits / Download already running",
         }, status_code=400)
@@ -73,12 +90,9 @@ async def start_download():
 
     if download_script.exists():
         try:
-            download_process = subprocess.Popen(
+            download_process = await start_process(
                 ["/bin/bash", str(download_script)],
                 cwd=str(DOWNLOADER_DIR),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
             )
             return JSONResponse({"ok": True, "pid": download_process.pid})
         except Exception as e:
@@ -101,7 +115,7 @@ async def get_download_log():
         except Exception:
             pass
 
-    running = download_process is not None and download_process.poll() is None
+    running = _download_running()
 
     return JSONResponse({
         "log": log_content,
@@ -114,8 +128,8 @@ async def cancel_download():
     """Cancel the running download process."""
     global download_process
 
-    if download_process is not None and download_process.poll() is None:
-        download_process.terminate()
+    if _download_running():
+        await terminate(download_process)
         download_process = None
         return JSONResponse({"ok": True, "message": "Download abgebrochen / Download cancelled"})
 
@@ -173,23 +187,359 @@ async def update_settings(request: Request):
 
 
 @router.post("/api/console/command")
-async def send_console_command(request: Request):
-    """Send a command to the server console."""
+async def send_console_command(request: Request, user: str = Depends(verify_credentials)):
+    """
+    Send a command to the server console.
+
+    With `"capture": true` the command's console output is returned as
+    `output`: the server.log lines after the command, until no line came for
+    `quiet_ms` (default 300), a line contained the text `until`, or
+    `timeout_ms` (default 10000) passed. With `"stream": true` the output is
+    sent as Server-Sent Events instead (ack, lines..., done).
+    """
     body = await request.json()
     command = body.get("command", "").strip()
 
     if not command:
         return JSONResponse({"error": "No command provided"}, status_code=400)
 
-    command_file = HYTALE_DIR / ".server_command"
+    from console_broker import BrokerError, send_commands_async
+
+    if body.get("capture") or body.get("stream"):
+        from console_capture import MAX_LINES, MAX_UNTIL, QUIET, TIMEOUT, run_command, stream_command
+
+        until = body.get("until") or None
+        if until is not None and (not isinstance(until, str) or len(until) > MAX_UNTIL):
+            return JSONResponse({"error": f"Invalid capture options: until must be a text of at most "
+                                          f"{MAX_UNTIL} characters"}, status_code=400)
+        try:
+            options = {
+                "quiet": min(float(body.get("quiet_ms", QUIET * 1000)), 10000) / 1000,
+                "timeout": min(float(body.get("timeout_ms", TIMEOUT * 1000)), 60000) / 1000,
+                "until": until,
+                "max_lines": min(int(body.get("max_lines", MAX_LINES)), MAX_LINES),
+            }
+        except (TypeError, ValueError) as e:
+            return JSONResponse({"error": f"Invalid capture options: {e}"}, status_code=400)
+
+        if body.get("stream"):
+            async def events():
+                try:
+                    async for item in stream_command(command, **options):
+                        yield f"event: {item['type']}\ndata: {json.dumps(item)}\n\n"
+                except (BrokerError, OSError) as e:
+                    yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+            return StreamingResponse(
+                events(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        try:
+            result = await run_command(command, **options)
+        except (BrokerError, OSError) as e:
+            return JSONResponse({"error": str(e)}, status_code=500)
+        if not result["ok"]:
+            return JSONResponse({"error": result["error"]}, status_code=503)
+        return JSONResponse({"message": f"Command sent: {command}", **result})
 
     try:
-        # Write command to file (server-wrapper.sh reads this)
-        with open(command_file, "a") as f:
-            f.write(command + "\n")
-        return JSONResponse({"ok": True, "message": f"Command sent: {command}"})
-    except Exception as e:
+        # Console broker socket (not ok, i.e. 503, if the broker is not running)
+        ack = (await send_commands_async(command))[0]
+    except (BrokerError, OSError) as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    if not ack["ok"]:
+        return JSONResponse({"error": ack["error"]}, status_code=503)
+    return JSONResponse({"ok": True, "message": f"Command sent: {command}", "seq": ack["seq"]})
+
+
+@router.get("/api/logs/stream")
+async def stream_logs(request: Request, file: str = "server", cursor: str = "",
+                      user: str = Depends(verify_credentials)):
+    """
+    Stream new log lines as Server-Sent Events.
+
+    All clients share one tailer per log file (server.log is fed by the log
+    event pipeline). Each event carries a batch of
+    ANSI-stripped lines and uses the log cursor as its id, so a reconnecting
+    EventSource (Last-Event-ID) or `?cursor=` resumes without gaps.
+    """
+    from log_events import get_pipeline
+    from log_stream import INITIAL_LINES, PipelineFeed, get_tailer
+    from log_tail import decode_cursor, read_since, strip_ansi
+
+    log_file = STREAM_LOG_FILES.get(file)
+    if log_file is None:
+        return JSONResponse({"error": f"Unknown log file: {file}"}, status_code=400)
+
+    resume = request.headers.get("last-event-id") or cursor
+    tailer = PipelineFeed(get_pipeline()) if file == "server" else get_tailer(log_file)
+    sub = tailer.subscribe(asyncio.get_running_loop())
+
+    def sse(batch: dict) -> str:
+        return f"id: {batch['cursor']}\ndata: {json.dumps(batch)}\n\n"
+
+    async def events():
+        try:
+            # Subscribe first, then catch up, so nothing falls between the two.
+            sent = None  # (inode, offset) up to which lines were sent
+            if log_file.exists():
+                update = {"more": True, "cursor": resume}
+                while update["more"]:
+                    update = await asyncio.to_thread(read_since, log_file, update["cursor"], INITIAL_LINES)
+                    update["lines"] = [strip_ansi(line.rstrip()) for line in update["lines"]]
+                    yield sse(update)
+                sent = decode_cursor(update["cursor"])
+
+            while not await request.is_disconnected():
+                try:
+                    batch = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                end, since = decode_cursor(batch["cursor"]), decode_cursor(batch["since"])
+                start = since
+                if sent and end and end[0] == sent[0]:
+                    if end[1] <= sent[1]:
+                        continue  # already sent
+                    start = sent
+                if start and end and (start != since or not batch.get("dense", True)):
+                    # The batch overlaps what was sent, leaves a gap or has only the
+                    # typed lines of a backlog scan: send its range from the file instead.
+                    fill = await asyncio.to_thread(tailer.read_range, start, end)
+                    if fill is not None:
+                        sub.dropped = 0
+                        for part in fill:
+                            yield sse(part)
+                        sent = end
+                        continue
+                sent = end
+                if sub.dropped:
+                    batch = {**batch, "dropped": sub.dropped}
+                    sub.dropped = 0
+                yield sse(batch)
+        finally:
+            tailer.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/logs/search")
+async def search_logs(file: str = "server", start: str = "", end: str = "", q: str = "",
+                      regex: bool = False, limit: int = 200, cursor: str = "",
+                      user: str = Depends(verify_credentials)):
+    """
+    Search server logs (including rotated segments) by time window and text.
+
+    `start`/`end` accept "YYYY-MM-DD HH:MM[:SS]". `q` is a case-insensitive
+    substring, or a regular expression with `regex=true`. Results are paged:
+    pass `next` back as `cursor` to continue.
+    """
+    from log_search import SparseIndex, normalize_timestamp, search_logs as run_search
+
+    log_file = STREAM_LOG_FILES.get(file)
+    if log_file is None:
+        return JSONResponse({"error": f"Unknown log file: {file}"}, status_code=400)
+
+    try:
+        start_ts = normalize_timestamp(start)
+        end_ts = normalize_timestamp(end, upper=True)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    index = _search_indexes.get(file)
+    if index is None:
+        index = _search_indexes[file] = SparseIndex(log_file, HYTALE_DIR / f".log_search_{file}.json")
+
+    try:
+        result = await asyncio.to_thread(run_search, log_file, index, start_ts, end_ts, q, regex, limit, cursor)
+    except re.error as e:
+        return JSONResponse({"error": f"Invalid regex: {e}"}, status_code=400)
+    except (PermissionError, OSError) as e:
         return JSONResponse({"error": str(e)}, status_code=500)
+    return JSONResponse(result)
+
+
+# ============================================================================
+# Background Jobs API (backups, updates)
+# ============================================================================
+
+@router.get("/api/jobs")
+async def list_jobs(user: str = Depends(verify_credentials)):
+    """List recent background jobs, newest first."""
+    from jobs import get_job_manager
+    return JSONResponse({"jobs": [job.to_dict() for job in reversed(get_job_manager().list())]})
+
+
+@router.post("/api/jobs")
+async def start_job(request: Request, user: str = Depends(verify_credentials)):
+    """
+    Start a background job ({"type": "backup" | "update" | "prune" | "rollback"},
+    or {"type": "restore", "name": backup, "world": optional world folder}) and
+    return its id immediately. If a job of that type is already running, it
+    is returned instead of starting a second one.
+    """
+    if not ALLOW_CONTROL:
+        raise HTTPException(status_code=403, detail="Control-Aktionen deaktiviert.")
+    from docker_overrides import (
+        start_backup_job, start_prune_job, start_restore_job, start_rollback_job, start_update_job,
+    )
+
+    body = await request.json()
+    job_type = body.get("type", "")
+    if job_type == "backup":
+        job, created = start_backup_job()
+        job = job.to_dict()
+    elif job_type == "prune":
+        job, created = start_prune_job()
+        job = job.to_dict()
+    elif job_type == "restore":
+        name = body.get("name") or ""
+        if not name:
+            return JSONResponse({"error": "Backup-Name fehlt / Backup name missing"}, status_code=400)
+        job, created = start_restore_job(name, body.get("world") or "")
+        job = job.to_dict()
+    elif job_type == "update":
+        result = start_update_job()
+        job, created = result["job"], result["created"]
+    elif job_type == "rollback":
+        job, created = start_rollback_job()
+        job = job.to_dict()
+    else:
+        return JSONResponse({"error": f"Unknown job type: {job_type}"}, status_code=400)
+    return JSONResponse({"job": job, "created": created}, status_code=202 if created else 200)
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, user: str = Depends(verify_credentials)):
+    """Return state, progress and result of a background job."""
+    from jobs import get_job_manager
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job nicht gefunden / Job not found"}, status_code=404)
+    return JSONResponse(job.to_dict())
+
+
+@router.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, user: str = Depends(verify_credentials)):
+    """Cancel a queued or running job."""
+    if not ALLOW_CONTROL:
+        raise HTTPException(status_code=403, detail="Control-Aktionen deaktiviert.")
+    from jobs import get_job_manager
+    if not get_job_manager().cancel(job_id):
+        return JSONResponse({"ok": False, "message": "Job nicht aktiv / Job not active"}, status_code=409)
+    return JSONResponse({"ok": True, "message": "Abbruch angefordert / Cancellation requested"})
+
+
+@router.get("/api/backups/catalog")
+async def get_backup_catalog_route(user: str = Depends(verify_credentials)):
+    """
+    Backups from the catalog (newest first) with size, duration, file count and
+    checksum, plus totals, the retention policy and the backups it would prune.
+    """
+    import backup_catalog
+    from docker_overrides import get_backup_catalog, get_backup_frequency
+
+    catalog = get_backup_catalog()
+
+    def collect():
+        return {
+            "backups": catalog.backups(),
+            "summary": catalog.summary(),
+            "frequency_hours": get_backup_frequency(),
+            "retention": {
+                "keep_hourly": backup_catalog.KEEP_HOURLY,
+                "keep_daily": backup_catalog.KEEP_DAILY,
+                "keep_weekly": backup_catalog.KEEP_WEEKLY,
+                "max_bytes": backup_catalog.MAX_BYTES,
+                "would_prune": [b["name"] for b in catalog.plan()],
+            },
+        }
+
+    return JSONResponse(await asyncio.to_thread(collect))
+
+
+@router.post("/api/backups/catalog/{name}/pin")
+async def pin_backup(name: str, request: Request, user: str = Depends(verify_credentials)):
+    """Pin ({"pinned": true}) or unpin a backup; pinned backups are never pruned."""
+    if not ALLOW_CONTROL:
+        raise HTTPException(status_code=403, detail="Control-Aktionen deaktiviert.")
+    from docker_overrides import get_backup_catalog
+
+    body = await request.json()
+    pinned = bool(body.get("pinned", True))
+    if not await asyncio.to_thread(get_backup_catalog().pin, name, pinned):
+        return JSONResponse({"error": "Backup nicht gefunden / Backup not found"}, status_code=404)
+    return JSONResponse({"ok": True, "name": name, "pinned": pinned})
+
+
+@router.get("/api/backups/snapshot")
+async def get_snapshot_stats(user: str = Depends(verify_credentials)):
+    """
+    Timing of the last backup snapshot: how long saves were paused (pause_ms),
+    the final copy (copy_ms), the flush wait and whether it was consistent.
+    """
+    from snapshot import last_snapshot_stats
+    from docker_overrides import BACKUP_SNAPSHOT
+    return JSONResponse({"enabled": BACKUP_SNAPSHOT, "last": last_snapshot_stats()})
+
+
+@router.get("/api/versions")
+async def get_versions(user: str = Depends(verify_credentials)):
+    """
+    Server versions kept in versions/ (staged updates): current, previous
+    (rollback target), pending (activated on the next restart), and the last
+    switches with their downtime.
+    """
+    import staged_update
+    from docker_overrides import SERVER_DIR, UPDATE_MODE
+
+    def collect():
+        return {"mode": UPDATE_MODE, **staged_update.list_versions(SERVER_DIR),
+                "history": staged_update.history(SERVER_DIR)}
+
+    return JSONResponse(await asyncio.to_thread(collect))
+
+
+@router.get("/api/server/jvm")
+async def get_jvm_settings(user: str = Depends(verify_credentials)):
+    """
+    JVM profiles, the selected one, the options the next start would use (with
+    the container limits and memory budgets they come from), the command line
+    of the last start and the class data sharing archives.
+    """
+    import cds_archive
+    import jvm_launcher
+
+    def collect():
+        return {"profiles": jvm_launcher.PROFILES, "plan": jvm_launcher.plan(),
+                "last_start": jvm_launcher.last_command(), "cds_archives": cds_archive.list_archives()}
+
+    return JSONResponse(await asyncio.to_thread(collect))
+
+
+@router.post("/api/server/jvm")
+async def set_jvm_settings(request: Request, user: str = Depends(verify_credentials)):
+    """Select a JVM profile ({"profile": "g1"}, null for HYTALE_JVM_PROFILE); applies on the next start."""
+    if not ALLOW_CONTROL:
+        raise HTTPException(status_code=403, detail="Control-Aktionen deaktiviert.")
+    import jvm_launcher
+    from docker_overrides import set_jvm_profile
+
+    body = await request.json()
+    profile = body.get("profile")
+    if profile is not None and profile not in jvm_launcher.PROFILES:
+        return JSONResponse({"error": f"Unbekanntes Profil / Unknown profile: {profile}",
+                             "profiles": sorted(jvm_launcher.PROFILES)}, status_code=400)
+    if not set_jvm_profile(profile):
+        return JSONResponse({"error": "Speichern fehlgeschlagen / Save failed"}, status_code=500)
+    return JSONResponse({"ok": True, "plan": await asyncio.to_thread(jvm_launcher.plan),
+                         "message": "Gilt ab dem nächsten Serverstart / Applies from the next server start"})
 
 
 @router.get("/api/ports")
@@ -197,7 +547,7 @@ async def get_port_mappings():
     """Get Docker port mappings for this container."""
     try:
         from docker_overrides import get_port_mappings
-        return JSONResponse(get_port_mappings())
+        return JSONResponse(await asyncio.to_thread(get_port_mappings))
     except ImportError:
         return JSONResponse({
             "available": False,
@@ -225,16 +575,20 @@ async def check_cf_status():
             "message": "Kein API-Key konfiguriert / No API key configured"
         })
 
-    # Test the API key
+    # Test the API key (in a worker thread, urlopen blocks)
     import urllib.request
-    try:
+
+    def probe() -> int:
         req = urllib.request.Request(
             "https://api.curseforge.com/v1/games",
             headers={"Accept": "application/json", "x-api-key": api_key}
         )
         with urllib.request.urlopen(req, timeout=10) as resp:
-            if resp.status == 200:
-                return JSONResponse({"valid": True, "message": "API-Key gültig / API key valid"})
+            return resp.status
+
+    try:
+        if await asyncio.to_thread(probe) == 200:
+            return JSONResponse({"valid": True, "message": "API-Key gültig / API key valid"})
     except Exception as e:
         return JSONResponse({
             "valid": False,
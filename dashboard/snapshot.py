@@ -0,0 +1,281 @@
+"""
+Consistent, low-pause snapshots of the universe for backups.
+
+Copying universe/ while the JVM writes region files can archive torn saves,
+and stopping the server for a backup means minutes of downtime. Instead:
+
+1. Pre-sync: bring a staging copy (HYTALE_SNAPSHOT_DIR) up to date while the
+   server keeps running. Only files whose size or mtime differ are copied.
+2. Pause: send the save-pause and save-flush commands through the console
+   channel (console_broker.py) and wait for the save-complete log line.
+3. Final sync: copy the few files written since the pre-sync.
+4. Resume saving. The backup is compressed from the staging copy afterwards,
+   while the server runs normally.
+
+Files are copied with reflinks (FICLONE, btrfs/XFS) where the filesystem
+supports it, otherwise with a regular copy. Hardlinks are not used: the server
+rewrites region files in place, which would change the snapshot as well.
+
+The save commands depend on the server build and plugins, so they are
+configurable (HYTALE_SAVE_*). With no pause command configured, only the
+flush is sent and the final sync follows the save-complete line directly;
+saves can then land during the final sync, so such a snapshot of a running
+server is not marked consistent.
+"""
+
+import errno
+import fcntl
+import json
+import os
+import re
+import shutil
+import stat
+import time
+from pathlib import Path
+
+from console_broker import send_commands
+from log_events import classify
+from log_tail import read_since
+
+SERVER_DIR = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+SNAPSHOT_DIR = Path(os.environ.get("HYTALE_SNAPSHOT_DIR", str(SERVER_DIR / ".snapshot")))
+LOG_FILE = SERVER_DIR / "logs" / "server.log"
+
+SAVE_FLUSH_COMMAND = os.environ.get("HYTALE_SAVE_FLUSH_COMMAND", "save")
+SAVE_PAUSE_COMMAND = os.environ.get("HYTALE_SAVE_PAUSE_COMMAND", "")
+SAVE_RESUME_COMMAND = os.environ.get("HYTALE_SAVE_RESUME_COMMAND", "")
+# Default: a line of the server's logger (timestamp and level) reporting a
+# finished save. Chat, player commands and console tag lines never count.
+SAVE_DONE_RE = re.compile(os.environ.get(
+    "HYTALE_SAVE_DONE_PATTERN",
+    r"^\[\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}\s+\w+\]\s*(?:\[[^\]]*\]\s*)*"
+    r"(?i:save (?:complete|completed|finished|done)|saved (?:the )?(?:world|universe|game|all|chunks)"
+    r"|(?:world|universe|game) saved\b)",
+))
+SAVE_TIMEOUT = float(os.environ.get("HYTALE_SAVE_TIMEOUT", "30"))
+POLL_INTERVAL = 0.1
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int), linux/fs.h
+STATS_FILE_NAME = "last.json"
+
+
+class _Copier:
+    """Copies files with FICLONE where possible, falling back to a plain copy."""
+
+    def __init__(self):
+        self.reflink = True
+        self.method = "reflink"
+
+    def copy(self, src: Path, dst: Path, st: os.stat_result) -> None:
+        tmp = dst.with_name(f".{dst.name}.snap")
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            copied = False
+            if self.reflink:
+                try:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                    copied = True
+                except OSError as e:
+                    if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                        raise
+                    self.reflink = False
+                    self.method = "copy"
+            if not copied:
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+        os.chmod(tmp, stat.S_IMODE(st.st_mode))
+        # Source mtime on the copy: the next sync compares size + mtime
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, dst)
+
+
+def sync_tree(src: Path, dst: Path, copier: _Copier | None = None, job=None) -> dict:
+    """
+    Make dst an exact copy of src, copying only files whose size or mtime
+    differ and removing what no longer exists in src.
+
+    Returns:
+        dict: {"copied": files copied, "bytes": bytes copied, "removed": entries removed}
+    """
+    copier = copier or _Copier()
+    src, dst = Path(src), Path(dst)
+    dst.mkdir(parents=True, exist_ok=True)
+    copied = copied_bytes = removed = 0
+    for root, dirs, names in os.walk(src):
+        if job is not None:
+            job.check_cancelled()
+        rel = Path(root).relative_to(src)
+        target_dir = dst / rel
+        present = set(os.listdir(target_dir))
+        for name in dirs:
+            present.discard(name)
+            target = target_dir / name
+            if target.is_symlink() or (target.exists() and not target.is_dir()):
+                target.unlink()
+            target.mkdir(exist_ok=True)
+        for name in names:
+            present.discard(name)
+            source, target = Path(root) / name, target_dir / name
+            try:
+                st = source.lstat()
+            except FileNotFoundError:
+                continue  # removed by the running server meanwhile
+            try:
+                current = target.lstat()
+            except FileNotFoundError:
+                current = None
+            if current is not None and stat.S_ISDIR(current.st_mode):
+                shutil.rmtree(target)
+                current = None
+            if stat.S_ISLNK(st.st_mode):
+                link = os.readlink(source)
+                if current is None or not stat.S_ISLNK(current.st_mode) or os.readlink(target) != link:
+                    if current is not None:
+                        target.unlink()
+                    os.symlink(link, target)
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            if (current is not None and stat.S_ISREG(current.st_mode) and current.st_size == st.st_size
+                    and current.st_mtime_ns == st.st_mtime_ns):
+                continue
+            try:
+                copier.copy(source, target, st)
+            except FileNotFoundError:
+                continue
+            copied += 1
+            copied_bytes += st.st_size
+        for name in present:
+            stale = target_dir / name
+            if stale.is_dir() and not stale.is_symlink():
+                shutil.rmtree(stale)
+            else:
+                stale.unlink()
+            removed += 1
+    return {"copied": copied, "bytes": copied_bytes, "removed": removed}
+
+
+def send_console_command(*commands: str) -> bool:
+    """Send console commands in order through the console broker. Returns False if one was not sent."""
+    commands = [command for command in commands if command]
+    sent = True
+    if commands:
+        for ack in send_commands(*commands):
+            if not ack["ok"]:
+                print(f"[snapshot] console command not sent: {ack['error']}")
+                sent = False
+    return sent
+
+
+def wait_for_log(pattern: re.Pattern, cursor: str, timeout: float = SAVE_TIMEOUT, job=None) -> str | None:
+    """
+    Poll server.log after cursor until a line matches. Chat lines, player
+    commands and the console broker's tag lines are skipped: a player typing
+    "save complete" must not end the wait. Returns the line or None on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if job is not None:
+            job.check_cancelled()
+        try:
+            chunk = read_since(LOG_FILE, cursor, initial_lines=0)
+        except FileNotFoundError:
+            chunk = {"lines": [], "cursor": cursor}
+        cursor = chunk["cursor"]
+        for line in chunk["lines"]:
+            if line.startswith("[console_broker]") or not pattern.search(line):
+                continue
+            if classify(line)["type"] not in ("chat", "command"):
+                return line
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+def log_cursor() -> str:
+    """Cursor at the current end of server.log ("" if there is no log yet)."""
+    try:
+        return read_since(LOG_FILE, "", initial_lines=0)["cursor"]
+    except FileNotFoundError:
+        return ""
+
+
+def take_snapshot(source: Path, server_running: bool, job=None) -> dict:
+    """
+    Refresh the staging copy of `source` (a consistent point-in-time copy if
+    the server is running) and return timing stats. The copy is in
+    SNAPSHOT_DIR / source.name.
+
+    pause_ms is the time from the save-complete line to the resume command
+    (the final copy); saves_held_ms also counts the flush, from the pause
+    command on (None without a pause command).
+
+    Returns:
+        dict: path, consistent, method, pre_sync_ms, flush_wait_ms, pause_ms,
+        saves_held_ms, copied_files, copied_bytes, server_running, taken
+    """
+    source = Path(source)
+    target = SNAPSHOT_DIR / source.name
+    copier = _Copier()
+
+    if job is not None:
+        job.update(message="Snapshot: Vorabkopie / pre-sync")
+    start = time.monotonic()
+    sync_tree(source, target, copier, job)
+    pre_sync_ms = (time.monotonic() - start) * 1000
+
+    consistent = True
+    flush_wait_ms = 0.0
+    paused = False
+    try:
+        if server_running:
+            if job is not None:
+                job.update(message="Snapshot: Speichern wird angehalten / pausing saves")
+            cursor = log_cursor()
+            pause_start = time.monotonic()
+            # Set before sending: if sending fails after the pause got through, saves must still resume
+            paused = bool(SAVE_PAUSE_COMMAND)
+            sent = send_console_command(SAVE_PAUSE_COMMAND, SAVE_FLUSH_COMMAND)
+            line = wait_for_log(SAVE_DONE_RE, cursor, job=job) if sent else None
+            flush_wait_ms = (time.monotonic() - pause_start) * 1000
+            if not paused:
+                consistent = False
+                print("[snapshot] no HYTALE_SAVE_PAUSE_COMMAND, saves were not paused during the final sync")
+            if not sent:
+                consistent = False
+                print("[snapshot] save commands not sent, snapshot may contain partial saves")
+            elif line is None:
+                consistent = False
+                print(f"[snapshot] no save-complete line within {SAVE_TIMEOUT:.0f} s, snapshot may contain partial saves")
+        copy_start = time.monotonic()
+        final = sync_tree(source, target, copier, job)
+    finally:
+        if paused and SAVE_RESUME_COMMAND:
+            send_console_command(SAVE_RESUME_COMMAND)
+    copy_end = time.monotonic()
+
+    stats = {
+        "path": str(target),
+        "consistent": consistent,
+        "method": copier.method,
+        "pre_sync_ms": round(pre_sync_ms, 1),
+        "flush_wait_ms": round(flush_wait_ms, 1),
+        "pause_ms": round((copy_end - copy_start) * 1000, 1),
+        "saves_held_ms": round((copy_end - pause_start) * 1000, 1) if paused else None,
+        "copied_files": final["copied"],
+        "copied_bytes": final["bytes"],
+        "server_running": server_running,
+        "taken": time.time(),
+    }
+    print(f"[snapshot] {stats['method']} snapshot, pause {stats['pause_ms']:.0f} ms "
+          f"({final['copied']} files), flush wait {stats['flush_wait_ms']:.0f} ms")
+    try:
+        (SNAPSHOT_DIR / STATS_FILE_NAME).write_text(json.dumps(stats))
+    except OSError:
+        pass
+    return stats
+
+
+def last_snapshot_stats() -> dict | None:
+    """Stats of the most recent snapshot, or None."""
+    try:
+        return json.loads((SNAPSHOT_DIR / STATS_FILE_NAME).read_text())
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Staged server updates: prepare a version next to the live install, switch at restart.
+
+The install files from game.zip live in HYTALE_DIR next to data that must not
+be touched (Server/universe, configs, logs). So a version cannot be one
+directory behind a symlink. Instead, each version is a complete file set
+under versions/<version>/, hard-linked wherever files are unchanged:
+
+- stage_version() hard-links the current version into versions/.<ver>.partial,
+  applies game.zip as a delta (update_apply.py: changed files are written
+  through temp files and renames, so shared inodes are never modified),
+  verifies size and CRC-32 of every file and renames the result to
+  versions/<ver>. The server keeps running all the time.
+- activate() runs with the server stopped. It swaps the version's files
+  into HYTALE_DIR with one link + rename per file (no data is copied, so this
+  takes milliseconds) and removes files the version no longer has.
+- versions/current, versions/previous and versions/pending are symlinks to
+  the version directories. A rollback is activate(previous).
+
+Each switch is appended to versions/history.jsonl with stop, swap, start and
+total downtime. Versions other than current, previous and pending are
+removed after each stage and switch.
+
+Usage:
+    python3 staged_update.py list
+    python3 staged_update.py stage ARCHIVE VERSION
+    python3 staged_update.py activate VERSION   (restarts the server if it is running)
+    python3 staged_update.py rollback           (restarts the server if it is running)
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from backup_writer import available_cpus
+from supervisor_rpc import RPC_ERRORS, SupervisorClient
+from update_apply import MANIFEST_NAME, UpdateError, apply_update, file_crc32, load_manifest, write_manifest
+
+SERVICE_NAME = "hytale-server"  # supervisord program name
+VERSIONS_DIR_NAME = "versions"
+HISTORY_NAME = "history.jsonl"
+POINTERS = ("current", "previous", "pending")
+REQUIRED_FILES = ("Server/HytaleServer.jar", "Assets.zip")
+VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._+-]{0,127}$")
+
+
+def versions_dir(server_dir: Path) -> Path:
+    return Path(server_dir) / VERSIONS_DIR_NAME
+
+
+def check_version_name(version: str) -> str:
+    if not VERSION_RE.match(version or "") or version in POINTERS:
+        raise UpdateError(f"Invalid version name: {version!r}")
+    return version
+
+
+def get_pointer(server_dir: Path, name: str) -> str | None:
+    """Version that versions/<name> (current, previous, pending) points to, if it still exists."""
+    link = versions_dir(server_dir) / name
+    try:
+        version = os.readlink(link)
+    except OSError:
+        return None
+    return version if (link.parent / version).is_dir() else None
+
+
+def _set_pointer(server_dir: Path, name: str, version: str | None) -> None:
+    link = versions_dir(server_dir) / name
+    if version is None:
+        link.unlink(missing_ok=True)
+        return
+    tmp = link.with_name(f".{name}.tmp")
+    tmp.unlink(missing_ok=True)
+    os.symlink(version, tmp)
+    os.replace(tmp, link)
+
+
+def _link(src: Path, dst: Path) -> None:
+    """Hard-link src to dst (replacing it); copies if the filesystem has no hard links."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.swap-tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp, follow_symlinks=False)
+    except OSError:
+        shutil.copy2(src, tmp, follow_symlinks=False)
+    os.replace(tmp, dst)
+
+
+def _link_tree(src: Path, dst: Path, files) -> None:
+    for rel in files:
+        _link(src / rel, dst / rel)
+
+
+def list_versions(server_dir: Path) -> dict:
+    root = versions_dir(server_dir)
+    versions = []
+    if root.is_dir():
+        for path in sorted(root.iterdir()):
+            if path.is_dir() and not path.is_symlink() and not path.name.startswith("."):
+                manifest = load_manifest(path)
+                versions.append({
+                    "version": path.name,
+                    "files": len(manifest),
+                    "bytes": sum(e["size"] for e in manifest.values()),
+                    "staged": path.stat().st_mtime,
+                })
+    return {"versions": versions, **{name: get_pointer(server_dir, name) for name in POINTERS}}
+
+
+def history(server_dir: Path, limit: int = 20) -> list[dict]:
+    """Recorded switches, newest first."""
+    try:
+        lines = (versions_dir(server_dir) / HISTORY_NAME).read_text().splitlines()
+    except OSError:
+        return []
+    entries = []
+    for line in reversed(lines):
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+        if len(entries) >= limit:
+            break
+    return entries
+
+
+def _record(server_dir: Path, entry: dict) -> None:
+    with open(versions_dir(server_dir) / HISTORY_NAME, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def prune_versions(server_dir: Path) -> list[str]:
+    """Remove versions that are not current, previous or pending. Returns their names."""
+    root = versions_dir(server_dir)
+    keep = {get_pointer(server_dir, name) for name in POINTERS}
+    removed = []
+    for path in root.iterdir() if root.is_dir() else ():
+        # .<version>.partial directories belong to a staging run and clean up after themselves
+        if path.is_dir() and not path.is_symlink() and not path.name.startswith(".") and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path.name)
+    return removed
+
+
+def _adopt_install(server_dir: Path, archive: Path) -> str:
+    """
+    Record the live install as versions/<last_version.txt> so it can be rolled
+    back to. Without an install manifest, the files at the paths of `archive`
+    are taken as the install and hashed.
+    """
+    server_dir = Path(server_dir)
+    try:
+        version = (server_dir / "last_version.txt").read_text().strip()
+        check_version_name(version)
+    except (OSError, UpdateError):
+        version = "installed"
+    target = versions_dir(server_dir) / version
+    work = target.with_name(f".{version}.partial")
+    shutil.rmtree(work, ignore_errors=True)
+    files = load_manifest(server_dir)
+    if not files:
+        import zipfile
+        with zipfile.ZipFile(archive) as zf:
+            names = [i.filename for i in zf.infolist()
+                     if not i.is_dir() and not i.filename.startswith("/") and ".." not in i.filename.split("/")]
+
+        def entry(rel):
+            st = (server_dir / rel).stat()
+            return rel, {"size": st.st_size, "crc": file_crc32(server_dir / rel), "mtime_ns": st.st_mtime_ns}
+
+        present = [rel for rel in names if (server_dir / rel).is_file()]
+        with ThreadPoolExecutor(max_workers=available_cpus()) as pool:
+            files = dict(pool.map(entry, present))
+        write_manifest(server_dir, files, "installed")
+    _link_tree(server_dir, work, files)
+    write_manifest(work, files, "installed")
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(work, target)
+    _set_pointer(server_dir, "current", version)
+    print(f"[staged_update] adopted live install as version {version} ({len(files)} files)")
+    return version
+
+
+def verify_version(path: Path, threads: int | None = None) -> dict:
+    """Check every file of a version directory against its manifest (size and CRC-32)."""
+    files = load_manifest(path)
+    missing = [rel for rel in REQUIRED_FILES if rel not in files]
+    if missing:
+        raise UpdateError(f"{path.name}: required files missing: {', '.join(missing)}")
+
+    def check(item):
+        rel, entry = item
+        if entry.get("mtime_ns") is None:  # symlink
+            return rel if not (path / rel).is_symlink() else None
+        try:
+            if (path / rel).stat().st_size != entry["size"] or file_crc32(path / rel) != entry["crc"]:
+                return rel
+        except OSError:
+            return rel
+        return None
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, threads or available_cpus())) as pool:
+        bad = [rel for rel in pool.map(check, files.items()) if rel]
+    if bad:
+        raise UpdateError(f"{path.name}: {len(bad)} files do not match the manifest, e.g. {bad[0]}")
+    return {"files": len(files), "bytes": sum(e["size"] for e in files.values()),
+            "verify_seconds": round(time.monotonic() - start, 2)}
+
+
+def stage_version(archive: Path, server_dir: Path, version: str, job=None) -> dict:
+    """
+    Prepare versions/<version> from `archive` while the server runs and mark
+    it pending. Only files that differ from the current version are written.
+    """
+    check_version_name(version)
+    server_dir = Path(server_dir)
+    root = versions_dir(server_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    current = get_pointer(server_dir, "current")
+    # An in-place update since the last switch makes the live install the base
+    if current is None or load_manifest(server_dir) != load_manifest(root / current):
+        current = _adopt_install(server_dir, archive)
+    if version == current:
+        return {"version": version, "staged": False, "written": 0, "written_bytes": 0}
+
+    target = root / version
+    work = root / f".{version}.partial"
+    shutil.rmtree(work, ignore_errors=True)
+    try:
+        if job:
+            job.update(message=f"Version {version} wird vorbereitet / Staging version {version}")
+        base = root / current
+        files = load_manifest(base)
+        _link_tree(base, work, files)
+        shutil.copy2(base / MANIFEST_NAME, work / MANIFEST_NAME)
+        progress = (lambda done, total: job.update(percent=100.0 * done / total)) if job else None
+        stats = apply_update(archive, work, progress=progress)
+        if job:
+            job.check_cancelled()
+            job.update(message=f"Version {version} wird geprüft / Verifying version {version}")
+        stats.update(verify_version(work))
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(work, target)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    _set_pointer(server_dir, "pending", version)
+    prune_versions(server_dir)
+    print(f"[staged_update] staged {version}: {stats['written']} of {stats['members']} files written, "
+          f"{stats['files']} verified")
+    return {"version": version, "staged": True, "base": current, **stats}
+
+
+def activate(server_dir: Path, version: str) -> dict:
+    """
+    Swap versions/<version> into the live install. Run with the server
+    stopped. On failure the current version is linked back in.
+    """
+    server_dir = Path(server_dir)
+    source = versions_dir(server_dir) / check_version_name(version)
+    files = load_manifest(source)
+    if not files or not source.is_dir():
+        raise UpdateError(f"Version {version} is not staged")
+    current = get_pointer(server_dir, "current")
+    live = load_manifest(server_dir)
+    start = time.monotonic()
+    try:
+        _link_tree(source, server_dir, files)
+        for rel in set(live) - set(files):
+            (server_dir / rel).unlink(missing_ok=True)
+        _link(source / MANIFEST_NAME, server_dir / MANIFEST_NAME)
+    except BaseException:
+        if current and current != version:
+            base = versions_dir(server_dir) / current
+            _link_tree(base, server_dir, load_manifest(base))
+            _link(base / MANIFEST_NAME, server_dir / MANIFEST_NAME)
+        raise
+    swap_ms = (time.monotonic() - start) * 1000
+    (server_dir / "last_version.txt").write_text(version)
+    if current != version:
+        _set_pointer(server_dir, "previous", current)
+        _set_pointer(server_dir, "current", version)
+    if get_pointer(server_dir, "pending") == version:
+        _set_pointer(server_dir, "pending", None)
+    return {"version": version, "from": current, "files": len(files), "swap_ms": round(swap_ms, 1)}
+
+
+def switch_version(server_dir: Path, version: str, stop=None, start=None, action: str = "update") -> dict:
+    """
+    stop() the server, activate(version), start() it again, and record the
+    downtime in versions/history.jsonl. stop/start are callables (None: the
+    server is not running / should stay stopped).
+    """
+    t0 = time.monotonic()
+    if stop:
+        stop()
+    t1 = time.monotonic()
+    try:
+        stats = activate(server_dir, version)
+    finally:
+        t2 = time.monotonic()
+        if start:
+            start()
+    t3 = time.monotonic()
+    if action == "rollback":
+        _set_pointer(server_dir, "pending", None)
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "action": action,
+        **stats,
+        "stop_ms": round((t1 - t0) * 1000, 1),
+        "start_ms": round((t3 - t2) * 1000, 1),
+        "downtime_ms": round((t3 - t0) * 1000, 1) if stop else 0.0,
+    }
+    _record(server_dir, entry)
+    prune_versions(server_dir)
+    print(f"[staged_update] {action}: {entry['from']} -> {version}, downtime {entry['downtime_ms']:.0f} ms "
+          f"(swap {entry['swap_ms']:.0f} ms)")
+    return entry
+
+
+def main(argv: list[str]) -> int:
+    server_dir = Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server"))
+
+    supervisor = SupervisorClient()
+
+    def server(action):
+        def run():
+            try:
+                getattr(supervisor, f"{action}_process")(SERVICE_NAME)
+            except RPC_ERRORS as e:
+                raise UpdateError(f"supervisor {action} failed: {e}") from e
+        return run
+
+    def running() -> bool:
+        try:
+            return supervisor.get_process_info(SERVICE_NAME).get("statename") in ("STARTING", "RUNNING")
+        except RPC_ERRORS as e:
+            raise UpdateError(f"supervisor status failed: {e}") from e
+
+    try:
+        if argv[:1] == ["list"]:
+            print(json.dumps({**list_versions(server_dir), "history": history(server_dir, 5)}, indent=2))
+        elif argv[:1] == ["stage"] and len(argv) == 3:
+            print(json.dumps(stage_version(Path(argv[1]), server_dir, argv[2]), indent=2))
+        elif argv[:1] in (["activate"], ["rollback"]):
+            version = argv[1] if argv[0] == "activate" and len(argv) == 2 else get_pointer(server_dir, "previous")
+            if not version:
+                print("[staged_update] ERROR: no version to switch to")
+                return 1
+            was_running = running()
+            switch_version(server_dir, version, server("stop") if was_running else None,
+                           server("start") if was_running else None, argv[0])
+        else:
+            print(__doc__)
+            return 2
+    except (UpdateError, OSError) as e:
+        print(f"[staged_update] ERROR: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
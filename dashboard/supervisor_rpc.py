@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Supervisor XML-RPC client and service status listener.
+
+The dashboard talks to supervisord over its UNIX socket instead of forking
+`supervisorctl`. Connections are kept alive and pooled.
+
+Service status comes from a small state file that the `hytale-status`
+eventlistener rewrites on every PROCESS_STATE event, so a status request costs
+one stat() while nothing changes. Without the listener, status falls back to
+getProcessInfo() over XML-RPC, cached for STATUS_TTL seconds.
+
+Usage (as supervisord eventlistener):
+    python3 supervisor_rpc.py listen
+"""
+
+import http.client
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import xmlrpc.client
+from pathlib import Path
+
+SUPERVISOR_SOCKET = os.environ.get("SUPERVISOR_SOCKET", "/var/run/supervisor.sock")
+SUPERVISOR_PIDFILE = Path("/var/run/supervisord.pid")
+STATE_FILE = Path(os.environ.get("HYTALE_SERVICE_STATE", "/tmp/hytale-service-state.json"))
+POOL_SIZE = 4
+CALL_TIMEOUT = 10
+ACTION_TIMEOUT = 120  # stopwaitsecs (60) + startsecs (10) with headroom
+STATUS_TTL = 2.0
+
+# supervisor.xmlrpc.Faults
+FAULT_BAD_NAME = 10
+FAULT_SPAWN_ERROR = 50
+FAULT_ALREADY_STARTED = 60
+FAULT_NOT_RUNNING = 70
+
+# Errors a caller should expect from an RPC call (socket missing, supervisord
+# down, HTTP error, or a supervisor fault).
+RPC_ERRORS = (OSError, http.client.HTTPException, xmlrpc.client.Error)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class _UnixTransport(xmlrpc.client.Transport):
+    """Keep-alive XML-RPC transport over a UNIX socket."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__()
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+        self._connection = host, _UnixHTTPConnection(self.socket_path, self.timeout)
+        return self._connection[1]
+
+
+class SupervisorClient:
+    """Thread-safe supervisord XML-RPC client with a small connection pool."""
+
+    def __init__(self, socket_path: str = SUPERVISOR_SOCKET, pool_size: int = POOL_SIZE,
+                 timeout: float = CALL_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _proxy(self, timeout: float) -> xmlrpc.client.ServerProxy:
+        return xmlrpc.client.ServerProxy("http://localhost", transport=_UnixTransport(self.socket_path, timeout))
+
+    def call(self, method: str, *args, timeout: float | None = None):
+        """
+        Call a supervisord XML-RPC method, e.g. call("supervisor.getProcessInfo", name).
+        A custom timeout uses a dedicated connection instead of the pool.
+
+        Raises:
+            One of RPC_ERRORS
+        """
+        if timeout is not None:
+            proxy = self._proxy(timeout)
+            try:
+                return getattr(proxy, method)(*args)
+            finally:
+                proxy("close")()
+
+        try:
+            proxy = self._pool.get_nowait()
+        except queue.Empty:
+            proxy = self._proxy(self.timeout)
+        try:
+            result = getattr(proxy, method)(*args)
+        except xmlrpc.client.Fault:
+            # Application-level error; the connection itself is fine.
+            self._release(proxy)
+            raise
+        except BaseException:
+            proxy("close")()
+            raise
+        self._release(proxy)
+        return result
+
+    def _release(self, proxy) -> None:
+        try:
+            self._pool.put_nowait(proxy)
+        except queue.Full:
+            proxy("close")()
+
+    def get_process_info(self, name: str) -> dict:
+        return self.call("supervisor.getProcessInfo", name)
+
+    def get_all_process_info(self) -> list[dict]:
+        return self.call("supervisor.getAllProcessInfo")
+
+    def start_process(self, name: str) -> bool:
+        """Start a process and wait until it reached RUNNING (startsecs)."""
+        return self.call("supervisor.startProcess", name, True, timeout=ACTION_TIMEOUT)
+
+    def stop_process(self, name: str) -> bool:
+        """Stop a process and wait until it has exited (stopwaitsecs)."""
+        return self.call("supervisor.stopProcess", name, True, timeout=ACTION_TIMEOUT)
+
+
+class StatusCache:
+    """Process info from the listener's state file, with an RPC fallback."""
+
+    def __init__(self, client: SupervisorClient, state_file: Path = STATE_FILE, ttl: float = STATUS_TTL):
+        self.client = client
+        self.state_file = Path(state_file)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._processes = None
+        self._rpc_cache = {}
+        self._bypass_until = 0.0
+
+    def _load_state(self) -> dict | None:
+        """Return processes from the state file, or None if missing or stale."""
+        try:
+            st = os.stat(self.state_file)
+        except OSError:
+            return None
+        if st.st_mtime_ns == self._mtime:
+            return self._processes
+        try:
+            # A file written before supervisord (re)started belongs to an old run.
+            if st.st_mtime < SUPERVISOR_PIDFILE.stat().st_mtime:
+                return None
+        except OSError:
+            pass
+        try:
+            with open(self.state_file, "r") as f:
+                processes = json.load(f)["processes"]
+        except (json.JSONDecodeError, KeyError, TypeError, PermissionError, OSError):
+            return None
+        self._mtime, self._processes = st.st_mtime_ns, processes
+        return processes
+
+    def get(self, name: str) -> dict:
+        """
+        Return supervisor process info for name.
+
+        Raises:
+            One of RPC_ERRORS if the state file cannot answer and the RPC fails
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._bypass_until:
+                processes = self._load_state()
+                if processes is not None and name in processes:
+                    return dict(processes[name])
+            cached = self._rpc_cache.get(name)
+            if cached and now - cached[0] < self.ttl:
+                return dict(cached[1])
+        info = self.client.get_process_info(name)
+        with self._lock:
+            self._rpc_cache[name] = (now, info)
+        return dict(info)
+
+    def invalidate(self, seconds: float = 1.0) -> None:
+        """
+        Drop cached status after an action. The listener may need a moment to
+        rewrite the state file, so RPC is preferred for a short while.
+        """
+        with self._lock:
+            self._rpc_cache.clear()
+            self._bypass_until = time.monotonic() + seconds
+
+
+# ---------------------------------------------------------------------------
+# Eventlistener
+# ---------------------------------------------------------------------------
+
+def write_state(infos: list[dict], state_file: Path = STATE_FILE) -> None:
+    """Atomically write process infos (keyed by name) to the state file."""
+    data = {"written": time.time(), "processes": {info["name"]: info for info in infos}}
+    tmp = state_file.with_name(state_file.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, state_file)
+
+
+def listen() -> None:
+    """
+    Run the supervisord eventlistener protocol on stdin/stdout. Every
+    PROCESS_STATE event triggers a fresh getAllProcessInfo() snapshot.
+    """
+    client = SupervisorClient(pool_size=1)
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+
+    def snapshot():
+        try:
+            write_state(client.get_all_process_info())
+        except RPC_ERRORS as e:
+            print(f"[supervisor_rpc] Status snapshot failed: {e}", file=sys.stderr)
+
+    snapshot()
+    while True:
+        stdout.write(b"READY\n")
+        stdout.flush()
+        header_line = stdin.readline()
+        if not header_line:
+            break
+        headers = dict(token.split(b":", 1) for token in header_line.split())
+        stdin.read(int(headers.get(b"len", b"0")))
+        if headers.get(b"eventname", b"").startswith(b"PROCESS_STATE"):
+            snapshot()
+        stdout.write(b"RESULT 2\nOK")
+        stdout.flush()
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "listen":
+        listen()
+        return
+    print(f"Usage: {sys.argv[0]} listen", file=sys.stderr)
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,16 @@ These routes provide Tailscale integration for the dashboard.
 """
 
 import os
+import asyncio
 import json
-import subprocess
 from pathlib import Path
 from typing import Tuple
 from fastapi import APIRouter, Request, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
+from async_exec import run_command
+
 router = APIRouter()
 security = HTTPBasic()
 
@@ -20,18 +22,12 @@ TAILSCALE_ENABLED = os.environ.get("TAILSCALE_ENABLED", "false").lower() == "tru
 HYTALE_PORT = os.environ.get("HYTALE_PORT", "5520")
 
 
-def run_tailscale_cmd(args: list, timeout: int = 10) -> Tuple[str, int]:
-    """Run a Tailscale command and return (stdout, returncode)."""
+async def run_tailscale_cmd(args: list, timeout: int = 10) -> Tuple[str, int]:
+    """Run a Tailscale command (without blocking the event loop) and return (stdout, returncode)."""
     try:
-        result = subprocess.run(
-            ["tailscale"] + args,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            shell=False
-        )
-        return result.stdout.strip(), result.returncode
-    except subprocess.TimeoutExpired:
+        stdout, _, returncode = await run_command(["tailscale"] + args, timeout=timeout)
+        return stdout.strip(), returncode
+    except asyncio.TimeoutError:
         return "Command timed out", 1
     except FileNotFoundError:
         return "Tailscale not found", 127
@@ -67,7 +63,7 @@ async def tailscale_status(username: str = Depends(verify_credentials)):
         })
     
     # Get JSON status
-    output, returncode = run_tailscale_cmd(["status", "--json"])
+    output, returncode = await run_tailscale_cmd(["status", "--json"])
     
     if returncode == 0:
         try:
@@ -113,7 +109,7 @@ async def tailscale_ip(username: str = Depends(verify_credentials)):
             "hytale_port": HYTALE_PORT
         })
     
-    output, returncode = run_tailscale_cmd(["ip", "-4"])
+    output, returncode = await run_tailscale_cmd(["ip", "-4"])
     
     if returncode == 0 and output:
         return JSONResponse({
@@ -124,7 +120,7 @@ async def tailscale_ip(username: str = Depends(verify_credentials)):
         })
     
     # Try IPv6 as fallback
-    output_v6, returncode_v6 = run_tailscale_cmd(["ip", "-6"])
+    output_v6, returncode_v6 = await run_tailscale_cmd(["ip", "-6"])
     
     if returncode_v6 == 0 and output_v6:
         return JSONResponse({
@@ -175,25 +171,19 @@ async def tailscale_up(request: Request, username: str = Depends(verify_credenti
             cmd_args.extend(["--advertise-routes", routes])
     
     try:
-        result = subprocess.run(
-            cmd_args,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            shell=False
-        )
+        stdout, stderr, returncode = await run_command(cmd_args, timeout=30)
         
-        if result.returncode == 0:
+        if returncode == 0:
             return JSONResponse({
                 "success": True,
                 "message": "Tailscale connection started",
-                "output": result.stdout
+                "output": stdout
             })
         else:
             return JSONResponse({
                 "success": False,
                 "message": "Failed to start Tailscale",
-                "error": result.stdout + "\n" + result.stderr
+                "error": stdout + "\n" + stderr
             }, status_code=500)
     except Exception as e:
         return JSONResponse({
@@ -212,7 +202,7 @@ async def tailscale_down(username: str = Depends(verify_credentials)):
             "message": "Tailscale is not enabled"
         }, status_code=400)
     
-    output, returncode = run_tailscale_cmd(["down"])
+    output, returncode = await run_tailscale_cmd(["down"])
     
     if returncode == 0:
         return JSONResponse({
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Apply a downloaded game.zip to the server directory, writing only what changed.
+
+`unzip -o game.zip` rewrites every file on each update, including the
+multi-GB Assets.zip and the server jar. Instead, an install manifest
+(.install_manifest.json in the target directory) records size, CRC-32 and
+mtime of every file installed from the archive:
+
+- A member whose size and CRC-32 (from the zip's central directory, no
+  decompression needed) match the manifest, and whose installed file still
+  has the recorded size and mtime, is skipped.
+- Without a manifest entry (first run, or a file changed on disk), the
+  installed file's CRC-32 is computed and compared instead; files are hashed
+  in parallel.
+- Everything else is extracted to a temp file next to its destination and
+  renamed into place, so a file is either old or new, never half-written.
+  Members are extracted in parallel (zlib releases the GIL).
+- Files the previous manifest installed that are gone from the archive are
+  removed. Other files (universe, config, logs) are never touched.
+
+Update time and disk writes therefore scale with the size of the change. A
+changed file is still rewritten as a whole.
+
+Usage:
+    python3 update_apply.py ARCHIVE TARGET_DIR [--threads N] [--verify]
+"""
+
+import argparse
+import json
+import os
+import stat
+import sys
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from backup_writer import available_cpus
+
+MANIFEST_NAME = ".install_manifest.json"
+MANIFEST_VERSION = 1
+READ_SIZE = 1024 * 1024
+
+
+class UpdateError(Exception):
+    """Unsafe or damaged archive."""
+
+
+def _member_path(name: str) -> str:
+    """Validated relative path of a zip member."""
+    parts = name.replace("\\", "/").split("/")
+    if name.startswith("/") or ".." in parts or (parts and ":" in parts[0]):
+        raise UpdateError(f"Unsafe path in archive: {name}")
+    return "/".join(p for p in parts if p and p != ".")
+
+
+def _member_mode(info: zipfile.ZipInfo) -> int:
+    mode = info.external_attr >> 16
+    return mode if mode else 0o644
+
+
+def _member_mtime(info: zipfile.ZipInfo) -> float:
+    try:
+        return datetime(*info.date_time).timestamp()
+    except (ValueError, OverflowError):
+        return time.time()
+
+
+def file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while block := f.read(READ_SIZE):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+
+def load_manifest(target: Path) -> dict:
+    try:
+        manifest = json.loads((Path(target) / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+
+def write_manifest(target: Path, files: dict, source: str) -> None:
+    """Write the install manifest of `target`; source names the archive the files came from."""
+    path = Path(target) / MANIFEST_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "archive": source, "applied": time.time(),
+                               "files": files}, separators=(",", ":")))
+    os.replace(tmp, path)
+
+
+def _is_current(path: Path, info: zipfile.ZipInfo, entry: dict | None, verify: bool) -> dict | None:
+    """Manifest entry for an installed file that already matches the member, else None."""
+    try:
+        st = path.lstat()
+    except FileNotFoundError:
+        return None
+    if not stat.S_ISREG(st.st_mode) or st.st_size != info.file_size:
+        return None
+    if (not verify and entry and entry.get("crc") == info.CRC and entry.get("size") == info.file_size
+            and entry.get("mtime_ns") == st.st_mtime_ns):
+        return entry
+    if file_crc32(path) != info.CRC:
+        return None
+    return {"size": st.st_size, "crc": info.CRC, "mtime_ns": st.st_mtime_ns}
+
+
+def _extract(archive: zipfile.ZipFile, info: zipfile.ZipInfo, path: Path) -> dict:
+    """Extract one member through a temp file and rename. Returns its manifest entry."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.update-tmp")
+    mode = _member_mode(info)
+    try:
+        if stat.S_ISLNK(mode):
+            tmp.unlink(missing_ok=True)
+            os.symlink(archive.read(info).decode(), tmp)
+        else:
+            # ZipExtFile checks the CRC-32 at the end of the member
+            with archive.open(info) as src, open(tmp, "wb") as dst:
+                while block := src.read(READ_SIZE):
+                    dst.write(block)
+            os.chmod(tmp, stat.S_IMODE(mode) or 0o644)
+            mtime = _member_mtime(info)
+            os.utime(tmp, (mtime, mtime))
+        if path.is_dir() and not path.is_symlink():
+            raise UpdateError(f"{path} is a directory, archive has a file")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if stat.S_ISLNK(mode):
+        return {"size": info.file_size, "crc": info.CRC, "mtime_ns": None}
+    return {"size": info.file_size, "crc": info.CRC, "mtime_ns": path.stat().st_mtime_ns}
+
+
+def apply_update(archive: Path, target: Path, threads: int | None = None, verify: bool = False,
+                 progress=None) -> dict:
+    """
+    Bring `target` up to date with the zip `archive`.
+
+    verify: hash every installed file instead of trusting size + mtime.
+    progress: optional callback(done, total) called as members are processed.
+
+    Returns:
+        dict: members, written, written_bytes, unchanged, removed, seconds
+    """
+    archive, target = Path(archive), Path(target)
+    threads = max(1, threads or available_cpus())
+    start = time.monotonic()
+    previous = load_manifest(target)
+    files = {}
+    written = written_bytes = unchanged = 0
+
+    with zipfile.ZipFile(archive) as zf:
+        members = []
+        for info in zf.infolist():
+            rel = _member_path(info.filename)
+            if not rel:
+                continue
+            if info.is_dir():
+                (target / rel).mkdir(parents=True, exist_ok=True)
+            else:
+                members.append((rel, info))
+
+        def process(item):
+            rel, info = item
+            path = target / rel
+            entry = _is_current(path, info, previous.get(rel), verify)
+            if entry is not None:
+                return rel, entry, False
+            return rel, _extract(zf, info, path), True
+
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="update") as pool:
+            for done, (rel, entry, changed) in enumerate(pool.map(process, members), 1):
+                files[rel] = entry
+                if changed:
+                    written += 1
+                    written_bytes += entry["size"]
+                    print(f"[update_apply] updated {rel}")
+                else:
+                    unchanged += 1
+                if progress is not None:
+                    progress(done, len(members))
+
+    removed = 0
+    for rel in sorted(set(previous) - set(files)):
+        try:
+            (target / _member_path(rel)).unlink()
+            removed += 1
+            print(f"[update_apply] removed {rel}")
+        except (FileNotFoundError, IsADirectoryError, UpdateError):
+            pass
+    write_manifest(target, files, archive.name)
+    return {
+        "members": len(members),
+        "written": written,
+        "written_bytes": written_bytes,
+        "unchanged": unchanged,
+        "removed": removed,
+        "seconds": round(time.monotonic() - start, 2),
+    }
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Apply game.zip, writing only changed files.")
+    parser.add_argument("archive", type=Path)
+    parser.add_argument("target", type=Path)
+    parser.add_argument("--threads", type=int, default=None, help="Worker threads (default: all CPUs)")
+    parser.add_argument("--verify", action="store_true", help="Hash installed files instead of trusting size/mtime")
+    args = parser.parse_args(argv)
+    try:
+        stats = apply_update(args.archive, args.target, args.threads, args.verify)
+    except (UpdateError, zipfile.BadZipFile, OSError) as e:
+        print(f"[update_apply] ERROR: {e}")
+        return 1
+    print(f"[update_apply] {stats['written']} of {stats['members']} files written "
+          f"({stats['written_bytes'] / 1024 ** 2:.1f} MB), {stats['unchanged']} unchanged, "
+          f"{stats['removed']} removed in {stats['seconds']:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,123 @@
+"""
+Latest-version cache for the update check.
+
+Asking hytale-downloader for the latest version takes seconds (network, up to
+a 30 s timeout). VersionCache keeps the last answer in memory and in
+$HYTALE_DIR/.latest_version and serves it stale-while-revalidate:
+
+- Younger than HYTALE_VERSION_TTL seconds: returned as is.
+- Older (or unknown): returned as is, and one refresh starts in a background
+  thread. Concurrent callers share that refresh instead of starting their own.
+
+So a page load never waits for the downloader. Callers that need a current
+answer (the update itself) use get_fresh(), which waits for the shared
+refresh. A failed check keeps the previous version and is retried after
+RETRY_INTERVAL seconds at the earliest.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+VERSION_TTL = float(os.environ.get("HYTALE_VERSION_TTL", "1800"))
+RETRY_INTERVAL = 60.0
+
+
+class VersionCache:
+    """
+    Cached result of an async fetch() -> (version | None, error | None),
+    persisted in cache_file (its mtime is the time of the check).
+    """
+
+    def __init__(self, fetch, cache_file: Path, ttl: float = VERSION_TTL):
+        self.fetch = fetch
+        self.cache_file = Path(cache_file)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = None  # wall time of the last successful check
+        self._attempted = 0.0  # monotonic time of the last attempt
+        self._error = None
+        self._inflight = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            version = self.cache_file.read_text().strip()
+            checked = self.cache_file.stat().st_mtime
+        except OSError:
+            return
+        if version:
+            self._version, self._checked = version, checked
+
+    def _snapshot(self) -> dict:
+        age = None if self._checked is None else max(0.0, time.time() - self._checked)
+        return {
+            "version": self._version,
+            "checked": self._checked,
+            "age": age,
+            "stale": age is None or age >= self.ttl,
+            "error": self._error,
+            "refreshing": self._inflight is not None,
+        }
+
+    def get(self) -> dict:
+        """
+        Cached version without waiting. Starts a background refresh if it is
+        stale (and no check ran or failed within RETRY_INTERVAL).
+
+        Returns:
+            dict: version (None if never checked), checked, age, stale, error, refreshing
+        """
+        with self._lock:
+            snapshot = self._snapshot()
+            if snapshot["stale"] and time.monotonic() - self._attempted >= RETRY_INTERVAL:
+                self._start_refresh()
+                snapshot["refreshing"] = True
+            return snapshot
+
+    async def get_fresh(self, max_age: float = 0.0) -> dict:
+        """Version checked at most max_age seconds ago, waiting for a (shared) refresh if needed."""
+        with self._lock:
+            snapshot = self._snapshot()
+            if snapshot["age"] is not None and snapshot["age"] <= max_age and not snapshot["error"]:
+                return snapshot
+            future = self._start_refresh()
+        await asyncio.wrap_future(future)
+        with self._lock:
+            return self._snapshot()
+
+    def refresh(self) -> Future:
+        """Start a refresh, or return the one in flight."""
+        with self._lock:
+            return self._start_refresh()
+
+    def _start_refresh(self) -> Future:
+        # Caller holds self._lock
+        if self._inflight is None:
+            self._inflight = Future()
+            self._attempted = time.monotonic()
+            threading.Thread(target=self._run, args=(self._inflight,), name="version-check", daemon=True).start()
+        return self._inflight
+
+    def _run(self, future: Future) -> None:
+        try:
+            version, error = asyncio.run(self.fetch())
+        except Exception as e:
+            version, error = None, str(e)
+        with self._lock:
+            if version:
+                self._version, self._checked, self._error = version, time.time(), None
+                try:
+                    tmp = self.cache_file.with_name(self.cache_file.name + ".tmp")
+                    tmp.write_text(version)
+                    os.replace(tmp, self.cache_file)
+                except OSError:
+                    pass
+            else:
+                self._error = error or "Version check returned no version"
+            self._inflight = None
+        future.set_result(version)
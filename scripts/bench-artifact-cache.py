@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: server downloads of several containers with a shared artifact cache.
+
+Uses a fake hytale-downloader (a stub that sleeps --delay seconds and writes a
+zip of --size to its -download-path, counting its runs). --containers
+processes fetch the same version at once, each into its own .downloader
+directory, like `hytale-download.sh` does:
+
+- without cache: every container runs the downloader and stores game.zip
+- with cache: `artifact_cache.py fetch` against one shared cache directory
+
+Then --versions further versions are fetched with a cache budget of three
+archives to show the LRU eviction.
+
+Usage:
+    python3 scripts/bench-artifact-cache.py [--containers 4] [--size 256M] [--delay 2] [--versions 4] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DASHBOARD = Path(__file__).resolve().parent.parent / "dashboard"
+
+STUB = """#!/usr/bin/env python3
+import os, random, sys, time, zipfile
+args = sys.argv[1:]
+if "-print-version" in args:
+    print(os.environ["STUB_VERSION"])
+    sys.exit(0)
+with open(os.environ["STUB_CALLS"], "a") as f:
+    f.write("x\\n")
+time.sleep(float(os.environ["STUB_DELAY"]))
+path = args[args.index("-download-path") + 1]
+rng = random.Random(os.environ["STUB_VERSION"])
+block = rng.randbytes(1024 * 1024)
+with zipfile.ZipFile(path, "w") as zf:
+    with zf.open("Assets.zip", "w", force_zip64=True) as f:
+        for _ in range(int(os.environ["STUB_SIZE"]) // len(block)):
+            f.write(block)
+    zf.writestr("Server/HytaleServer.jar", os.environ["STUB_VERSION"])
+"""
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def disk_usage(*paths: Path) -> int:
+    """Bytes used by the files under paths, hard links counted once."""
+    seen, total = set(), 0
+    for root in paths:
+        for path in root.rglob("*"):
+            st = path.lstat()
+            if path.is_file() and not path.is_symlink() and (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+
+def run_containers(work: Path, stub: Path, env: dict, containers: int, version: str, cache: Path | None) -> float:
+    procs = []
+    start = time.perf_counter()
+    for n in range(containers):
+        downloader_dir = work / f"container-{n}" / ".downloader"
+        downloader_dir.mkdir(parents=True, exist_ok=True)
+        if cache is None:
+            cmd = [str(stub), "-download-path", "game.zip"]
+        else:
+            cmd = [sys.executable, str(DASHBOARD / "artifact_cache.py"), "fetch", version, "game.zip", "--",
+                   str(stub), "-download-path", "{}"]
+        procs.append(subprocess.Popen(cmd, cwd=downloader_dir, stdout=subprocess.DEVNULL,
+                                      env={**env, "STUB_VERSION": version,
+                                           **({"HYTALE_ARTIFACT_CACHE": str(cache)} if cache else {})}))
+    for proc in procs:
+        if proc.wait() != 0:
+            raise SystemExit(f"fetch failed with exit code {proc.returncode}")
+    return time.perf_counter() - start
+
+
+def calls(path: Path) -> int:
+    try:
+        return len(path.read_text().splitlines())
+    except FileNotFoundError:
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--containers", type=int, default=4, help="Containers fetching at once (default: 4)")
+    parser.add_argument("--size", default="256M", help="Size of the fake game.zip (default: 256M)")
+    parser.add_argument("--delay", type=float, default=2.0, help="Seconds the fake download takes (default: 2)")
+    parser.add_argument("--versions", type=int, default=4, help="Further versions for the eviction run (default: 4)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-artifact-", dir=args.dir))
+    try:
+        stub = work / "hytale-downloader-linux-amd64"
+        stub.write_text(STUB)
+        stub.chmod(0o755)
+        size = parse_size(args.size)
+        env = {**os.environ, "STUB_CALLS": str(work / "calls"), "STUB_DELAY": str(args.delay),
+               "STUB_SIZE": str(size)}
+
+        elapsed = run_containers(work / "plain", stub, env, args.containers, "2026.01.01", None)
+        print(f"{'without cache':14s} {elapsed:6.2f} s  downloader runs {calls(work / 'calls')}  "
+              f"disk {disk_usage(work / 'plain') / 1024 ** 2:7.0f} MB")
+
+        cache = work / "cache"
+        (work / "calls").unlink()
+        elapsed = run_containers(work / "cached", stub, env, args.containers, "2026.01.01", cache)
+        print(f"{'with cache':14s} {elapsed:6.2f} s  downloader runs {calls(work / 'calls')}  "
+              f"disk {disk_usage(work / 'cached', cache) / 1024 ** 2:7.0f} MB")
+        elapsed = run_containers(work / "cached", stub, env, args.containers, "2026.01.01", cache)
+        print(f"{'again (hits)':14s} {elapsed:6.2f} s  downloader runs {calls(work / 'calls')}")
+
+        # LRU eviction: budget of three archives, no grace period
+        sys.path.insert(0, str(DASHBOARD))
+        import artifact_cache
+        artifact_cache.EVICT_GRACE = 0
+        archive_size = next((cache / "objects").iterdir()).stat().st_size
+        lru = artifact_cache.ArtifactCache(cache, max_bytes=3 * archive_size)
+        env["STUB_DELAY"] = "0"
+        for n in range(2, args.versions + 2):
+            version = f"2026.01.{n:02d}"
+            lru.fetch(version, lambda path: subprocess.run(
+                [str(stub), "-download-path", str(path)], env={**env, "STUB_VERSION": version}, check=True))
+            time.sleep(0.01)
+        kept = [", ".join(o["versions"]) for o in lru.entries()]
+        print(f"after {args.versions} more versions (budget 3 archives): cached {kept}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: parallel backup compression vs. the single-threaded tarfile path.
+
+Generates a synthetic universe (region files mixing compressible structure and
+random noise), then archives it with the old `tarfile.open(..., "w:gz")` path
+(one core, level 9) and with backup_writer.ParallelCompressedWriter at several
+thread counts (and zstd, if the zstandard module is installed). Reports wall
+time, input MB/s and compressed size. Every parallel gzip archive is read back
+once to check it is a valid tar.gz.
+
+Usage:
+    python3 scripts/bench-backup-compression.py [--size 1G] [--threads 1,2,4,8] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from backup_writer import ParallelCompressedWriter, available_cpus, zstandard  # noqa: E402
+
+REGION_SIZE = 8 * 1024 * 1024
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def generate_universe(root: Path, size: int) -> None:
+    rng = random.Random(42)
+    region_dir = root / "worlds" / "default" / "chunks"
+    region_dir.mkdir(parents=True)
+    # Roughly 2:1 compressible, like chunk data with palettes and noise
+    pattern = bytes(rng.randrange(16) for _ in range(4096)) * 16
+    written = 0
+    n = 0
+    while written < size:
+        with open(region_dir / f"{n}.{n}.region.bin", "wb") as f:
+            for _ in range(REGION_SIZE // (128 * 1024)):
+                f.write(pattern[:96 * 1024] + rng.randbytes(32 * 1024))
+        written += REGION_SIZE
+        n += 1
+    (root / "config.json").write_text('{"seed": 42}')
+
+
+def archive_legacy(universe: Path, target: Path) -> None:
+    with tarfile.open(target, "w:gz") as tar:
+        tar.add(universe, arcname="universe")
+
+
+def archive_parallel(universe: Path, target: Path, compression: str, threads: int) -> None:
+    with open(target, "wb") as raw, ParallelCompressedWriter(raw, compression, threads=threads) as writer, \
+            tarfile.open(fileobj=writer, mode="w|") as tar:
+        tar.add(universe, arcname="universe")
+
+
+def run(name: str, func, target: Path, input_bytes: int) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    out = target.stat().st_size
+    print(f"{name:22s} {elapsed:8.2f} s  {input_bytes / elapsed / 1024 ** 2:8.1f} MB/s  "
+          f"output {out / 1024 ** 2:8.1f} MB ({out * 100 / input_bytes:4.1f}%)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1G", help="Synthetic universe size (default: 1G)")
+    parser.add_argument("--threads", default="", help="Comma-separated thread counts (default: 1,2,4,... up to CPUs)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not run the single-threaded baseline")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    if args.threads:
+        thread_counts = [int(t) for t in args.threads.split(",")]
+    else:
+        thread_counts = [1]
+        while thread_counts[-1] * 2 <= cpus:
+            thread_counts.append(thread_counts[-1] * 2)
+
+    work = Path(tempfile.mkdtemp(prefix="bench-backup-", dir=args.dir))
+    universe = work / "universe"
+    try:
+        generate_universe(universe, parse_size(args.size))
+        input_bytes = sum(p.stat().st_size for p in universe.rglob("*") if p.is_file())
+        print(f"universe: {input_bytes / 1024 ** 2:.0f} MB, {cpus} CPUs available")
+
+        if not args.skip_legacy:
+            target = work / "legacy.tar.gz"
+            run("legacy tarfile w:gz", lambda: archive_legacy(universe, target), target, input_bytes)
+            target.unlink()
+
+        for threads in thread_counts:
+            target = work / f"parallel-{threads}.tar.gz"
+            run(f"gzip x{threads} threads", lambda: archive_parallel(universe, target, "gzip", threads),
+                target, input_bytes)
+            with tarfile.open(target, "r:gz") as tar:
+                assert sum(1 for _ in tar) > 0
+            target.unlink()
+
+        if zstandard is not None:
+            for threads in thread_counts:
+                target = work / f"parallel-{threads}.tar.zst"
+                run(f"zstd x{threads} threads", lambda: archive_parallel(universe, target, "zstd", threads),
+                    target, input_bytes)
+                target.unlink()
+        else:
+            print("zstd: skipped (zstandard module not installed)")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: getting the output of a console command, capture vs. send + sleep.
+
+A fake server runs under console_broker.py with its output appended to a
+server.log, like in the container. It answers `list N` after --delay ms with
+N lines, and logs an unrelated line every --noise ms. Each run sends
+`list --lines`:
+
+- sleep: send, wait --wait seconds, read server.log from a cursor taken
+  before sending (what a script has to do without capture)
+- capture: console_capture.run_command() with the log event pipeline, ending
+  after 0.3 s without a new line
+- until: the same, ending at the last response line (`until` text)
+
+For each: time until the result is there, whether all response lines were
+included, and how many unrelated lines came along.
+
+Usage:
+    python3 scripts/bench-console-capture.py [--runs 10] [--lines 20] [--delay 50] [--noise 1000] [--wait 2]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DASHBOARD = Path(__file__).resolve().parent.parent / "dashboard"
+sys.path.insert(0, str(DASHBOARD))
+
+FAKE_SERVER = """import sys, threading, time
+def log(text):
+    sys.stdout.write(time.strftime("[%Y/%m/%d %H:%M:%S   INFO] ") + text + "\\n")
+    sys.stdout.flush()
+def noise():
+    n = 0
+    while True:
+        time.sleep(float(sys.argv[2]))
+        n += 1
+        log(f"[World] autosave chunk {n}")
+threading.Thread(target=noise, daemon=True).start()
+for line in sys.stdin:
+    name, _, count = line.strip().partition(" ")
+    if name == "list":
+        time.sleep(float(sys.argv[1]))
+        log(f"There are {count} players online:")
+        for k in range(int(count)):
+            log(f"  player-{k}")
+"""
+
+
+def check(lines: list[str], expected: int) -> tuple[bool, int]:
+    """(all response lines present, number of unrelated lines)"""
+    response = [line for line in lines if "player-" in line or "players online" in line]
+    return len(response) == expected + 1, len(lines) - len(response)
+
+
+def report(name: str, runs: list[tuple[float, bool, int]]) -> None:
+    seconds = [r[0] * 1000 for r in runs]
+    print(f"{name:8s} p50 {statistics.median(seconds):7.0f} ms  max {max(seconds):7.0f} ms  "
+          f"complete {sum(r[1] for r in runs)}/{len(runs)}  unrelated lines {sum(r[2] for r in runs)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Commands per method (default: 10)")
+    parser.add_argument("--lines", type=int, default=20, help="Response lines per command (default: 20)")
+    parser.add_argument("--delay", type=float, default=50, help="Server response delay in ms (default: 50)")
+    parser.add_argument("--noise", type=float, default=1000, help="Unrelated log line every N ms (default: 1000)")
+    parser.add_argument("--wait", type=float, default=2.0, help="Sleep of the send + sleep method (default: 2)")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-capture-"))
+    os.environ["HYTALE_DIR"] = str(work)
+    from console_broker import send_commands
+    from console_capture import run_command
+    from log_events import EventPipeline
+    from log_tail import read_since
+
+    log_file = work / "logs" / "server.log"
+    log_file.parent.mkdir()
+    sock = work / ".console.sock"
+    fake = work / "fake_server.py"
+    fake.write_text(FAKE_SERVER)
+    with open(log_file, "ab") as log:
+        broker = subprocess.Popen([sys.executable, str(DASHBOARD / "console_broker.py"), "run", "--socket", str(sock),
+                                   "--", sys.executable, str(fake), str(args.delay / 1000), str(args.noise / 1000)],
+                                  stdout=log, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.monotonic() + 10
+        while not sock.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        command = f"list {args.lines}"
+
+        runs = []
+        for _ in range(args.runs):
+            cursor = read_since(log_file, "", initial_lines=0)["cursor"]
+            start = time.perf_counter()
+            send_commands(command, socket_path=sock)
+            time.sleep(args.wait)
+            lines = [line for line in read_since(log_file, cursor, initial_lines=0)["lines"]
+                     if not line.startswith("[console_broker]")]
+            runs.append((time.perf_counter() - start, *check(lines, args.lines)))
+        report("sleep", runs)
+
+        pipeline = EventPipeline(log_file, work / ".event_pipeline.json", work / "events.jsonl")
+        pipeline.start()
+
+        async def capture_runs(**kwargs):
+            result = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                out = await run_command(command, pipeline=pipeline, socket_path=sock, **kwargs)
+                result.append((time.perf_counter() - start, *check(out["output"], args.lines)))
+            return result, out
+
+        runs, last = asyncio.run(capture_runs())
+        report("capture", runs)
+        print(f"         last: reason {last['reason']}, seq {last['seq']}")
+        runs, last = asyncio.run(capture_runs(until=f"player-{args.lines - 1}"))
+        report("until", runs)
+        print(f"         last: reason {last['reason']}, seq {last['seq']}")
+    finally:
+        broker.terminate()
+        broker.wait()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
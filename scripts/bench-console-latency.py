@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark: console command latency, command file poll vs. console broker.
+
+A fake server reads commands from stdin and records when each arrived
+(CLOCK_MONOTONIC is shared by all processes). Each command carries its send
+time, so the latency is measured end to end:
+
+- command file: commands are appended to .server_command; a loop like the
+  one in server-wrapper.sh polls it every --poll seconds, forks twice per
+  command (`screen -list`, `screen -X stuff`) and then truncates the file
+- broker: console_broker.py owns the fake server's stdin, commands go over
+  its UNIX socket with an ack per command
+
+Then --burst commands are sent in quick succession (over two poll intervals
+for the command file, from four concurrent clients for the broker), to count
+how many are lost on each path.
+
+Usage:
+    python3 scripts/bench-console-latency.py [--commands 20] [--burst 2000] [--poll 1.0]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DASHBOARD = Path(__file__).resolve().parent.parent / "dashboard"
+sys.path.insert(0, str(DASHBOARD))
+
+from console_broker import send_commands  # noqa: E402
+
+FAKE_SERVER = """import sys, time
+out = open(sys.argv[1], "a", buffering=1)
+for line in sys.stdin:
+    out.write(f"{time.monotonic_ns()} {line}")
+"""
+
+
+def received(path: Path) -> list[tuple[int, str]]:
+    try:
+        lines = path.read_text().splitlines()
+    except FileNotFoundError:
+        return []
+    return [(int(ns), cmd) for ns, cmd in (line.split(" ", 1) for line in lines)]
+
+
+def latencies_ms(path: Path, prefix: str) -> list[float]:
+    result = []
+    for recv_ns, cmd in received(path):
+        if cmd.startswith(prefix):
+            result.append((recv_ns - int(cmd.rsplit(" ", 1)[1])) / 1e6)
+    return result
+
+
+def wait_for(path: Path, count: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while len(received(path)) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def report(name: str, values: list[float], sent: int) -> None:
+    values = sorted(values)
+    p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+    print(f"{name:26s} p50 {statistics.median(values):8.2f} ms  p99 {p99:8.2f} ms  "
+          f"max {values[-1]:8.2f} ms  ({len(values)}/{sent} arrived)")
+
+
+def poll_loop(command_file: Path, server: subprocess.Popen, interval: float, stop: threading.Event) -> None:
+    """server-wrapper.sh: read the file, send each line (two forks), truncate."""
+    while not stop.wait(interval):
+        if command_file.exists() and command_file.stat().st_size:
+            lines = command_file.read_text().splitlines()
+            for line in lines:
+                subprocess.run(["true"])  # screen -list | grep
+                subprocess.run(["true"])  # screen -X stuff
+                server.stdin.write(line.encode() + b"\n")
+                server.stdin.flush()
+            command_file.write_text("")  # > "$COMMAND_FILE"
+
+
+def bench_file(work: Path, fake: Path, commands: int, burst: int, poll: float) -> None:
+    out = work / "file-received"
+    command_file = work / ".server_command"
+    command_file.touch()
+    server = subprocess.Popen([sys.executable, str(fake), str(out)], stdin=subprocess.PIPE)
+    stop = threading.Event()
+    poller = threading.Thread(target=poll_loop, args=(command_file, server, poll, stop))
+    poller.start()
+    try:
+        for n in range(commands):
+            with open(command_file, "a") as f:
+                f.write(f"say {n} {time.monotonic_ns()}\n")
+            time.sleep(poll * 0.37)  # not aligned with the poll
+        wait_for(out, commands, poll * 3)
+        report("command file", latencies_ms(out, "say"), commands)
+
+        # Spread over two polls, so some arrive while the poller is sending
+        for n in range(burst):
+            with open(command_file, "a") as f:
+                f.write(f"burst {n} {time.monotonic_ns()}\n")
+            time.sleep(2 * poll / burst)
+        time.sleep(poll * 3)
+        print(f"{'command file, burst':26s} {len(latencies_ms(out, 'burst'))}/{burst} arrived")
+    finally:
+        stop.set()
+        poller.join()
+        server.stdin.close()
+        server.wait()
+
+
+def bench_broker(work: Path, fake: Path, commands: int, burst: int) -> None:
+    out = work / "broker-received"
+    sock = work / ".console.sock"
+    broker = subprocess.Popen([sys.executable, str(DASHBOARD / "console_broker.py"), "run", "--socket", str(sock),
+                               "--", sys.executable, str(fake), str(out)], stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 10
+        while not sock.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        send_commands(f"warmup 0 {time.monotonic_ns()}", socket_path=sock)  # the fake server has started
+        wait_for(out, 1, 5)
+        acks = []
+        for n in range(commands):
+            start = time.perf_counter()
+            send_commands(f"say {n} {time.monotonic_ns()}", socket_path=sock)
+            acks.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+        wait_for(out, 1 + commands, 5)
+        report("broker", latencies_ms(out, "say"), commands)
+        report("broker, send + ack", acks, commands)
+
+        threads = [threading.Thread(target=lambda k: [send_commands(f"burst {k}-{n} {time.monotonic_ns()}",
+                                                                    socket_path=sock)
+                                                      for n in range(burst // 4)], args=(k,)) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wait_for(out, 1 + commands + burst // 4 * 4, 10)
+        print(f"{'broker, burst (4 clients)':26s} {len(latencies_ms(out, 'burst'))}/{burst // 4 * 4} arrived")
+    finally:
+        broker.terminate()
+        broker.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=20, help="Commands for the latency runs (default: 20)")
+    parser.add_argument("--burst", type=int, default=2000, help="Commands in the burst (default: 2000)")
+    parser.add_argument("--poll", type=float, default=1.0, help="Command file poll interval (default: 1.0)")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-console-"))
+    try:
+        fake = work / "fake_server.py"
+        fake.write_text(FAKE_SERVER)
+        os.environ["HYTALE_DIR"] = str(work)
+        bench_file(work, fake, args.commands, args.burst, args.poll)
+        bench_broker(work, fake, args.commands, args.burst)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event loop responsiveness while an update runs.
+
+Runs a fake update (a downloader stub plus a download.sh that works for
+--seconds) inside an asyncio loop while a probe calls the setup status check
+every 20 ms. The old update path ran subprocess.run() directly on the event
+loop; the new one goes through async_exec. Reports event loop lag and status
+latency for both.
+
+The probe calls /api/setup/status's handler when FastAPI is installed, and an
+equivalent set of stat() calls otherwise.
+
+Usage:
+    python3 scripts/bench-event-loop-lag.py [--seconds 3]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TMP = Path(tempfile.mkdtemp(prefix="bench-loop-lag-"))
+os.environ["HYTALE_DIR"] = str(TMP)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+import docker_overrides  # noqa: E402
+
+try:
+    from setup_routes import setup_status  # noqa: E402
+except ImportError:
+    setup_status = None
+
+PROBE_INTERVAL = 0.02
+
+
+def prepare(seconds: float) -> None:
+    downloader = TMP / ".downloader"
+    downloader.mkdir(parents=True)
+    stub = downloader / "hytale-downloader-linux-amd64"
+    stub.write_text("#!/bin/sh\necho 2026.01.26-test\n")
+    stub.chmod(0o755)
+    (downloader / "download.sh").write_text(f"#!/bin/bash\necho downloading\nsleep {seconds}\necho done\n")
+
+
+async def status_probe() -> None:
+    if setup_status is not None:
+        await setup_status()
+    else:
+        for path in ("Server/HytaleServer.jar", "Assets.zip", ".downloader/hytale-downloader-linux-amd64"):
+            (TMP / path).exists()
+
+
+def legacy_update(seconds: float) -> None:
+    """What run_update() did before: block the loop in subprocess.run()."""
+    downloader = TMP / ".downloader"
+    subprocess.run([str(downloader / "hytale-downloader-linux-amd64"), "-print-version"],
+                   cwd=str(downloader), capture_output=True, text=True, timeout=30)
+    with open(TMP / "update.log", "w") as f:
+        subprocess.run(["/bin/bash", str(downloader / "download.sh")], cwd=str(downloader),
+                       stdout=f, stderr=subprocess.STDOUT, timeout=600)
+
+
+async def measure(update) -> dict:
+    lags, latencies = [], []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            expected = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(time.perf_counter() - expected)
+            start = time.perf_counter()
+            await status_probe()
+            latencies.append(time.perf_counter() - start + lags[-1])
+
+    async def run():
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        await update()
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0.1)
+        done.set()
+        return elapsed
+
+    elapsed, _ = await asyncio.gather(run(), probe())
+    lags.sort()
+    latencies.sort()
+    return {
+        "update_s": elapsed,
+        "probes": len(lags),
+        "lag_max_ms": lags[-1] * 1000,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000,
+        "status_max_ms": latencies[-1] * 1000,
+    }
+
+
+def report(name: str, result: dict) -> None:
+    print(f"{name:8s} update {result['update_s']:6.2f} s  probes {result['probes']:4d}  "
+          f"loop lag p99 {result['lag_p99_ms']:8.1f} ms  max {result['lag_max_ms']:8.1f} ms  "
+          f"worst status latency {result['status_max_ms']:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of the fake download (default: 3)")
+    args = parser.parse_args()
+
+    prepare(args.seconds)
+    print(f"probe: {'setup_routes.setup_status' if setup_status else 'stat() fallback (FastAPI not installed)'}")
+
+    async def legacy():
+        legacy_update(args.seconds)
+
+    try:
+        report("legacy", asyncio.run(measure(legacy)))
+        report("async", asyncio.run(measure(docker_overrides.run_update_async)))
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental content-addressed backups vs. full tar archives.
+
+Generates a synthetic universe of region files, then runs --rounds backup
+cycles. Between cycles a few region files are modified in place (like the
+server saving changed chunks). Each cycle is backed up both as a full
+compressed tar (the default run_backup path) and as a snapshot in the
+deduplicating backup store. Reports time per backup and the storage each
+mode has used in total. The last snapshot is restored and compared with the
+universe.
+
+Usage:
+    python3 scripts/bench-incremental-backup.py [--size 1G] [--rounds 5] [--changed 2] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import filecmp
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from backup_store import BackupStore  # noqa: E402
+from backup_writer import ParallelCompressedWriter  # noqa: E402
+
+REGION_SIZE = 8 * 1024 * 1024
+PATCH_SIZE = 64 * 1024
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def generate_universe(root: Path, size: int, rng: random.Random) -> list[Path]:
+    region_dir = root / "worlds" / "default" / "chunks"
+    region_dir.mkdir(parents=True)
+    pattern = bytes(rng.randrange(16) for _ in range(4096)) * 16
+    regions = []
+    for n in range(max(1, size // REGION_SIZE)):
+        path = region_dir / f"{n}.{n}.region.bin"
+        with open(path, "wb") as f:
+            for _ in range(REGION_SIZE // (128 * 1024)):
+                f.write(pattern[:96 * 1024] + rng.randbytes(32 * 1024))
+        regions.append(path)
+    (root / "config.json").write_text('{"seed": 42}')
+    return regions
+
+
+def touch_regions(regions: list[Path], count: int, rng: random.Random) -> None:
+    """Rewrite a few 64 KiB ranges in `count` region files, in place."""
+    for path in rng.sample(regions, min(count, len(regions))):
+        with open(path, "r+b") as f:
+            for _ in range(4):
+                f.seek(rng.randrange(REGION_SIZE // PATCH_SIZE) * PATCH_SIZE)
+                f.write(rng.randbytes(PATCH_SIZE))
+
+
+def full_backup(universe: Path, target: Path) -> None:
+    with open(target, "wb") as raw, ParallelCompressedWriter(raw, "gzip") as writer, \
+            tarfile.open(fileobj=writer, mode="w|") as tar:
+        tar.add(universe, arcname="universe")
+
+
+def same_tree(a: Path, b: Path) -> bool:
+    cmp = filecmp.dircmp(a, b)
+    if cmp.left_only or cmp.right_only or cmp.funny_files:
+        return False
+    _, mismatch, errors = filecmp.cmpfiles(a, b, cmp.common_files, shallow=False)
+    if mismatch or errors:
+        return False
+    return all(same_tree(a / d, b / d) for d in cmp.common_dirs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1G", help="Synthetic universe size (default: 1G)")
+    parser.add_argument("--rounds", type=int, default=5, help="Backup cycles (default: 5)")
+    parser.add_argument("--changed", type=int, default=2, help="Region files modified per cycle (default: 2)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    work = Path(tempfile.mkdtemp(prefix="bench-incremental-", dir=args.dir))
+    universe = work / "universe"
+    full_dir = work / "full"
+    full_dir.mkdir()
+    store = BackupStore(work / "store")
+    try:
+        regions = generate_universe(universe, parse_size(args.size), rng)
+        print(f"universe: {len(regions)} region files, {len(regions) * REGION_SIZE / 1024 ** 2:.0f} MB, "
+              f"{args.changed} modified per cycle")
+        full_total = 0
+        for n in range(args.rounds):
+            if n:
+                touch_regions(regions, args.changed, rng)
+
+            start = time.perf_counter()
+            target = full_dir / f"hytale_{n}.tar.gz"
+            full_backup(universe, target)
+            full_time = time.perf_counter() - start
+            full_total += target.stat().st_size
+
+            start = time.perf_counter()
+            summary = store.create_snapshot(universe, f"hytale_{n}")
+            inc_time = time.perf_counter() - start
+            print(f"cycle {n}: full {full_time:6.2f} s (total {full_total / 1024 ** 2:8.1f} MB)   "
+                  f"incremental {inc_time:6.2f} s (+{summary['new_bytes'] / 1024 ** 2:7.1f} MB, "
+                  f"total {store.usage() / 1024 ** 2:8.1f} MB, {summary['reused_files']} files skipped)")
+
+        restored = work / "restored"
+        start = time.perf_counter()
+        store.restore(f"hytale_{args.rounds - 1}", restored)
+        print(f"restore of last snapshot: {time.perf_counter() - start:.2f} s, "
+              f"identical: {same_tree(universe, restored)}")
+        print(f"storage after {args.rounds} backups: full {full_total / 1024 ** 2:.1f} MB, "
+              f"incremental {store.usage() / 1024 ** 2:.1f} MB "
+              f"({full_total / max(1, store.usage()):.1f}x smaller)")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reverse-seeking tail reader vs. the old readlines() implementation.
+
+Generates synthetic server logs of the requested sizes and measures wall time
+and peak RSS for fetching the last LOG_LINES lines with both approaches.
+Each measurement runs in a forked child so RSS numbers are not polluted by
+earlier runs.
+
+Usage:
+    python3 scripts/bench-log-tail.py [--sizes 10M,1G,5G] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from log_tail import tail_lines  # noqa: E402
+
+LINES = 150
+SAMPLE_LINE = (
+    "\x1b[0;37m[2026/01/26 19:00:36   INFO]\x1b[m [World|default] "
+    "Saved chunk region r.{n}.{n}.region in 12ms\n"
+)
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def generate_log(path: Path, size: int) -> None:
+    block = "".join(SAMPLE_LINE.format(n=i) for i in range(8192)).encode()
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            chunk = block[: size - written]
+            f.write(chunk)
+            written += len(chunk)
+        f.write(b"[2026/01/26 23:59:59   INFO] last line\n")
+
+
+def legacy_tail(path: Path, n: int) -> list[str]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.readlines()[-n:]
+
+
+def _measure(func, path, n, queue):
+    start = time.perf_counter()
+    result = func(path, n)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_kb, len(result)))
+
+
+def measure(func, path: Path, n: int) -> tuple[float, int, int]:
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(func, path, n, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10M,1G,5G", help="Comma-separated log sizes (default: 10M,1G,5G)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated logs")
+    parser.add_argument("--keep", action="store_true", help="Keep generated log files")
+    args = parser.parse_args()
+
+    print(f"{'size':>8}  {'impl':<8}  {'time':>10}  {'peak RSS':>10}  lines")
+    for size_text in args.sizes.split(","):
+        size = parse_size(size_text)
+        path = Path(args.dir) / f"bench-server-{size_text.strip()}.log"
+        if not path.exists() or path.stat().st_size < size:
+            generate_log(path, size)
+        try:
+            for name, func in (("tail", tail_lines), ("legacy", legacy_tail)):
+                elapsed, peak_kb, count = measure(func, path, LINES)
+                print(f"{size_text:>8}  {name:<8}  {elapsed * 1000:>8.2f}ms  {peak_kb / 1024:>8.1f}MB  {count}")
+        finally:
+            if not args.keep:
+                os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: player list from the log event pipeline vs. the old full-log rescan.
+
+Generates a synthetic server log with periodic join/leave events, ingests it
+once (cold start), rebuilds the player list from the spilled events (dashboard
+restart), then appends a few lines and measures the refresh cost. The legacy
+implementation rescans the whole file on every call.
+
+Usage:
+    python3 scripts/bench-player-index.py [--size 2G] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from log_tail import strip_ansi  # noqa: E402
+from log_events import JOIN_RE, LEAVE_RE, EventPipeline  # noqa: E402
+from player_index import PlayerIndex  # noqa: E402
+
+NOISE = "\x1b[0;37m[2026/01/26 19:00:36   INFO]\x1b[m [World|default] Saved chunk region r.{n}.{n}.region in 12ms\n"
+JOIN = ("[2026/01/26 19:00:36   INFO] Adding player 'Player{n}' to world 'default' at location "
+        "(1.0, 64.0, 1.0) (00000000-0000-0000-0000-{n:012d})\n")
+LEAVE = "[2026/01/26 19:30:00   INFO] Removing player 'Player{n}' (00000000-0000-0000-0000-{n:012d})\n"
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def generate_log(path: Path, size: int) -> None:
+    lines = []
+    for i in range(8192):
+        lines.append(NOISE.format(n=i))
+        if i % 512 == 0:
+            lines.append(JOIN.format(n=i % 37))
+        if i % 512 == 256:
+            lines.append(LEAVE.format(n=(i - 256) % 37))
+    block = "".join(lines).encode()
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            f.write(block)
+            written += len(block)
+
+
+def legacy_players(path: Path) -> list[dict]:
+    players = {}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for raw_line in f:
+            line = strip_ansi(raw_line)
+            m = JOIN_RE.search(line)
+            if m:
+                players[m.group(4)] = {"name": m.group(2), "online": True}
+                continue
+            m = LEAVE_RE.search(line)
+            if m and m.group(3) in players:
+                players[m.group(3)]["online"] = False
+    return list(players.values())
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="2G", help="Synthetic log size (default: 2G)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not run the full-rescan baseline")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    log = Path(args.dir) / f"bench-players-{args.size}.log"
+    checkpoint = Path(args.dir) / f"bench-players-{args.size}.pipeline.json"
+    spill = Path(args.dir) / f"bench-players-{args.size}.events.jsonl"
+    if not log.exists():
+        generate_log(log, parse_size(args.size))
+    for path in (checkpoint, spill):
+        if path.exists():
+            path.unlink()
+
+    def new_index():
+        return PlayerIndex(EventPipeline(log, checkpoint, spill))
+
+    try:
+        print(f"log size: {log.stat().st_size / 1024 ** 2:.0f} MB")
+
+        elapsed, players = timed(new_index().refresh)
+        print(f"index cold build:          {elapsed * 1000:10.1f} ms  ({len(players)} players)")
+
+        # A fresh instance simulates a dashboard restart: events are replayed.
+        index = new_index()
+        elapsed, _ = timed(index.refresh)
+        print(f"index reload (restart):    {elapsed * 1000:10.3f} ms")
+
+        for _ in range(5):
+            with open(log, "a") as f:
+                f.write(NOISE.format(n=1) * 20 + JOIN.format(n=99))
+            elapsed, players = timed(index.refresh)
+            print(f"index refresh (+21 lines): {elapsed * 1000:10.3f} ms  ({len(players)} players)")
+
+        if not args.skip_legacy:
+            elapsed, players = timed(lambda: legacy_players(log))
+            print(f"legacy full rescan:        {elapsed * 1000:10.1f} ms  ({len(players)} players)")
+    finally:
+        if not args.keep:
+            for path in (log, checkpoint, spill):
+                if path.exists():
+                    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
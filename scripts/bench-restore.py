@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: restore of a full backup archive.
+
+Generates a synthetic universe and archives it like a backup job (parallel
+multi-member gzip plus the per-file checksum manifest). Then restores it with
+a plain `tarfile.open(..., "r:gz").extractall()` (single-threaded, no
+verification) and with restore.extract_archive() at several thread counts
+(verified against the manifest and archive checksum). Finally measures the
+swap, which is the only part of a restore that needs the server stopped.
+
+Usage:
+    python3 scripts/bench-restore.py [--size 1G] [--threads 1,2,4] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from backup_writer import ParallelCompressedWriter, available_cpus  # noqa: E402
+from restore import MANIFEST_NAME, extract_archive, swap_in  # noqa: E402
+
+REGION_SIZE = 8 * 1024 * 1024
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def generate_universe(root: Path, size: int) -> None:
+    rng = random.Random(42)
+    region_dir = root / "worlds" / "default" / "chunks"
+    region_dir.mkdir(parents=True)
+    # Roughly 2:1 compressible, like chunk data with palettes and noise
+    pattern = bytes(rng.randrange(16) for _ in range(4096)) * 24
+    written = 0
+    n = 0
+    while written < size:
+        with open(region_dir / f"{n}.{n}.region.bin", "wb") as f:
+            for _ in range(REGION_SIZE // (128 * 1024)):
+                f.write(pattern[:96 * 1024] + rng.randbytes(32 * 1024))
+        written += REGION_SIZE
+        n += 1
+    (root / "config.json").write_text('{"seed": 42}')
+
+
+def archive(universe: Path, target: Path) -> str:
+    """Archive like docker_overrides._backup_universe. Returns the archive SHA-256."""
+    checksums = {}
+    with open(target, "wb") as raw, ParallelCompressedWriter(raw, "gzip") as writer, \
+            tarfile.open(fileobj=writer, mode="w|") as tar:
+        tar.add(universe, arcname="universe", recursive=False)
+        for path in sorted(universe.rglob("*")):
+            tar.add(path, arcname=f"universe/{path.relative_to(universe).as_posix()}", recursive=False)
+            if path.is_file():
+                checksums[path.relative_to(universe).as_posix()] = hashlib.sha256(path.read_bytes()).hexdigest()
+        manifest = json.dumps({"version": 1, "created": time.time(), "files": checksums}).encode()
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(manifest)
+        tar.addfile(info, io.BytesIO(manifest))
+    return hashlib.sha256(target.read_bytes()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1G", help="Synthetic universe size (default: 1G)")
+    parser.add_argument("--threads", default="", help="Comma-separated thread counts (default: 1,2,4,... up to CPUs)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    if args.threads:
+        thread_counts = [int(t) for t in args.threads.split(",")]
+    else:
+        thread_counts = [1]
+        while thread_counts[-1] * 2 <= cpus:
+            thread_counts.append(thread_counts[-1] * 2)
+
+    work = Path(tempfile.mkdtemp(prefix="bench-restore-", dir=args.dir))
+    try:
+        universe = work / "universe"
+        generate_universe(universe, parse_size(args.size))
+        input_bytes = sum(p.stat().st_size for p in universe.rglob("*") if p.is_file())
+        target = work / "backup.tar.gz"
+        checksum = archive(universe, target)
+        print(f"universe: {input_bytes / 1024 ** 2:.0f} MB, archive {target.stat().st_size / 1024 ** 2:.0f} MB, "
+              f"{cpus} CPUs available")
+
+        out = work / "legacy"
+        start = time.perf_counter()
+        with tarfile.open(target, "r:gz") as tar:
+            tar.extractall(out)
+        elapsed = time.perf_counter() - start
+        print(f"{'tarfile r:gz extractall':26s} {elapsed:7.2f} s  {input_bytes / elapsed / 1024 ** 2:8.1f} MB/s  "
+              f"(not verified)")
+        shutil.rmtree(out)
+
+        for threads in thread_counts:
+            out = work / f"restore-{threads}"
+            start = time.perf_counter()
+            stats = extract_archive(target, out, expected_sha256=checksum, threads=threads)
+            elapsed = time.perf_counter() - start
+            print(f"{f'extract_archive x{threads}':26s} {elapsed:7.2f} s  {input_bytes / elapsed / 1024 ** 2:8.1f} MB/s  "
+                  f"({stats['verified_files']} files verified)")
+            if threads != thread_counts[-1]:
+                shutil.rmtree(out)
+
+        # The part of a restore that runs with the server stopped
+        live = work / "live"
+        shutil.copytree(universe, live)
+        start = time.perf_counter()
+        swap_in(out, live, work / "previous")
+        print(f"{'swap (server stopped)':26s} {(time.perf_counter() - start) * 1000:7.1f} ms")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
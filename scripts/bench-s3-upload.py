@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming multipart upload of a backup stream to S3.
+
+Streams a synthetic backup through s3_upload.MultipartUploadWriter with one
+and with several parts in flight, and reports throughput and peak memory
+(tracemalloc). Then interrupts an upload halfway and uploads the same stream
+again to show how many bytes the resume skips.
+
+By default a small in-process S3 stand-in is used (multipart API only, no
+auth checks) with a per-connection bandwidth limit, like a real uplink where
+one TCP stream does not fill the pipe. Pass --endpoint/--bucket/--access-key/
+--secret-key to run against MinIO, moto or AWS instead.
+
+Usage:
+    python3 scripts/bench-s3-upload.py [--size 512M] [--part-size 16M] [--concurrency 4]
+                                       [--conn-bandwidth 40M] [--endpoint URL --bucket NAME ...]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+WRITE_SIZE = 64 * 1024  # tarfile writes in small blocks
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class FakeS3:
+    """In-memory multipart endpoint: uploads are kept as part digests and sizes, not data."""
+
+    def __init__(self, bandwidth: int, fail_after: int | None = None):
+        self.bandwidth = bandwidth
+        self.fail_after = fail_after  # fail part uploads once this many parts were stored
+        self.uploads = {}  # upload_id -> {number: (etag, size)}
+        self.objects = {}  # key -> (etag, size)
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status: int, body: bytes = b"", headers: dict | None = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def parse(self):
+                url = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+                key = url.path.split("/", 2)[2] if url.path.count("/") >= 2 else ""
+                length = int(self.headers.get("Content-Length") or 0)
+                return key, query, length
+
+            def do_POST(self):
+                key, query, length = self.parse()
+                body = self.rfile.read(length)
+                if "uploads" in query:
+                    upload_id = uuid.uuid4().hex
+                    with fake.lock:
+                        fake.uploads[upload_id] = {}
+                    self.reply(200, f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId>"
+                                    f"</InitiateMultipartUploadResult>".encode())
+                    return
+                parts = fake.uploads.pop(query["uploadId"])
+                numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+                md5s = b"".join(bytes.fromhex(parts[n][0]) for n in numbers)
+                etag = f"{hashlib.md5(md5s).hexdigest()}-{len(numbers)}"
+                fake.objects[key] = (etag, sum(parts[n][1] for n in numbers))
+                self.reply(200, b"<CompleteMultipartUploadResult/>")
+
+            def do_PUT(self):
+                key, query, length = self.parse()
+                md5 = hashlib.md5()
+                start = time.monotonic()
+                remaining = length
+                while remaining:
+                    block = self.rfile.read(min(remaining, 1024 * 1024))
+                    md5.update(block)
+                    remaining -= len(block)
+                    # Per-connection bandwidth limit
+                    delay = (length - remaining) / fake.bandwidth - (time.monotonic() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                with fake.lock:
+                    parts = fake.uploads[query["uploadId"]]
+                    if fake.fail_after is not None and len(parts) >= fake.fail_after:
+                        self.reply(400, b"<Error><Code>InjectedFailure</Code></Error>")
+                        return
+                    parts[int(query["partNumber"])] = (md5.hexdigest(), length)
+                self.reply(200, headers={"ETag": f'"{md5.hexdigest()}"'})
+
+            def do_GET(self):
+                _key, query, _length = self.parse()
+                parts = fake.uploads[query["uploadId"]]
+                body = "".join(f"<Part><PartNumber>{n}</PartNumber><ETag>\"{etag}\"</ETag><Size>{size}</Size></Part>"
+                               for n, (etag, size) in sorted(parts.items()))
+                self.reply(200, f"<ListPartsResult><IsTruncated>false</IsTruncated>{body}</ListPartsResult>".encode())
+
+            def do_HEAD(self):
+                key, _query, _length = self.parse()
+                if key not in fake.objects:
+                    self.reply(404)
+                    return
+                etag, size = fake.objects[key]
+                self.send_response(200)
+                self.send_header("ETag", f'"{etag}"')
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+
+            def do_DELETE(self):
+                key, query, _length = self.parse()
+                if "uploadId" in query:
+                    fake.uploads.pop(query["uploadId"], None)
+                else:
+                    fake.objects.pop(key, None)
+                self.reply(204)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+
+
+def stream(writer, size: int, seed: int) -> None:
+    """Deterministic pseudo-random data, written in tarfile-sized blocks."""
+    rng = random.Random(seed)
+    block = rng.randbytes(4 * 1024 * 1024)
+    written = 0
+    while written < size:
+        offset = rng.randrange(len(block) - WRITE_SIZE)
+        chunk = block[offset:offset + min(WRITE_SIZE, size - written)]
+        writer.write(chunk)
+        written += len(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="512M", help="Backup stream size (default: 512M)")
+    parser.add_argument("--part-size", default="16M", help="Multipart part size (default: 16M)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parts in flight (default: 4)")
+    parser.add_argument("--conn-bandwidth", default="40M",
+                        help="Per-connection bandwidth of the built-in endpoint, bytes/s (default: 40M)")
+    parser.add_argument("--endpoint", help="S3 endpoint URL (default: built-in stand-in)")
+    parser.add_argument("--bucket", default="bench")
+    parser.add_argument("--access-key", default="bench")
+    parser.add_argument("--secret-key", default="bench")
+    parser.add_argument("--region", default="us-east-1")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+    import s3_upload  # noqa: E402
+
+    size, part_size = parse_size(args.size), parse_size(args.part_size)
+    fake = None if args.endpoint else FakeS3(parse_size(args.conn_bandwidth))
+    endpoint = args.endpoint or fake.endpoint
+    key = f"bench/hytale_{time.strftime('%Y%m%d_%H%M%S')}.tar.gz"
+    print(f"stream {size / 1024 ** 2:.0f} MB, parts {part_size / 1024 ** 2:.0f} MB, endpoint {endpoint}")
+
+    for concurrency in sorted({1, args.concurrency}):
+        client = s3_upload.S3Client(endpoint, args.bucket, args.access_key, args.secret_key, args.region,
+                                    pool_size=concurrency + 1)
+        tracemalloc.start()
+        start = time.perf_counter()
+        with s3_upload.MultipartUploadWriter(client, key, part_size, concurrency) as writer:
+            stream(writer, size, seed=1)
+        elapsed = time.perf_counter() - start
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"concurrency {concurrency}: {elapsed:6.2f} s  {size / elapsed / 1024 ** 2:7.1f} MB/s  "
+              f"peak memory {peak / 1024 ** 2:6.1f} MB  (verified: size + multipart ETag)")
+        client.delete_object(key)
+
+    if fake is None:
+        return
+    # Resume: fail after half the parts, then upload the same stream again
+    state_file = Path(tempfile.mkdtemp(prefix="bench-s3-")) / ".s3-upload.json"
+    client = s3_upload.S3Client(endpoint, args.bucket, args.access_key, args.secret_key, args.region,
+                                pool_size=args.concurrency + 1)
+    fake.fail_after = max(1, size // part_size // 2)
+    try:
+        with s3_upload.MultipartUploadWriter(client, key, part_size, args.concurrency, state_file) as writer:
+            stream(writer, size, seed=1)
+    except s3_upload.S3Error as e:
+        print(f"interrupted: {e}")
+    fake.fail_after = None
+    start = time.perf_counter()
+    with s3_upload.MultipartUploadWriter(client, key, part_size, args.concurrency, state_file) as writer:
+        stream(writer, size, seed=1)
+    elapsed = time.perf_counter() - start
+    print(f"resumed: {elapsed:6.2f} s, skipped {writer.bytes_skipped / 1024 ** 2:.0f} MB, "
+          f"uploaded {writer.bytes_uploaded / 1024 ** 2:.0f} MB, state file removed: {not state_file.exists()}")
+    os.rmdir(state_file.parent)
+
+
+if __name__ == "__main__":
+    main()
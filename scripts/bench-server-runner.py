@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark: idle cost of server-wrapper.sh vs. server_runner.py.
+
+Both supervise the same fake server (start.sh execs `sleep`, which uses no
+CPU) for --seconds after a short warm-up:
+
+- wrapper: the real scripts/server-wrapper.sh, with a stand-in `screen` on
+  PATH (a small shell script; the real screen costs more per call)
+- runner: dashboard/server_runner.py
+
+CPU time (the process and its reaped children, from /proc/PID/stat) and
+context switches are sampled at the start and end of the idle window. Then
+the fake server is killed, and the time until the supervisor has started a
+new one is measured (wrapper: its next once-a-second poll; runner: pidfd
+wake-up + HYTALE_RESTART_BACKOFF, set to --backoff).
+
+Usage:
+    python3 scripts/bench-server-runner.py [--seconds 30] [--backoff 1]
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DASHBOARD = ROOT / "dashboard"
+
+FAKE_SCREEN = """#!/bin/bash
+# -list / -dmS NAME CMD... / -S NAME ... (stuff, quit)
+case "$1" in
+    -list) kill -0 "$(cat "$FAKE_SCREEN_PID" 2>/dev/null)" 2>/dev/null && echo "  1.hytale (Detached)"; exit 0 ;;
+    -dmS) shift 2; setsid "$@" </dev/null >/dev/null 2>&1 & echo $! > "$FAKE_SCREEN_PID"; exit 0 ;;
+    *) exit 0 ;;
+esac
+"""
+
+FAKE_START = """#!/bin/bash
+echo $$ > "$FAKE_SERVER_PID"
+exec sleep 100000
+"""
+
+TICK = os.sysconf("SC_CLK_TCK")
+
+
+def cpu_and_switches(pid: int) -> tuple[float, int]:
+    """(CPU seconds of pid and its reaped children, voluntary + involuntary context switches of pid)"""
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    cpu = sum(int(v) for v in fields[11:15]) / TICK  # utime stime cutime cstime
+    switches = 0
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.split(":")[0].endswith("ctxt_switches"):
+            switches += int(line.split()[1])
+    return cpu, switches
+
+
+def server_pid(path: Path) -> int | None:
+    try:
+        pid = int(path.read_text())
+        os.kill(pid, 0)
+        return pid
+    except (OSError, ValueError):
+        return None
+
+
+def wait_new_server(path: Path, old: int | None, timeout: float) -> float | None:
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        pid = server_pid(path)
+        if pid and pid != old:
+            return time.monotonic() - start
+        time.sleep(0.01)
+    return None
+
+
+def bench(name: str, cmd: list[str], work: Path, env: dict, seconds: float) -> dict:
+    pid_file = work / "server.pid"
+    pid_file.unlink(missing_ok=True)
+    proc = subprocess.Popen(cmd, cwd=work, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if wait_new_server(pid_file, None, 15) is None:
+            raise SystemExit(f"{name}: server did not start")
+        time.sleep(3)  # warm-up (wrapper: 2 s start wait)
+        cpu0, sw0 = cpu_and_switches(proc.pid)
+        time.sleep(seconds)
+        cpu1, sw1 = cpu_and_switches(proc.pid)
+        old = server_pid(pid_file)
+        os.kill(old, signal.SIGKILL)
+        restart = wait_new_server(pid_file, old, 30)
+        return {"name": name, "cpu_ms_per_min": (cpu1 - cpu0) * 1000 * 60 / seconds,
+                "switches_per_min": (sw1 - sw0) * 60 / seconds, "restart_s": restart}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        pid = server_pid(pid_file)
+        if pid:
+            os.kill(pid, signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30, help="Idle window in seconds (default: 30)")
+    parser.add_argument("--backoff", type=float, default=1, help="Runner restart backoff in seconds (default: 1)")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-runner-"))
+    try:
+        (work / "Server").mkdir()
+        (work / "Server" / "HytaleServer.jar").touch()
+        (work / "Assets.zip").touch()
+        (work / "bin").mkdir()
+        for path, text in ((work / "bin" / "screen", FAKE_SCREEN), (work / "start.sh", FAKE_START)):
+            path.write_text(text)
+            path.chmod(0o755)
+        env = {**os.environ, "HYTALE_DIR": str(work), "DASHBOARD_DIR": str(DASHBOARD),
+               "PATH": f"{work / 'bin'}:{os.environ['PATH']}", "FAKE_SCREEN_PID": str(work / "screen.pid"),
+               "FAKE_SERVER_PID": str(work / "server.pid"), "HYTALE_RESTART_BACKOFF": str(args.backoff)}
+
+        results = [
+            bench("wrapper", ["bash", str(ROOT / "scripts" / "server-wrapper.sh")], work, env, args.seconds),
+            bench("runner", [sys.executable, str(DASHBOARD / "server_runner.py")], work, env, args.seconds),
+        ]
+        for r in results:
+            restart = f"{r['restart_s']:.2f} s" if r["restart_s"] is not None else "none"
+            print(f"{r['name']:8s} idle CPU {r['cpu_ms_per_min']:8.1f} ms/min  "
+                  f"context switches {r['switches_per_min']:7.0f}/min  restart after kill {restart}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: save pause of a consistent backup snapshot.
+
+Simulates the server side: a writer thread keeps rewriting a few region files
+(like autosave), and a fake server-wrapper polls .server_command, pauses or
+resumes the writer and logs "World saved" after a flush. Then takes
+snapshots through snapshot.take_snapshot() and reports how long saves were
+held, compared with copying the whole universe during the pause.
+
+Usage:
+    python3 scripts/bench-snapshot-pause.py [--size 1G] [--rounds 3] [--wrapper-poll 1.0] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+REGION_SIZE = 8 * 1024 * 1024
+PATCH_SIZE = 64 * 1024
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def generate_universe(root: Path, size: int, rng: random.Random) -> list[Path]:
+    region_dir = root / "worlds" / "default" / "chunks"
+    region_dir.mkdir(parents=True)
+    regions = []
+    for n in range(max(1, size // REGION_SIZE)):
+        path = region_dir / f"{n}.{n}.region.bin"
+        path.write_bytes(rng.randbytes(REGION_SIZE))
+        regions.append(path)
+    return regions
+
+
+class FakeServer:
+    """Autosave writer plus a wrapper loop reading the command file."""
+
+    def __init__(self, server_dir: Path, regions: list[Path], poll: float):
+        self.command_file = server_dir / ".server_command"
+        self.log_file = server_dir / "logs" / "server.log"
+        self.regions = regions
+        self.poll = poll
+        self.saving = threading.Event()
+        self.saving.set()
+        self.stop = threading.Event()
+        self.rng = random.Random(7)
+        self.command_file.touch()
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        self.log_file.touch()
+
+    def log(self, message: str) -> None:
+        with open(self.log_file, "a") as f:
+            f.write(f"[{time.strftime('%Y/%m/%d %H:%M:%S')}   INFO] [Universe] {message}\n")
+
+    def writer(self) -> None:
+        while not self.stop.is_set():
+            if self.saving.wait(0.1):
+                with open(self.rng.choice(self.regions), "r+b") as f:
+                    f.seek(self.rng.randrange(REGION_SIZE // PATCH_SIZE) * PATCH_SIZE)
+                    f.write(self.rng.randbytes(PATCH_SIZE))
+                time.sleep(0.05)
+
+    def wrapper(self) -> None:
+        while not self.stop.is_set():
+            if self.command_file.stat().st_size:
+                commands = self.command_file.read_text().split()
+                self.command_file.write_text("")
+                for command in commands:
+                    if command == "save-off":
+                        self.saving.clear()
+                    elif command == "save-on":
+                        self.saving.set()
+                    elif command == "save":
+                        time.sleep(0.2)  # flushing dirty chunks
+                        self.log("World saved")
+            time.sleep(self.poll)
+
+    def start(self) -> None:
+        for target in (self.writer, self.wrapper):
+            threading.Thread(target=target, daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1G", help="Synthetic universe size (default: 1G)")
+    parser.add_argument("--rounds", type=int, default=3, help="Snapshots to take (default: 3)")
+    parser.add_argument("--wrapper-poll", type=float, default=1.0,
+                        help="Command file poll interval of the fake wrapper (default: 1.0, like server-wrapper.sh)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-snapshot-", dir=args.dir))
+    os.environ["HYTALE_DIR"] = str(work)
+    os.environ["HYTALE_SAVE_PAUSE_COMMAND"] = "save-off"
+    os.environ["HYTALE_SAVE_RESUME_COMMAND"] = "save-on"
+    os.environ["HYTALE_CONSOLE_FILE_FALLBACK"] = "1"  # the fake wrapper reads the command file
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+    import snapshot  # noqa: E402  (reads HYTALE_* at import)
+
+    try:
+        regions = generate_universe(work / "universe", parse_size(args.size), random.Random(42))
+        print(f"universe: {len(regions)} region files, {len(regions) * REGION_SIZE / 1024 ** 2:.0f} MB, "
+              f"wrapper poll {args.wrapper_poll:.1f} s")
+        server = FakeServer(work, regions, args.wrapper_poll)
+        server.start()
+
+        for n in range(args.rounds):
+            time.sleep(1)
+            stats = snapshot.take_snapshot(work / "universe", server_running=True)
+            print(f"snapshot {n} ({stats['method']}): pre-sync {stats['pre_sync_ms']:8.0f} ms  "
+                  f"flush wait {stats['flush_wait_ms']:6.0f} ms  pause {stats['pause_ms']:6.0f} ms "
+                  f"({stats['copied_files']} files)  saves held {stats['saves_held_ms']:6.0f} ms  "
+                  f"consistent {stats['consistent']}")
+
+        # Baseline: the whole universe copied while saves are held
+        baseline = work / "baseline"
+        start = time.perf_counter()
+        shutil.copytree(work / "universe", baseline)
+        print(f"baseline, full copy after the flush: pause {(time.perf_counter() - start) * 1000:8.0f} ms")
+        server.stop.set()
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: server downtime of an update, in place vs. staged.
+
+Builds a synthetic game.zip (large Assets.zip, an 80 MB server jar and a few
+hundred small files) and a next version with a new jar, optionally a new
+Assets.zip, and a few changed small files. Measures the time the server has
+to be stopped to install it:
+
+- in place, full: extraction of the whole archive (`unzip -o`)
+- in place, delta: update_apply.py on the live install
+- staged: staged_update.stage_version() runs while the server is up, only
+  activate() (link + rename per file) runs while it is down
+
+Usage:
+    python3 scripts/bench-staged-update.py [--assets 1G] [--assets-changed] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from staged_update import activate, stage_version  # noqa: E402
+from update_apply import apply_update  # noqa: E402
+
+SMALL_FILES = 300
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def build_zip(path: Path, assets: int, assets_seed: int, jar_seed: int, version: str) -> None:
+    with zipfile.ZipFile(path, "w") as zf:
+        with zf.open(zipfile.ZipInfo("Assets.zip", (2026, 1, 1, 0, 0, 0)), "w", force_zip64=True) as f:
+            block = random.Random(assets_seed).randbytes(1024 * 1024)
+            for _ in range(assets // len(block)):
+                f.write(block)
+        zf.writestr(zipfile.ZipInfo("Server/HytaleServer.jar", (2026, 1, 1, 0, 0, 0)),
+                    random.Random(jar_seed).randbytes(80 * 1024 ** 2))
+        for n in range(SMALL_FILES):
+            data = f"file {n} {version if n < 5 else 'base'}\n".encode() * 200
+            zf.writestr(f"Server/data/{n // 50}/file-{n}.json", data, compress_type=zipfile.ZIP_DEFLATED)
+
+
+def install(archive: Path, server: Path) -> None:
+    shutil.rmtree(server, ignore_errors=True)
+    server.mkdir()
+    (server / "last_version.txt").write_text("1.0")
+    with contextlib.redirect_stdout(io.StringIO()):
+        apply_update(archive, server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", default="1G", help="Size of the synthetic Assets.zip (default: 1G)")
+    parser.add_argument("--assets-changed", action="store_true", help="The new version also has a new Assets.zip")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-staged-", dir=args.dir))
+    try:
+        old, new = work / "game-1.0.zip", work / "game-2.0.zip"
+        assets = parse_size(args.assets)
+        build_zip(old, assets, 1, 1, "1.0")
+        build_zip(new, assets, 2 if args.assets_changed else 1, 2, "2.0")
+        print(f"game.zip: {new.stat().st_size / 1024 ** 2:.0f} MB, changed: server jar, 5 small files"
+              f"{', Assets.zip' if args.assets_changed else ''}")
+        server = work / "server"
+
+        install(old, server)
+        start = time.perf_counter()
+        with zipfile.ZipFile(new) as zf:
+            zf.extractall(server)
+        print(f"{'in place, full':18s} downtime {time.perf_counter() - start:7.3f} s")
+
+        install(old, server)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            apply_update(new, server)
+        print(f"{'in place, delta':18s} downtime {time.perf_counter() - start:7.3f} s")
+
+        install(old, server)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = stage_version(new, server, "2.0")
+        staging = time.perf_counter() - start
+        start = time.perf_counter()
+        activate(server, "2.0")
+        print(f"{'staged':18s} downtime {time.perf_counter() - start:7.3f} s  "
+              f"(staging while running: {staging:.2f} s, {stats['written']} files written, "
+              f"{stats['files']} verified)")
+        start = time.perf_counter()
+        activate(server, "1.0")
+        print(f"{'rollback':18s} downtime {time.perf_counter() - start:7.3f} s")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
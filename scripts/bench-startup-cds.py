@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark: server time-to-ready with and without the class data sharing archive.
+
+Needs a Java 17+ runtime and an installed server (Server/HytaleServer.jar
+and Assets.zip in --server-dir). The runs use a scratch directory with
+links to the jar and the assets, so the live universe is not touched; bind
+the benchmark to a free --port while a server is running.
+
+1. warm-up start (creates the scratch universe, not counted)
+2. --runs starts without an archive
+3. training start: -XX:+RecordDynamicDumpInfo, then the archive is written
+   from the running JVM with cds_archive.dump(), as server_runner.py does
+4. --runs starts with -XX:SharedArchiveFile
+
+Each start runs until the log shows the ready line (log_events.READY_RE),
+then /stop is sent. The JVM options other than CDS are the ones
+jvm_launcher.py would use.
+
+Usage:
+    python3 scripts/bench-startup-cds.py [--server-dir /opt/hytale-server] [--runs 3] [--port 5599]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+os.environ["HYTALE_CDS"] = "off"  # CDS options are set per run here
+
+import cds_archive  # noqa: E402
+import jvm_launcher  # noqa: E402
+from log_events import READY_RE  # noqa: E402
+
+
+def start(work: Path, options: list[str], port: int, timeout: float, on_ready=None) -> dict:
+    """One server start: seconds until the ready line, CDS warnings, exit code."""
+    cmd = ["java", *options, "-jar", "HytaleServer.jar", "--assets", "../Assets.zip", "--bind", f"127.0.0.1:{port}"]
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, cwd=work / "Server", stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, bufsize=1)
+    ready = None
+    warnings = []
+    ready_event = threading.Event()
+
+    def read():
+        nonlocal ready
+        for line in proc.stdout:
+            if "[cds]" in line or "shared archive" in line.lower():
+                warnings.append(line.strip())
+            if ready is None and READY_RE.search(line):
+                ready = time.monotonic() - started
+                ready_event.set()
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        if not ready_event.wait(timeout):
+            raise SystemExit(f"Server not ready after {timeout} s: {' '.join(cmd)}")
+        if on_ready is not None:
+            on_ready(proc.pid)
+        proc.stdin.write("/stop\n")
+        proc.stdin.flush()
+        proc.wait(60)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        reader.join(5)
+    return {"ready": ready, "warnings": warnings, "code": proc.returncode}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server-dir", type=Path, default=Path(os.environ.get("HYTALE_DIR", "/opt/hytale-server")))
+    parser.add_argument("--runs", type=int, default=3, help="Starts per variant (default: 3)")
+    parser.add_argument("--port", type=int, default=5599, help="Port for the benchmark server (default: 5599)")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for the ready line")
+    parser.add_argument("--train-delay", type=float, default=10,
+                        help="Seconds after ready before the archive is written (default: 10)")
+    args = parser.parse_args()
+
+    jar = args.server_dir / "Server" / "HytaleServer.jar"
+    assets = args.server_dir / "Assets.zip"
+    if not jar.is_file() or not assets.is_file():
+        raise SystemExit(f"No server installed in {args.server_dir}")
+    if shutil.which("java") is None:
+        raise SystemExit("java not found")
+    java_major = jvm_launcher.java_version()
+    if java_major is not None and java_major < cds_archive.MIN_JAVA:
+        raise SystemExit(f"Java {java_major}: dynamic CDS archives need {cds_archive.MIN_JAVA}+")
+
+    work = Path(tempfile.mkdtemp(prefix="bench-cds-"))
+    try:
+        (work / "Server").mkdir()
+        (work / "Server" / "HytaleServer.jar").symlink_to(jar.resolve())
+        (work / "Assets.zip").symlink_to(assets.resolve())
+        options = jvm_launcher.plan()["options"]
+        archive = work / "server.jsa"
+
+        print("warm-up start (scratch universe)...")
+        start(work, options, args.port, args.timeout)
+        without = [start(work, options, args.port, args.timeout)["ready"] for _ in range(args.runs)]
+
+        def train(pid):
+            time.sleep(args.train_delay)
+            result = cds_archive.dump(pid, {"archive": str(archive), "fingerprint": None})
+            print(f"archive written in {result['seconds']} s ({result['size'] / 1024 ** 2:.0f} MB)")
+
+        print("training start...")
+        start(work, options + ["-XX:+RecordDynamicDumpInfo"], args.port, args.timeout, on_ready=train)
+        runs = [start(work, options + [f"-XX:SharedArchiveFile={archive}", "-Xshare:auto"], args.port, args.timeout)
+                for _ in range(args.runs)]
+        with_cds = [run["ready"] for run in runs]
+
+        print(f"without archive  time to ready {statistics.median(without):6.2f} s  "
+              f"(runs: {', '.join(f'{s:.2f}' for s in without)})")
+        print(f"with archive     time to ready {statistics.median(with_cds):6.2f} s  "
+              f"(runs: {', '.join(f'{s:.2f}' for s in with_cds)})")
+        for warning in sorted({w for run in runs for w in run["warnings"]}):
+            print(f"  JVM: {warning}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
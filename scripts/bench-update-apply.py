@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: applying a game.zip update, full extraction vs. delta.
+
+Builds a synthetic game.zip (a large stored Assets.zip, a server jar and a
+few hundred small files), installs it, then builds a second version in which
+only --changed small files differ and applies it:
+
+- full: zipfile extractall(), what `unzip -o` does - every file rewritten
+- delta, cold: update_apply without an install manifest (installed files are
+  hashed once to build it)
+- delta: update_apply with the manifest from the previous run
+
+Usage:
+    python3 scripts/bench-update-apply.py [--assets 1G] [--changed 5] [--threads N] [--dir /tmp] [--keep]
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from backup_writer import available_cpus  # noqa: E402
+from update_apply import MANIFEST_NAME, apply_update  # noqa: E402
+
+SMALL_FILES = 300
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def build_zip(path: Path, assets: int, changed: set[int], version: str) -> None:
+    rng = random.Random(42)
+    with zipfile.ZipFile(path, "w") as zf:
+        # Assets.zip is already compressed, so game.zip stores it
+        with zf.open(zipfile.ZipInfo("Assets.zip", (2026, 1, 1, 0, 0, 0)), "w", force_zip64=True) as f:
+            block = rng.randbytes(1024 * 1024)
+            for _ in range(assets // len(block)):
+                f.write(block)
+        zf.writestr(zipfile.ZipInfo("Server/HytaleServer.jar", (2026, 1, 1, 0, 0, 0)), rng.randbytes(80 * 1024 ** 2))
+        for n in range(SMALL_FILES):
+            data = f"file {n} {version if n in changed else 'base'}\n".encode() * 200
+            zf.writestr(f"Server/data/{n // 50}/file-{n}.json", data, compress_type=zipfile.ZIP_DEFLATED)
+
+
+def human(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def installed_bytes(zip_path: Path) -> int:
+    with zipfile.ZipFile(zip_path) as zf:
+        return sum(i.file_size for i in zf.infolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", default="1G", help="Size of the synthetic Assets.zip (default: 1G)")
+    parser.add_argument("--changed", type=int, default=5, help="Small files changed by the update (default: 5)")
+    parser.add_argument("--threads", type=int, default=None, help="Worker threads (default: all CPUs)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Directory for generated files")
+    parser.add_argument("--keep", action="store_true", help="Keep generated files")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench-update-", dir=args.dir))
+    try:
+        old, new = work / "game-old.zip", work / "game-new.zip"
+        build_zip(old, parse_size(args.assets), set(), "v1")
+        build_zip(new, parse_size(args.assets), set(range(args.changed)), "v2")
+        total = installed_bytes(new)
+        print(f"game.zip: {total / 1024 ** 2:.0f} MB in {SMALL_FILES + 2} files, {args.changed} changed, "
+              f"{available_cpus()} CPUs available")
+
+        server = work / "server"
+        with zipfile.ZipFile(old) as zf:
+            zf.extractall(server)
+        start = time.perf_counter()
+        with zipfile.ZipFile(new) as zf:
+            zf.extractall(server)
+        elapsed = time.perf_counter() - start
+        print(f"{'full (unzip -o)':18s} {elapsed:7.2f} s  {human(total):>10s} written")
+
+        (server / MANIFEST_NAME).unlink(missing_ok=True)
+        with zipfile.ZipFile(old) as zf:
+            zf.extractall(server)
+        for label in ("delta, cold", "delta"):
+            start = time.perf_counter()
+            stats = apply_update(new if label == "delta" else old, server, args.threads)
+            elapsed = time.perf_counter() - start
+            print(f"{label:18s} {elapsed:7.2f} s  {human(stats['written_bytes']):>10s} written  "
+                  f"({stats['written']} of {stats['members']} files)")
+
+        # The result must match a full extraction
+        with zipfile.ZipFile(new) as zf:
+            for info in zf.infolist():
+                if (server / info.filename).read_bytes() != zf.read(info):
+                    raise SystemExit(f"MISMATCH: {info.filename}")
+        print("installed files match game-new.zip")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latency of the dashboard version check.
+
+Uses a downloader stub that sleeps --delay seconds before printing a version
+and counts its invocations. Fires --requests concurrent version checks:
+
+- direct: what check_version() did before, one `-print-version` run per call
+- cached: check_version_async() with the version cache, cold (no
+  .latest_version yet), warm, and stale (TTL expired: served at once while
+  one background refresh runs)
+
+Usage:
+    python3 scripts/bench-version-check.py [--requests 20] [--delay 2]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TMP = Path(tempfile.mkdtemp(prefix="bench-version-"))
+os.environ["HYTALE_DIR"] = str(TMP)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+import docker_overrides  # noqa: E402
+
+DOWNLOADER = TMP / ".downloader" / "hytale-downloader-linux-amd64"
+CALLS = TMP / "calls"
+
+
+def prepare(delay: float) -> None:
+    DOWNLOADER.parent.mkdir(parents=True)
+    DOWNLOADER.write_text(f"#!/bin/sh\necho x >> {CALLS}\nsleep {delay}\necho 2026.01.26-test\n")
+    DOWNLOADER.chmod(0o755)
+    (TMP / "last_version.txt").write_text("2026.01.20-test")
+
+
+def calls() -> int:
+    try:
+        return len(CALLS.read_text().splitlines())
+    except FileNotFoundError:
+        return 0
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(name: str, make, requests: int) -> None:
+    before = calls()
+    latencies = await asyncio.gather(*(timed(make()) for _ in range(requests)))
+    inflight = docker_overrides._version_cache._inflight
+    if inflight is not None:  # count the background refresh too
+        await asyncio.wrap_future(inflight)
+    print(f"{name:28s} p50 {statistics.median(latencies):8.1f} ms  max {max(latencies):8.1f} ms  "
+          f"downloader runs {calls() - before}")
+
+
+async def main_async(requests: int) -> None:
+    await run("direct -print-version", lambda: docker_overrides._print_latest_version(DOWNLOADER), requests)
+    await run("cached, cold", docker_overrides.check_version_async, requests)
+    await run("cached, warm", docker_overrides.check_version_async, requests)
+    docker_overrides._version_cache.ttl = 0
+    docker_overrides._version_cache._attempted = 0.0
+    await run("cached, stale", docker_overrides.check_version_async, requests)
+    result = await docker_overrides.check_version_async()
+    print(f"latest {result['latest_version']} (current {result['current_version']}), "
+          f"update available: {result['update_available']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Concurrent checks per round (default: 20)")
+    parser.add_argument("--delay", type=float, default=2.0, help="Seconds the downloader stub takes (default: 2)")
+    args = parser.parse_args()
+    try:
+        prepare(args.delay)
+        asyncio.run(main_async(args.requests))
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
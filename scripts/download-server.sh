@@ -74,10 +74,25 @@ log ""
 log "Starte Download / Starting download..."
 log ""
 
-"$DOWNLOADER" \
-    -download-path "$DOWNLOAD_PATH" \
-    -credentials-path "$CREDENTIALS" \
-    2>&1 | tee -a "$LOG_FILE"
+# With a shared artifact cache (HYTALE_ARTIFACT_CACHE), each version is
+# downloaded once per host and game.zip links to the cached archive
+ARTIFACT_CACHE="${DASHBOARD_DIR:-/opt/hytale-dashboard}/artifact_cache.py"
+if [ -n "${HYTALE_ARTIFACT_CACHE:-}" ] && [ "$LATEST_VERSION" != "unknown" ] && [ -f "$ARTIFACT_CACHE" ]; then
+    python3 "$ARTIFACT_CACHE" fetch "$LATEST_VERSION" "$DOWNLOAD_PATH" -- \
+        "$DOWNLOADER" \
+        -download-path {} \
+        -credentials-path "$CREDENTIALS" \
+        2>&1 | tee -a "$LOG_FILE"
+else
+    # game.zip may still link to a cached archive: detach it before writing
+    if [ -L "$DOWNLOAD_PATH" ] || [ "$(stat -c %h "$DOWNLOAD_PATH" 2>/dev/null || echo 1)" != "1" ]; then
+        rm -f "$DOWNLOAD_PATH"
+    fi
+    "$DOWNLOADER" \
+        -download-path "$DOWNLOAD_PATH" \
+        -credentials-path "$CREDENTIALS" \
+        2>&1 | tee -a "$LOG_FILE"
+fi
 
 RESULT=${PIPESTATUS[0]}
 
@@ -96,13 +111,25 @@ fi
 
 log ""
 log "Download erfolgreich / Download successful"
+
+# Staged updates (HYTALE_UPDATE_MODE=staged): the dashboard prepares the
+# version in versions/ and switches to it on the next restart
+if [ "${HYTALE_DOWNLOAD_ONLY:-false}" = "true" ]; then
+    exit 0
+fi
+
 log "Entpacke Server / Extracting server..."
 
-# Extract
+# Extract - only changed files if the dashboard's update_apply.py is available
 cd "$EXTRACT_PATH"
-unzip -o ".downloader/$DOWNLOAD_PATH" 2>&1 | tee -a "$LOG_FILE"
+UPDATE_APPLY="${DASHBOARD_DIR:-/opt/hytale-dashboard}/update_apply.py"
+if [ -f "$UPDATE_APPLY" ]; then
+    python3 "$UPDATE_APPLY" ".downloader/$DOWNLOAD_PATH" "$EXTRACT_PATH" 2>&1 | tee -a "$LOG_FILE"
+else
+    unzip -o ".downloader/$DOWNLOAD_PATH" 2>&1 | tee -a "$LOG_FILE"
+fi
 
-if [ $? -ne 0 ]; then
+if [ ${PIPESTATUS[0]} -ne 0 ]; then
     log "ERROR: Entpacken fehlgeschlagen / Extraction failed"
     exit 1
 fi
@@ -2,6 +2,9 @@
 #===============================================================================
 # Hytale Server Wrapper Script
 # Runs the server in a screen session for console command support
+#
+# Legacy: supervisord runs dashboard/server_runner.py instead, which needs no
+# screen and no polling loop. Kept for custom supervisord configurations.
 #===============================================================================
 
 set -euo pipefail
@@ -10,6 +13,11 @@ HYTALE_DIR="${HYTALE_DIR:-/opt/hytale-server}"
 SCREEN_NAME="hytale"
 COMMAND_FILE="${HYTALE_DIR}/.server_command"
 CHECK_INTERVAL="${HYTALE_SETUP_WAIT_SECONDS:-5}"
+# Rotating log sink (replaces `tee -a`); see dashboard/log_rotation.py
+LOG_SINK="${DASHBOARD_DIR:-/opt/hytale-dashboard}/log_rotation.py"
+# Console broker started by start.sh (see dashboard/console_broker.py)
+BROKER="${DASHBOARD_DIR:-/opt/hytale-dashboard}/console_broker.py"
+CONSOLE_SOCKET="${HYTALE_DIR}/.console.sock"
 
 cd "$HYTALE_DIR"
 
@@ -30,7 +38,13 @@ chmod 660 "$COMMAND_FILE"
 
 # Function to send command to server
 send_command() {
-    if screen -list | grep -q "$SCREEN_NAME"; then
+    if [ -S "$CONSOLE_SOCKET" ] && [ -f "$BROKER" ]; then
+        if python3 "$BROKER" send "$1" >/dev/null; then
+            echo "[wrapper] Sent command: $1"
+        else
+            echo "[wrapper] Console broker did not accept: $1"
+        fi
+    elif screen -list | grep -q "$SCREEN_NAME"; then
         screen -S "$SCREEN_NAME" -p 0 -X stuff "$1\n"
         echo "[wrapper] Sent command: $1"
     else
@@ -56,7 +70,13 @@ trap cleanup SIGTERM SIGINT
 start_server_screen() {
     echo "[wrapper] Starting Hytale Server in screen session..."
     mkdir -p logs
-    screen -dmS "$SCREEN_NAME" bash -c "cd $HYTALE_DIR && ./start.sh 2>&1 | tee -a logs/server.log"
+    if [ -f "$LOG_SINK" ]; then
+        LOG_PIPE="python3 $LOG_SINK logs/server.log"
+    else
+        echo "[wrapper] WARNING: log sink not found, server.log will not be rotated"
+        LOG_PIPE="tee -a logs/server.log"
+    fi
+    screen -dmS "$SCREEN_NAME" bash -c "cd $HYTALE_DIR && ./start.sh 2>&1 | $LOG_PIPE"
 
     # Wait for screen to start
     sleep 2
@@ -94,14 +114,19 @@ while true; do
         continue
     fi
 
-    # Read and execute commands from command file
+    # Read and execute commands from command file (legacy path: the
+    # dashboard sends to the console broker's socket directly). The file is
+    # moved away first, so commands appended while sending are not lost.
     if [ -s "$COMMAND_FILE" ]; then
+        mv "$COMMAND_FILE" "$COMMAND_FILE.sending"
+        touch "$COMMAND_FILE"
+        chmod 660 "$COMMAND_FILE"
         while IFS= read -r cmd; do
             if [ -n "$cmd" ]; then
                 send_command "$cmd"
             fi
-        done < "$COMMAND_FILE"
-        > "$COMMAND_FILE"
+        done < "$COMMAND_FILE.sending"
+        rm -f "$COMMAND_FILE.sending"
     fi
 
     # Restart screen if server stopped unexpectedly
@@ -40,7 +40,6 @@ if [ ! -p "$PIPE" ]; then
 fi
 
 echo "[start.sh] Starting Hytale Server..."
-echo "[start.sh] Memory: ${HYTALE_MEMORY_MIN} - ${HYTALE_MEMORY_MAX}"
 echo "[start.sh] Port: ${HYTALE_PORT:-5520}"
 
 # Cleanup on exit
@@ -55,11 +54,42 @@ trap cleanup EXIT INT TERM
 # This ensures universe data is created in Server/universe/
 cd "$HYTALE_DIR/Server"
 
-# Start server with FIFO pipe for stdin
 # Note: Assets path is relative to HYTALE_DIR (parent directory)
-tail -f "$HYTALE_DIR/$PIPE" | exec java \
-    -Xms${HYTALE_MEMORY_MIN:-2G} \
-    -Xmx${HYTALE_MEMORY_MAX:-4G} \
-    -jar "HytaleServer.jar" \
-    --assets "../$ASSETS" \
+SERVER_ARGS=(
+    -jar "HytaleServer.jar"
+    --assets "../$ASSETS"
     --bind 0.0.0.0:${HYTALE_PORT:-5520}
+)
+
+# JVM options sized from the container's memory and CPU limits, with the GC
+# profile from HYTALE_JVM_PROFILE or the dashboard (see dashboard/jvm_launcher.py)
+LAUNCHER="${DASHBOARD_DIR:-/opt/hytale-dashboard}/jvm_launcher.py"
+JVM_OPTS=()
+if [ -f "$LAUNCHER" ] && JVM_OUT=$(python3 "$LAUNCHER" options --record "$HYTALE_DIR/.jvm_command.json" -- "${SERVER_ARGS[@]}"); then
+    mapfile -t JVM_OPTS <<< "$JVM_OUT"
+else
+    MEMORY_MIN=${HYTALE_MEMORY_MIN:-2G}
+    MEMORY_MAX=${HYTALE_MEMORY_MAX:-4G}
+    [[ "$MEMORY_MIN" =~ ^[0-9]+[kKmMgG]?$ ]] || MEMORY_MIN=2G
+    [[ "$MEMORY_MAX" =~ ^[0-9]+[kKmMgG]?$ ]] || MEMORY_MAX=4G
+    echo "[start.sh] Memory: ${MEMORY_MIN} - ${MEMORY_MAX}"
+    JVM_OPTS=(-Xms${MEMORY_MIN} -Xmx${MEMORY_MAX})
+fi
+JAVA_CMD=(java "${JVM_OPTS[@]}" "${SERVER_ARGS[@]}")
+echo "[start.sh] ${JAVA_CMD[*]}"
+
+# Started by the server runner (dashboard/server_runner.py): stdin and stdout
+# are already its pipes and it runs the console broker
+if [ -n "${HYTALE_RUNNER:-}" ]; then
+    exec "${JAVA_CMD[@]}"
+fi
+
+# Console broker: owns the server's stdin, takes commands on .console.sock
+# and forwards the FIFO pipe (see dashboard/console_broker.py)
+BROKER="${DASHBOARD_DIR:-/opt/hytale-dashboard}/console_broker.py"
+if [ -f "$BROKER" ]; then
+    exec python3 "$BROKER" run --socket "$HYTALE_DIR/.console.sock" --fifo "$HYTALE_DIR/$PIPE" -- "${JAVA_CMD[@]}"
+fi
+
+# Fallback: start server with FIFO pipe for stdin
+tail -f "$HYTALE_DIR/$PIPE" | exec "${JAVA_CMD[@]}"